@@ -0,0 +1,271 @@
+"""
+End-to-end benchmark of sync and format against a synthetic Jira site.
+
+A ``fake_jira`` server is started in-process and every scenario runs
+``jiruff`` in a fresh interpreter with an empty home directory pointed at
+it:
+
+* ``initial sync`` mirrors the whole site,
+* ``incremental sync`` picks up issues and worklogs changed after it,
+* ``local rules`` runs the formatter rules the mirror can answer over it,
+  like ``jiruff serve`` does,
+* ``format`` runs the formatter against the server and applies its writes.
+
+Wall time, peak memory, requests per endpoint and bytes served are reported
+for every scenario. Results can be saved and later runs compared with them,
+a scenario fails when its time, memory or requests grow beyond
+``--tolerance``::
+
+    python benchmarks/bench_e2e.py --issues 20000 --save baseline.json
+    python benchmarks/bench_e2e.py --issues 20000 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_jira import FakeJiraServer
+from fake_jira import site_arguments
+from fake_jira import site_from_arguments
+
+SRC_PATH = Path(__file__).resolve().parents[1] / "src"
+
+COMPANY = "bench"
+WATCHER_ID = "user-bench"
+# metrics compared with a saved baseline
+COMPARED_METRICS = ("seconds", "max_rss_mb", "requests")
+
+RUNNER = """
+import json
+import resource
+import sys
+import time
+from pathlib import Path
+
+result_path, command, config_path = sys.argv[1:4]
+start = time.perf_counter()
+if command == "rules":
+    from jiruff.commands.format import FormatCommand
+    from jiruff.commands.format import format_rules
+    from jiruff.commands.serve import needs_jira
+    from jiruff.config import load_config
+    from jiruff.rules.engine import RuleEngine
+    from jiruff.services.write_executor import JiraWriteExecutor
+
+    handler = FormatCommand()
+    handler.config = load_config(Path(config_path))
+    handler._init_local_jira()
+    writer = JiraWriteExecutor(jira=None)
+    rules = [
+        rule
+        for rule in format_rules(handler.config, handler.local_jira, writer)
+        if not needs_jira(rule)
+    ]
+    RuleEngine(jira=handler.local_jira, rules=rules).run()
+else:
+    sys.argv = ["jiruff", command, "-c", config_path, *sys.argv[4:]]
+    import jiruff
+
+    jiruff.main()
+elapsed = time.perf_counter() - start
+with open(result_path, "w") as result_file:
+    json.dump(
+        {
+            "seconds": elapsed,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        result_file,
+    )
+"""
+
+CONFIG = """
+company = "{company}"
+jira_url = "{url}"
+
+[sync]
+workers = {workers}
+engine = "{engine}"
+profile = "{profile}"
+
+[local]
+backend = "{backend}"
+
+[rate_limit]
+rate = {rate}
+max_rate = {rate}
+burst = 100
+
+[writes]
+max_workers = {workers}
+engine = "{engine}"
+
+[issues-007-auto-watch]
+auto_watch_rules = [{{ jira_user_id = "{watcher}" }}]
+"""
+
+
+def run_scenario(
+    command: str, config_path: Path, home: Path, server: FakeJiraServer
+) -> dict:
+    """
+    Run a jiruff command in a fresh interpreter.
+    :param command: ``rules`` or the jiruff command to run.
+    :return: Metrics of the run.
+    """
+    result_path = home / "result.json"
+    result_path.unlink(missing_ok=True)
+    server.reset_stats()
+    subprocess.run(
+        [sys.executable, "-c", RUNNER, str(result_path), command, str(config_path)],
+        env={
+            "HOME": str(home),
+            "PATH": os.environ.get("PATH", ""),
+            "PYTHONPATH": str(SRC_PATH),
+            f"{COMPANY.upper()}_JIRA_USER": "bench@example.com",
+            f"{COMPANY.upper()}_JIRA_TOKEN": "bench-token",
+        },
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    stats = server.reset_stats()
+    return {
+        **json.loads(result_path.read_text()),
+        "requests": sum(stats["requests"].values()),
+        "throttled": stats["throttled"],
+        "mb_sent": stats["bytes_sent"] / 2**20,
+        "endpoints": stats["requests"],
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    :return: Regressions of the results over the baseline.
+    """
+    failures = []
+    for scenario, metrics in results.items():
+        previous = baseline.get(scenario)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metrics[metric] > previous[metric] * (1 + tolerance):
+                failures.append(
+                    f"{scenario}: {metric} {metrics[metric]:.2f} "
+                    f"over baseline {previous[metric]:.2f}"
+                )
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    site_arguments(parser)
+    parser.add_argument("--workers", type=int, default=8, help="[sync] workers")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument(
+        "--profile", choices=["full", "lean", "changelog"], default="full"
+    )
+    parser.add_argument("--backend", choices=["files", "segments"], default="files")
+    parser.add_argument(
+        "--rate", type=float, default=1000.0, help="Requests per second of jiruff"
+    )
+    parser.add_argument(
+        "--changes",
+        type=int,
+        default=None,
+        help="Issues and worklogs changed before the incremental sync, "
+        "1%% of the issues by default",
+    )
+    parser.add_argument("--save", type=Path, default=None, help="Save results here")
+    parser.add_argument(
+        "--compare", type=Path, default=None, help="Baseline results to compare with"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Growth over the baseline counted as a regression",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print requests per endpoint"
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    site = site_from_arguments(args)
+    print(f"Generated {len(site)} issues in {time.perf_counter() - started:.1f}s")
+    changes = args.changes if args.changes is not None else max(len(site) // 100, 1)
+
+    server = FakeJiraServer(
+        site,
+        port=0,
+        latency=args.latency_ms / 1000,
+        throttle_ratio=args.throttle,
+        retry_after=args.retry_after,
+    ).start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            home = Path(home)
+            config_path = home / "jiruff.toml"
+            config_path.write_text(
+                CONFIG.format(
+                    company=COMPANY,
+                    url=server.url,
+                    workers=args.workers,
+                    engine=args.engine,
+                    profile=args.profile,
+                    backend=args.backend,
+                    rate=args.rate,
+                    watcher=WATCHER_ID,
+                )
+            )
+            results["initial sync"] = run_scenario("sync", config_path, home, server)
+            site.simulate_activity(
+                issues=changes,
+                worklogs=changes,
+                deleted_worklogs=max(changes // 10, 1),
+                seed=args.seed,
+            )
+            results["incremental sync"] = run_scenario(
+                "sync", config_path, home, server
+            )
+            results["local rules"] = run_scenario("rules", config_path, home, server)
+            results["format"] = run_scenario("format", config_path, home, server)
+    finally:
+        server.stop()
+
+    print(
+        f"{'scenario':<18} {'seconds':>9} {'RSS MB':>8} {'requests':>9} "
+        f"{'MB sent':>8} {'throttled':>9}"
+    )
+    for scenario, metrics in results.items():
+        print(
+            f"{scenario:<18} {metrics['seconds']:>9.2f} {metrics['max_rss_mb']:>8.1f} "
+            f"{metrics['requests']:>9} {metrics['mb_sent']:>8.1f} "
+            f"{metrics['throttled']:>9}"
+        )
+        if args.verbose:
+            for endpoint, count in sorted(metrics["endpoints"].items()):
+                print(f"    {endpoint:<22} {count:>7}")
+    print(
+        f"initial sync: {len(site) / results['initial sync']['seconds']:.0f} issues/s"
+    )
+
+    if args.save is not None:
+        args.save.write_text(json.dumps(results, indent=2))
+    failures = []
+    if args.compare is not None:
+        failures = compare(
+            results, json.loads(args.compare.read_text()), args.tolerance
+        )
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
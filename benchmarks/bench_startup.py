@@ -0,0 +1,124 @@
+"""
+CLI startup time regression benchmark.
+
+Every case runs ``jiruff`` in a fresh interpreter with an empty home
+directory, so nothing is cached and filesystem side effects are visible. A
+case fails when its median time exceeds ``--max-ms``, when it imports a
+module it should not, or when it leaves files in the home directory::
+
+    python benchmarks/bench_startup.py --runs 20 --max-ms 150
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_PATH = Path(__file__).resolve().parents[1] / "src"
+
+# argv of every case
+CASES = {
+    "--help": ("--help",),
+    "check --help": ("check", "--help"),
+    "migrate --help": ("migrate", "--help"),
+    "sync --help": ("sync", "--help"),
+}
+# modules every case must not import
+FORBIDDEN_MODULES = {
+    "--help": (
+        "jira",
+        "requests",
+        "pandas",
+        "pydantic",
+        "pydantic_settings",
+        "orjson",
+        "jiruff.base.commands",
+    ),
+    "check --help": ("jira", "requests", "pandas", "orjson"),
+    "migrate --help": ("jira", "requests", "pandas"),
+    "sync --help": (),
+}
+
+RUNNER = """
+import sys
+import time
+
+start = time.perf_counter()
+sys.argv = ["jiruff", *sys.argv[1:]]
+import jiruff
+
+try:
+    jiruff.main()
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+print(f"{elapsed * 1000:.3f}", file=sys.stderr)
+print(" ".join(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+def run_case(argv: tuple[str, ...], home: Path) -> tuple[float, float, set[str]]:
+    """
+    :return: Wall time and in-process time in ms, imported modules.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", RUNNER, *argv],
+        env={"HOME": str(home), "PYTHONPATH": str(SRC_PATH)},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    *_, main_ms, modules = result.stderr.strip().splitlines()
+    return wall_ms, float(main_ms), set(modules.split())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Runs per case")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="Fail when the median in-process time of `--help` exceeds it",
+    )
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as home_dir:
+        home = Path(home_dir)
+        print(f"{'case':<16} {'wall ms':>9} {'main ms':>9}")
+        for name, argv in CASES.items():
+            wall_times, main_times = [], []
+            for _ in range(args.runs):
+                wall_ms, main_ms, modules = run_case(argv, home)
+                wall_times.append(wall_ms)
+                main_times.append(main_ms)
+            median_main = statistics.median(main_times)
+            print(
+                f"{name:<16} {statistics.median(wall_times):>9.1f} {median_main:>9.1f}"
+            )
+
+            imported = sorted(set(FORBIDDEN_MODULES[name]) & modules)
+            if imported:
+                failures.append(f"`{name}` imports {', '.join(imported)}")
+            if name == "--help" and args.max_ms and median_main > args.max_ms:
+                failures.append(
+                    f"`{name}` takes {median_main:.1f} ms, over {args.max_ms} ms"
+                )
+
+        created = sorted(str(path.relative_to(home)) for path in home.rglob("*"))
+        if created:
+            failures.append(f"startup created {', '.join(created)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1315 @@
+"""
+Synthetic Jira Cloud stand-in for benchmarks.
+
+Serves the REST endpoints jiruff uses from a synthetic site of epics,
+stories and sub-tasks with worklogs. Issues are generated from their ID on
+demand, so sites of a million issues take a few dozen MB: only the
+``updated`` times and the changes made through the API are kept in memory.
+Searches are answered with the JQL subset of ``jiruff.local.jql``.
+
+Latency and throttling (429 with ``Retry-After``) can be injected, and every
+request is counted by endpoint::
+
+    python benchmarks/fake_jira.py --issues 100000 --port 8080 --latency-ms 50
+
+The server can also be started in-process, see ``FakeJiraServer``.
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timezone
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+from typing import Sequence
+from urllib.parse import parse_qs
+
+import orjson
+
+SRC_PATH = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC_PATH))
+
+from jiruff.local.jql import And  # noqa: E402
+from jiruff.local.jql import Clause  # noqa: E402
+from jiruff.local.jql import Function  # noqa: E402
+from jiruff.local.jql import JqlError  # noqa: E402
+from jiruff.local.jql import Or  # noqa: E402
+from jiruff.local.jql import Query  # noqa: E402
+from jiruff.local.jql import compile_jql  # noqa: E402
+
+ISSUE_ID_BASE = 10000
+WORKLOG_ID_BASE = 100000
+HISTORY_ID_BASE = 1000000
+# issues of a block: an epic, its stories and their sub-tasks
+STORIES_PER_EPIC = 6
+SUBTASKS_PER_STORY = 3
+BLOCK_SIZE = 1 + STORIES_PER_EPIC * (1 + SUBTASKS_PER_STORY)
+VERSIONS_PER_PROJECT = 12
+USERS = 60
+# issues are last updated at most this long after they were created
+MAX_ACTIVE_SECONDS = 120 * 86400
+FEED_PAGE_SIZE = 1000
+MAX_SEARCH_RESULTS = 5000
+# search results with all fields are capped lower, like Jira does
+MAX_FULL_SEARCH_RESULTS = 100
+MAX_BULK_FETCH = 100
+# searches paged through at once, older page tokens expire
+MAX_OPEN_SEARCHES = 256
+
+PROJECT_KEYS = ("CORE", "WEB", "OPS", "DATA", "MOB", "PAY", "SEC", "INFRA")
+STORY_TYPES = (("Story", 10001), ("Story", 10001), ("Task", 10002), ("Bug", 10004))
+STATUSES = (
+    ("To Do", "new", "To Do"),
+    ("In Progress", "indeterminate", "In Progress"),
+    ("In Review", "indeterminate", "In Progress"),
+    ("Done", "done", "Done"),
+)
+PRIORITIES = ("Highest", "High", "Medium", "Medium", "Low")
+WORDS = (
+    "add api billing cache check client config dashboard data deploy error "
+    "export fix flaky form import index invoice job limit login migrate mobile "
+    "monitor page payment report retry search session slow sync test timeout "
+    "token update upload user webhook worker"
+).split()
+MASK64 = (1 << 64) - 1
+
+
+def _hash(*values: int) -> int:
+    value = 0
+    for part in values:
+        value = ((value ^ part) * 0x9E3779B97F4A7C15) & MASK64
+        value ^= value >> 29
+    return value
+
+
+def jira_time(timestamp: float) -> str:
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return (
+        moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}+0000"
+    )
+
+
+class FakeJiraError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class SiteConfig:
+    issues: int = 10_000
+    projects: int = 4
+    worklogs_per_issue: float = 2.0
+    # worklog IDs reserved per issue, the unused ones are gaps of the ID space
+    worklog_id_stride: int = 16
+    deleted_ratio: float = 0.01
+    years: float = 3.0
+    seed: int = 1
+    # epoch seconds the site history ends at, defaults to now
+    now: float | None = None
+
+
+@dataclass
+class _Search:
+    candidates: Sequence[int]
+    match: Callable[[dict], bool]
+    fields: list[str] | None
+    # issues are matched with their watchers listed
+    watchers: bool = False
+    position: int = 0
+
+
+@dataclass
+class _Changes:
+    # issue index -> fields changed through the API
+    fields: dict[int, dict] = field(default_factory=dict)
+    histories: dict[int, list[dict]] = field(default_factory=dict)
+    # worklog ID -> fields changed through the API
+    worklogs: dict[int, dict] = field(default_factory=dict)
+    # worklog ID -> epoch seconds it was changed or deleted at
+    worklogs_updated: dict[int, float] = field(default_factory=dict)
+    worklogs_deleted: dict[int, float] = field(default_factory=dict)
+    # issue index -> watchers after watchers were added through the API
+    watchers: dict[int, list[dict]] = field(default_factory=dict)
+
+
+class SyntheticSite:
+    """
+    Jira site generated from issue indexes.
+
+    Every block of ``BLOCK_SIZE`` issues is an epic, its stories and their
+    sub-tasks, in a project taken in turns. Issues are created at a steady
+    pace over ``years`` up to ``now``, and worklog IDs grow with the creation
+    time of their issue, like on a real site.
+    """
+
+    def __init__(self, config: SiteConfig):
+        self.config = config
+        self.base_url = "http://localhost"
+        self.projects = [
+            PROJECT_KEYS[i] if i < len(PROJECT_KEYS) else f"P{i}"
+            for i in range(config.projects)
+        ]
+        self.end = config.now if config.now is not None else time.time() - 3600
+        self.start = self.end - config.years * 365 * 86400
+        self.step = (self.end - self.start) / max(config.issues, 1)
+        self.changes = _Changes()
+        self._lock = threading.Lock()
+        self._clock = self.end
+        self._history_ids = itertools.count(HISTORY_ID_BASE)
+        self._searches: OrderedDict[str, _Search] = OrderedDict()
+        self._search_ids = itertools.count(1)
+        self._updated = array(
+            "d", (self._generated_updated(n) for n in range(config.issues))
+        )
+        self._updated_sorted: list[float] | None = None
+        self.versions = {
+            project: [
+                {
+                    "id": str(10000 + p * 100 + v),
+                    "name": f"{project} {1 + v // 4}.{v % 4}",
+                    "released": v < VERSIONS_PER_PROJECT - 2,
+                    "archived": False,
+                }
+                for v in range(VERSIONS_PER_PROJECT)
+            ]
+            for p, project in enumerate(self.projects)
+        }
+        self._versions_by_id = {
+            version["id"]: version
+            for versions in self.versions.values()
+            for version in versions
+        }
+        self.users = [
+            {
+                "accountId": f"user-{u:03d}",
+                "displayName": f"User {u:03d}",
+                "active": True,
+                "timeZone": "UTC",
+            }
+            for u in range(USERS)
+        ]
+
+    def _rand(self, n: int, salt: int) -> int:
+        return _hash(self.config.seed, n, salt)
+
+    # hierarchy
+
+    def __len__(self) -> int:
+        return self.config.issues
+
+    def issue_id(self, n: int) -> int:
+        return ISSUE_ID_BASE + n
+
+    def key(self, n: int) -> str:
+        block, position = divmod(n, BLOCK_SIZE)
+        project = self.projects[block % len(self.projects)]
+        return f"{project}-{(block // len(self.projects)) * BLOCK_SIZE + position + 1}"
+
+    def index(self, id_or_key: str) -> int | None:
+        """
+        :return: Index of a live issue, None if it does not exist.
+        """
+        id_or_key = str(id_or_key).strip().strip("'\"")
+        if id_or_key.isdigit():
+            n = int(id_or_key) - ISSUE_ID_BASE
+        else:
+            project, _, number = id_or_key.upper().rpartition("-")
+            if project not in self.projects or not number.isdigit():
+                return None
+            block_in_project, position = divmod(int(number) - 1, BLOCK_SIZE)
+            block = block_in_project * len(self.projects) + self.projects.index(project)
+            n = block * BLOCK_SIZE + position
+        if not 0 <= n < self.config.issues or self.is_deleted(n):
+            return None
+        return n
+
+    def is_deleted(self, n: int) -> bool:
+        if n % BLOCK_SIZE == 0:
+            return False
+        return self._rand(n, 1) % 10_000 < self.config.deleted_ratio * 10_000
+
+    @staticmethod
+    def level(n: int) -> int:
+        """
+        :return: 1 for epics, 0 for stories, -1 for sub-tasks.
+        """
+        position = n % BLOCK_SIZE
+        if position == 0:
+            return 1
+        return 0 if (position - 1) % (1 + SUBTASKS_PER_STORY) == 0 else -1
+
+    @staticmethod
+    def parent(n: int) -> int | None:
+        block, position = divmod(n, BLOCK_SIZE)
+        if position == 0:
+            return None
+        story = (position - 1) // (1 + SUBTASKS_PER_STORY)
+        if (position - 1) % (1 + SUBTASKS_PER_STORY) == 0:
+            return block * BLOCK_SIZE
+        return block * BLOCK_SIZE + 1 + story * (1 + SUBTASKS_PER_STORY)
+
+    def children(self, n: int) -> list[int]:
+        level = self.level(n)
+        if level == 1:
+            children = [
+                n + 1 + story * (1 + SUBTASKS_PER_STORY)
+                for story in range(STORIES_PER_EPIC)
+            ]
+        elif level == 0:
+            children = [n + 1 + subtask for subtask in range(SUBTASKS_PER_STORY)]
+        else:
+            children = []
+        return [
+            child
+            for child in children
+            if child < self.config.issues and not self.is_deleted(child)
+        ]
+
+    # times
+
+    def created(self, n: int) -> float:
+        return self.start + n * self.step
+
+    def _generated_updated(self, n: int) -> float:
+        created = self.created(n)
+        active = min(self.end - created, MAX_ACTIVE_SECONDS)
+        return created + active * (self._rand(n, 2) % 1000) / 1000
+
+    def updated(self, n: int) -> float:
+        return self._updated[n]
+
+    def _tick(self) -> float:
+        """
+        :return: Distinct epoch seconds for a change made now.
+        """
+        self._clock = max(time.time(), self._clock + 0.001)
+        return self._clock
+
+    # issues
+
+    def _user(self, n: int, salt: int) -> dict:
+        return self.users[self._rand(n, salt) % len(self.users)]
+
+    def _status(self, n: int) -> tuple[str, str, str]:
+        # from the generated history, changes through the API set it on their own
+        age = (self.end - self._generated_updated(n)) / MAX_ACTIVE_SECONDS
+        roll = self._rand(n, 3) % 100
+        if age > 1 or roll < 60 * min(age + 0.3, 1):
+            return STATUSES[3]
+        return STATUSES[roll % 3]
+
+    def _version(self, n: int) -> dict:
+        project = self.projects[(n // BLOCK_SIZE) % len(self.projects)]
+        versions = self.versions[project]
+        share = (self.created(n) - self.start) / (self.end - self.start)
+        return versions[min(int(share * len(versions)), len(versions) - 1)]
+
+    def _fix_versions(self, n: int) -> list[dict]:
+        level = self.level(n)
+        epic = n - n % BLOCK_SIZE
+        epic_versioned = self._rand(epic, 4) % 100 < 80
+        if level == 1:
+            versioned = epic_versioned
+        elif level == 0:
+            # many stories miss the version of their epic, issues-001 fixes them
+            versioned = epic_versioned and self._rand(n, 4) % 100 < 50
+        else:
+            versioned = self._rand(n, 4) % 100 < 10
+        return [self._version(epic)] if versioned else []
+
+    def _summary(self, n: int) -> str:
+        words = [WORDS[self._rand(n, 10 + i) % len(WORDS)] for i in range(5)]
+        return " ".join(words).capitalize()
+
+    def _issue_type(self, n: int) -> dict:
+        level = self.level(n)
+        if level == 1:
+            name, type_id = "Epic", 10000
+        elif level == 0:
+            name, type_id = STORY_TYPES[self._rand(n, 5) % len(STORY_TYPES)]
+        else:
+            name, type_id = "Sub-task", 10003
+        return {
+            "self": f"{self.base_url}/rest/api/2/issuetype/{type_id}",
+            "id": str(type_id),
+            "name": name,
+            "subtask": level == -1,
+            "hierarchyLevel": level,
+        }
+
+    def watchers(self, n: int) -> list[dict]:
+        """
+        Watchers of an issue, Jira only lists them on the watchers endpoint.
+        """
+        if n in self.changes.watchers:
+            return self.changes.watchers[n]
+        reporter = self._user(n, 7)
+        watchers = {reporter["accountId"]: reporter}
+        if self._rand(n, 9) % 10:
+            assignee = self._user(n, 8)
+            watchers[assignee["accountId"]] = assignee
+        for i in range(self._rand(n, 6) % 4):
+            user = self._user(n, 20 + i)
+            watchers[user["accountId"]] = user
+        return list(watchers.values())
+
+    def _reference(self, n: int) -> dict:
+        issue_id = self.issue_id(n)
+        return {
+            "id": str(issue_id),
+            "key": self.key(n),
+            "self": f"{self.base_url}/rest/api/2/issue/{issue_id}",
+        }
+
+    def issue_json(self, n: int) -> dict:
+        """
+        Issue with all of its fields, as returned with ``fields=*all``.
+        """
+        block = n // BLOCK_SIZE
+        project_key = self.projects[block % len(self.projects)]
+        project_index = self.projects.index(project_key)
+        name, category, category_name = self._status(n)
+        reporter = self._user(n, 7)
+        assignee = self._user(n, 8) if self._rand(n, 9) % 10 else None
+        level = self.level(n)
+        worklogs = self.worklogs(n)
+        time_spent = sum(worklog["timeSpentSeconds"] for worklog in worklogs)
+        description = ". ".join(
+            self._summary(n * 8 + i) for i in range(1 + self._rand(n, 30) % 6)
+        )
+        fields = {
+            "summary": self._summary(n),
+            "description": description,
+            "project": {
+                "self": f"{self.base_url}/rest/api/2/project/{10000 + project_index}",
+                "id": str(10000 + project_index),
+                "key": project_key,
+                "name": project_key.title(),
+                "projectTypeKey": "software",
+            },
+            "issuetype": self._issue_type(n),
+            "status": {
+                "name": name,
+                "id": str(STATUSES.index((name, category, category_name)) + 1),
+                "statusCategory": {"key": category, "name": category_name},
+            },
+            "resolution": {"id": "10000", "name": "Done"}
+            if category == "done"
+            else None,
+            "resolutiondate": (
+                jira_time(self._generated_updated(n)) if category == "done" else None
+            ),
+            "priority": {"name": PRIORITIES[self._rand(n, 31) % len(PRIORITIES)]},
+            "reporter": reporter,
+            "creator": reporter,
+            "assignee": assignee,
+            "created": jira_time(self.created(n)),
+            "updated": jira_time(self.updated(n)),
+            "duedate": None,
+            "labels": [WORDS[self._rand(n, 32 + i) % len(WORDS)] for i in range(n % 3)],
+            "components": [],
+            "fixVersions": self._fix_versions(n),
+            "versions": [],
+            "watches": {
+                "self": f"{self.base_url}/rest/api/2/issue/{self.key(n)}/watchers",
+                "watchCount": len(self.watchers(n)),
+                "isWatching": False,
+            },
+            "timespent": time_spent or None,
+            "timetracking": {"timeSpentSeconds": time_spent} if time_spent else {},
+            "customfield_10016": float(self._rand(n, 33) % 13) if level == 0 else None,
+            "customfield_10020": [
+                {
+                    "id": 100 + block % 50,
+                    "name": f"Sprint {block % 50}",
+                    "state": "closed" if category == "done" else "active",
+                }
+            ]
+            if level != 1
+            else None,
+            "customfield_10001": {"id": str(block % 5), "name": f"Team {block % 5}"},
+        }
+        parent = self.parent(n)
+        if parent is not None:
+            fields["parent"] = {
+                **self._reference(parent),
+                "fields": {
+                    "summary": self._summary(parent),
+                    "issuetype": self._issue_type(parent),
+                },
+            }
+        changed = self.changes.fields.get(n)
+        if changed:
+            fields.update(changed)
+        return {
+            "expand": "renderedFields,names,schema",
+            **self._reference(n),
+            "fields": fields,
+        }
+
+    @staticmethod
+    def project_fields(issue_json: dict, fields: Sequence[str] | None) -> dict:
+        """
+        Keep the requested fields of an issue.
+        :param fields: Field names, ``*all`` or None for all of them.
+        """
+        if fields is None or "*all" in fields or "*navigable" in fields:
+            return issue_json
+        return {
+            **issue_json,
+            "fields": {
+                name: value
+                for name, value in issue_json["fields"].items()
+                if name in fields
+            },
+        }
+
+    # worklogs
+
+    def _worklog_count(self, n: int) -> int:
+        if self.is_deleted(n):
+            return 0
+        per_issue = self.config.worklogs_per_issue
+        spread = int(2 * per_issue) + 1
+        return min(self._rand(n, 40) % spread, self.config.worklog_id_stride)
+
+    def _worklog_time(self, worklog_id: int) -> float:
+        # worklog IDs and their times grow together
+        return self.start + (worklog_id - WORKLOG_ID_BASE) * (
+            self.step / self.config.worklog_id_stride
+        )
+
+    def _first_worklog_after(self, timestamp: float) -> int:
+        offset = (timestamp - self.start) * self.config.worklog_id_stride / self.step
+        worklog_id = WORKLOG_ID_BASE + max(int(offset), 0)
+        while self._worklog_time(worklog_id) <= timestamp:
+            worklog_id += 1
+        return worklog_id
+
+    def worklog_json(self, worklog_id: int) -> dict | None:
+        """
+        :return: Worklog, None if it does not exist.
+        """
+        if worklog_id in self.changes.worklogs_deleted:
+            return None
+        n, k = divmod(worklog_id - WORKLOG_ID_BASE, self.config.worklog_id_stride)
+        if not 0 <= n < self.config.issues or k >= self._worklog_count(n):
+            return None
+        author = self._user(worklog_id, 41)
+        created = self._worklog_time(worklog_id)
+        updated = self.changes.worklogs_updated.get(worklog_id, created)
+        issue_id = self.issue_id(n)
+        seconds = (1 + self._rand(worklog_id, 42) % 16) * 900
+        worklog = {
+            "self": f"{self.base_url}/rest/api/2/issue/{issue_id}/worklog/{worklog_id}",
+            "author": author,
+            "updateAuthor": author,
+            "comment": self._summary(worklog_id),
+            "created": jira_time(created),
+            "updated": jira_time(updated),
+            "started": jira_time(created - seconds),
+            "timeSpent": f"{seconds // 3600}h {seconds % 3600 // 60}m",
+            "timeSpentSeconds": seconds,
+            "id": str(worklog_id),
+            "issueId": str(issue_id),
+        }
+        worklog.update(self.changes.worklogs.get(worklog_id, {}))
+        return worklog
+
+    def worklogs(self, n: int) -> list[dict]:
+        first = WORKLOG_ID_BASE + n * self.config.worklog_id_stride
+        return [
+            worklog
+            for worklog in map(
+                self.worklog_json, range(first, first + self._worklog_count(n))
+            )
+            if worklog is not None
+        ]
+
+    def worklog_feed(self, change: str, since_ms: int) -> dict:
+        """
+        Page of the ``updated`` or ``deleted`` worklog change feed.
+        """
+        values: list[tuple[int, float]] = []
+        if change == "updated":
+            worklog_id = self._first_worklog_after(since_ms / 1000)
+            last_id = (
+                WORKLOG_ID_BASE + self.config.issues * self.config.worklog_id_stride
+            )
+            while len(values) <= FEED_PAGE_SIZE and worklog_id < last_id:
+                if (
+                    worklog_id not in self.changes.worklogs_updated
+                    and self.worklog_json(worklog_id) is not None
+                ):
+                    values.append((worklog_id, self._worklog_time(worklog_id)))
+                worklog_id += 1
+            changed = self.changes.worklogs_updated
+        else:
+            changed = self.changes.worklogs_deleted
+        if len(values) <= FEED_PAGE_SIZE:
+            values.extend(
+                sorted(
+                    (
+                        (worklog_id, changed_at)
+                        for worklog_id, changed_at in list(changed.items())
+                        if changed_at * 1000 > since_ms
+                        and (
+                            change == "deleted"
+                            or worklog_id not in self.changes.worklogs_deleted
+                        )
+                    ),
+                    key=lambda value: value[1],
+                )
+            )
+        last_page = len(values) <= FEED_PAGE_SIZE
+        values = values[:FEED_PAGE_SIZE]
+        until = int(values[-1][1] * 1000) if values else since_ms
+        return {
+            "values": [
+                {
+                    "worklogId": worklog_id,
+                    "updatedTime": int(changed_at * 1000),
+                    "properties": [],
+                }
+                for worklog_id, changed_at in values
+            ],
+            "since": since_ms,
+            "until": until,
+            "lastPage": last_page,
+        }
+
+    # search
+
+    def search(
+        self,
+        jql: str,
+        fields: Sequence[str] | None,
+        max_results: int,
+        page_token: str | None,
+    ) -> dict:
+        """
+        Page of a ``search/jql`` request.
+        """
+        with self._lock:
+            search = self._searches.pop(page_token, None) if page_token else None
+        if page_token and search is None:
+            raise FakeJiraError(400, f"Page token {page_token} expired")
+        if search is None:
+            try:
+                query = compile_jql(jql)
+                search = _Search(
+                    candidates=self._candidates(query),
+                    match=query.matcher(),
+                    fields=list(fields) if fields is not None else None,
+                    watchers=any(
+                        clause.field == "watcher" for clause in query.clauses()
+                    ),
+                )
+            except JqlError as e:
+                raise FakeJiraError(400, f"Error in the JQL Query: {e}") from e
+
+        full = search.fields is None or "*all" in search.fields
+        limit = min(
+            max_results, MAX_FULL_SEARCH_RESULTS if full else MAX_SEARCH_RESULTS
+        )
+        issues = []
+        candidates = search.candidates
+        while search.position < len(candidates) and len(issues) < limit:
+            n = candidates[search.position]
+            search.position += 1
+            if self.is_deleted(n):
+                continue
+            issue_json = self.issue_json(n)
+            if search.match(
+                self._with_watchers(n, issue_json) if search.watchers else issue_json
+            ):
+                issues.append(self.project_fields(issue_json, search.fields))
+
+        page = {"issues": issues, "isLast": search.position >= len(candidates)}
+        if not page["isLast"]:
+            page_token = str(next(self._search_ids))
+            page["nextPageToken"] = page_token
+            with self._lock:
+                self._searches[page_token] = search
+                while len(self._searches) > MAX_OPEN_SEARCHES:
+                    self._searches.popitem(last=False)
+        return page
+
+    def _with_watchers(self, n: int, issue_json: dict) -> dict:
+        fields = issue_json["fields"]
+        watches = {**fields["watches"], "watchers": self.watchers(n)}
+        return {**issue_json, "fields": {**fields, "watches": watches}}
+
+    def _candidates(self, query: Query) -> Sequence[int]:
+        """
+        Issues a query may match, in the order of the query.
+
+        Clauses on keys, IDs, parents and creation or update times narrow the
+        issues down before they are generated and matched one by one.
+        """
+        narrowed = self._narrow(query.where) if query.where is not None else None
+        order_field, ascending = query.order_by[0] if query.order_by else ("id", True)
+        if order_field == "updated":
+            issues = range(len(self)) if narrowed is None else narrowed
+            return sorted(issues, key=self._updated.__getitem__, reverse=not ascending)
+        # IDs, keys and creation times grow together
+        if narrowed is None:
+            narrowed = range(len(self))
+        if isinstance(narrowed, range):
+            return narrowed if ascending else narrowed[::-1]
+        return sorted(narrowed, reverse=not ascending)
+
+    def _narrow(self, node) -> range | set[int] | None:
+        """
+        :return: Issues the node may match, None if it cannot narrow them.
+        """
+        if isinstance(node, And):
+            narrowed = [
+                issues
+                for issues in map(self._narrow, node.children)
+                if issues is not None
+            ]
+            if not narrowed:
+                return None
+            narrowed.sort(key=len)
+            smallest, *others = narrowed
+            return {n for n in smallest if all(n in issues for issues in others)}
+        if isinstance(node, Or):
+            narrowed = [self._narrow(child) for child in node.children]
+            if any(issues is None for issues in narrowed):
+                return None
+            return set().union(*narrowed)
+        if not isinstance(node, Clause):
+            return None
+        if node.field in ("created", "updated") and node.operator in (
+            ">",
+            ">=",
+            "<",
+            "<=",
+        ):
+            return self._narrow_time(node)
+        if node.field in ("key", "id", "parent") and node.operator in ("=", "in"):
+            values = node.value if isinstance(node.value, tuple) else (node.value,)
+            if any(isinstance(value, Function) for value in values):
+                return None
+            issues = {n for n in map(self.index, values) if n is not None}
+            if node.field == "parent":
+                return {child for n in issues for child in self.children(n)}
+            return issues
+        return None
+
+    def _narrow_time(self, clause: Clause) -> range | set[int]:
+        match = Query(where=clause).matcher()
+
+        def matches(timestamp: float) -> bool:
+            return match({"fields": {clause.field: jira_time(timestamp)}})
+
+        # matches are a suffix of the times for > and >=, a prefix for < and <=
+        after = clause.operator in (">", ">=")
+        if clause.field == "created":
+            boundary = bisect.bisect_left(
+                range(len(self)), True, key=lambda n: matches(self.created(n)) == after
+            )
+            return range(boundary, len(self)) if after else range(boundary)
+
+        if self._updated_sorted is None:
+            self._updated_sorted = sorted(self._updated)
+        times = self._updated_sorted
+        boundary = bisect.bisect_left(
+            range(len(times)), True, key=lambda i: matches(times[i]) == after
+        )
+        if after:
+            threshold = times[boundary] if boundary < len(times) else float("inf")
+            return {
+                n for n, updated in enumerate(self._updated) if updated >= threshold
+            }
+        threshold = times[boundary - 1] if boundary else float("-inf")
+        return {n for n, updated in enumerate(self._updated) if updated <= threshold}
+
+    # changes
+
+    def _record_change(
+        self, n: int, items: list[dict], author: dict | None = None
+    ) -> None:
+        changed_at = self._tick()
+        self._updated[n] = changed_at
+        self._updated_sorted = None
+        self.changes.fields.setdefault(n, {})["updated"] = jira_time(changed_at)
+        self.changes.histories.setdefault(n, []).append(
+            {
+                "id": str(next(self._history_ids)),
+                "author": author or self.users[0],
+                "created": jira_time(changed_at),
+                "items": items,
+            }
+        )
+
+    def update_fields(self, n: int, fields: dict) -> None:
+        with self._lock:
+            current = self.issue_json(n)["fields"]
+            items = []
+            for name, value in fields.items():
+                if name == "fixVersions":
+                    value = [
+                        self._versions_by_id.get(str(version.get("id")), version)
+                        for version in value
+                    ]
+                items.append(
+                    {
+                        "field": name,
+                        "fieldtype": "jira",
+                        "fieldId": name,
+                        "fromString": _display(current.get(name)),
+                        "toString": _display(value),
+                    }
+                )
+                self.changes.fields.setdefault(n, {})[name] = value
+            self._record_change(n, items)
+
+    def add_watcher(self, n: int, account_id: str) -> None:
+        with self._lock:
+            watchers = list(self.watchers(n))
+            if all(watcher["accountId"] != account_id for watcher in watchers):
+                user = next(
+                    (user for user in self.users if user["accountId"] == account_id),
+                    {"accountId": account_id, "displayName": account_id},
+                )
+                watchers.append(user)
+            # watching is not in the changelog and does not change updated
+            self.changes.watchers[n] = watchers
+
+    def simulate_activity(
+        self, issues: int, worklogs: int = 0, deleted_worklogs: int = 0, seed: int = 0
+    ) -> None:
+        """
+        Change issues and worklogs like users would between two syncs.
+
+        Most issue changes are summary and label edits the changelog fully
+        describes, every fifth one changes the status, which has to be fetched.
+        :param issues: Number of issues to change.
+        :param worklogs: Number of worklogs to edit.
+        :param deleted_worklogs: Number of worklogs to delete.
+        """
+        rng = random.Random(self.config.seed * 1000 + seed)
+        sample = rng.sample(range(len(self)), min(issues * 2, len(self)))
+        changed = [n for n in sample if not self.is_deleted(n)][:issues]
+        status_names = [status[0] for status in STATUSES]
+        with self._lock:
+            for i, n in enumerate(changed):
+                current = self.issue_json(n)["fields"]
+                if i % 5 == 4:
+                    position = status_names.index(current["status"]["name"])
+                    name, category, category_name = STATUSES[
+                        (position + 1) % len(STATUSES)
+                    ]
+                    field_id = "status"
+                    value = {
+                        "name": name,
+                        "id": str(status_names.index(name) + 1),
+                        "statusCategory": {"key": category, "name": category_name},
+                    }
+                elif i % 2:
+                    field_id, value = "labels", [*current["labels"], "benchmark"]
+                else:
+                    field_id, value = "summary", f"{current['summary']} (edited)"
+                item = {
+                    "field": field_id,
+                    "fieldtype": "jira",
+                    "fieldId": field_id,
+                    "fromString": _display(current[field_id]),
+                    "toString": _display(value),
+                }
+                self.changes.fields.setdefault(n, {})[field_id] = value
+                self._record_change(n, [item], author=self._user(n, 50 + i))
+
+            worklog_ids = self._sample_worklogs(rng, worklogs + deleted_worklogs)
+            for worklog_id in worklog_ids[:worklogs]:
+                worklog = self.worklog_json(worklog_id)
+                self.changes.worklogs[worklog_id] = {
+                    "timeSpentSeconds": worklog["timeSpentSeconds"] + 900
+                }
+                self.changes.worklogs_updated[worklog_id] = self._tick()
+            for worklog_id in worklog_ids[worklogs:]:
+                self.changes.worklogs_deleted[worklog_id] = self._tick()
+
+    def _sample_worklogs(self, rng: random.Random, count: int) -> list[int]:
+        worklog_ids: dict[int, None] = {}
+        for _ in range(count * 20):
+            if len(worklog_ids) >= count:
+                break
+            n = rng.randrange(len(self))
+            worklogs = self.worklogs(n)
+            if worklogs:
+                worklog_ids[int(rng.choice(worklogs)["id"])] = None
+        return list(worklog_ids)
+
+
+def _display(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return " ".join(filter(None, map(_display, value)))
+    if isinstance(value, dict):
+        return value.get("name") or value.get("displayName") or value.get("key")
+    return str(value)
+
+
+@dataclass
+class ServerStats:
+    requests: Counter = field(default_factory=Counter)
+    throttled: int = 0
+    bytes_sent: int = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": dict(self.requests),
+            "throttled": self.throttled,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+class FakeJiraServer(ThreadingHTTPServer):
+    """
+    HTTP server answering Jira REST requests from a ``SyntheticSite``.
+
+    Started with ``start()`` it serves from a daemon thread, so benchmarks can
+    run jiruff against it and read ``stats`` afterwards.
+    """
+
+    daemon_threads = True
+    # jiruff opens a connection per worker at once
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        site: SyntheticSite,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        throttle_ratio: float = 0.0,
+        retry_after: float = 1.0,
+    ):
+        """
+        :param site: Site to serve.
+        :param latency: Seconds every response is delayed by.
+        :param throttle_ratio: Share of requests answered with 429.
+        :param retry_after: ``Retry-After`` seconds of throttled responses.
+        """
+        super().__init__((host, port), FakeJiraHandler)
+        self.site = site
+        self.latency = latency
+        self.throttle_ratio = throttle_ratio
+        self.retry_after = retry_after
+        self.stats = ServerStats()
+        self._stats_lock = threading.Lock()
+        self._throttle_random = random.Random(site.config.seed)
+        self._bulk_tasks = itertools.count(1)
+        site.base_url = self.url
+        self.routes: list[tuple[str, re.Pattern, str, Callable]] = [
+            (
+                "GET",
+                re.compile(r"/rest/api/[23]/serverInfo"),
+                "serverInfo",
+                self.server_info,
+            ),
+            ("GET", re.compile(r"/rest/api/[23]/myself"), "myself", self.myself),
+            ("GET", re.compile(r"/rest/api/[23]/field"), "field", self.fields),
+            ("POST", re.compile(r"/rest/api/[23]/search/jql"), "search", self.search),
+            ("GET", re.compile(r"/rest/api/[23]/search/jql"), "search", self.search),
+            (
+                "POST",
+                re.compile(r"/rest/api/[23]/issue/bulkfetch"),
+                "bulkfetch",
+                self.bulk_fetch,
+            ),
+            (
+                "POST",
+                re.compile(r"/rest/api/[23]/worklog/list"),
+                "worklog/list",
+                self.worklog_list,
+            ),
+            (
+                "GET",
+                re.compile(r"/rest/api/[23]/worklog/(updated|deleted)"),
+                "worklog/feed",
+                self.worklog_feed,
+            ),
+            (
+                "POST",
+                re.compile(r"/rest/api/3/changelog/bulkfetch"),
+                "changelog",
+                self.changelogs,
+            ),
+            (
+                "POST",
+                re.compile(r"/rest/api/3/bulk/issues/fields"),
+                "bulk edit",
+                self.bulk_edit,
+            ),
+            (
+                "GET",
+                re.compile(r"/rest/api/3/bulk/queue/([^/]+)"),
+                "bulk task",
+                self.bulk_task,
+            ),
+            (
+                "GET",
+                re.compile(r"/rest/api/[23]/issue/([^/]+)/watchers"),
+                "watchers",
+                self.watchers,
+            ),
+            (
+                "POST",
+                re.compile(r"/rest/api/[23]/issue/([^/]+)/watchers"),
+                "add watcher",
+                self.add_watcher,
+            ),
+            ("GET", re.compile(r"/rest/api/[23]/issue/([^/]+)"), "issue", self.issue),
+            (
+                "PUT",
+                re.compile(r"/rest/api/[23]/issue/([^/]+)"),
+                "update",
+                self.update_issue,
+            ),
+        ]
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeJiraServer":
+        threading.Thread(
+            target=self.serve_forever, name="fake-jira", daemon=True
+        ).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def reset_stats(self) -> dict:
+        """
+        :return: Statistics since the previous reset.
+        """
+        with self._stats_lock:
+            stats, self.stats = self.stats, ServerStats()
+        return stats.snapshot()
+
+    def count(self, route: str, throttled: bool, sent: int) -> None:
+        with self._stats_lock:
+            self.stats.requests[route] += 1
+            self.stats.throttled += throttled
+            self.stats.bytes_sent += sent
+
+    def handle_error(self, request, client_address) -> None:
+        # clients drop kept-alive connections after throttled responses
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def should_throttle(self) -> bool:
+        if not self.throttle_ratio:
+            return False
+        with self._stats_lock:
+            return self._throttle_random.random() < self.throttle_ratio
+
+    def _issue_index(self, id_or_key: str) -> int:
+        n = self.site.index(id_or_key)
+        if n is None:
+            raise FakeJiraError(
+                404, "Issue does not exist or you do not have permission to see it."
+            )
+        return n
+
+    # endpoints, called with the path groups, query parameters and JSON body
+
+    def server_info(self, params: dict, body) -> dict:
+        return {
+            "baseUrl": self.url,
+            "version": "1001.0.0-SNAPSHOT",
+            "versionNumbers": [1001, 0, 0],
+            "deploymentType": "Cloud",
+            "serverTitle": "Synthetic Jira",
+        }
+
+    def myself(self, params: dict, body) -> dict:
+        return self.site.users[0]
+
+    def fields(self, params: dict, body) -> list[dict]:
+        names = self.site.issue_json(0)["fields"]
+        return [
+            {
+                "id": name,
+                "key": name,
+                "name": name,
+                "custom": name.startswith("customfield_"),
+            }
+            for name in names
+        ]
+
+    def search(self, params: dict, body) -> dict:
+        request = (
+            body
+            if body is not None
+            else {name: values[0] for name, values in params.items()}
+        )
+        fields = request.get("fields")
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        return self.site.search(
+            jql=request.get("jql") or "",
+            fields=fields,
+            max_results=int(request.get("maxResults") or 50),
+            page_token=request.get("nextPageToken"),
+        )
+
+    def bulk_fetch(self, params: dict, body) -> dict:
+        ids = body.get("issueIdsOrKeys", [])
+        if len(ids) > MAX_BULK_FETCH:
+            raise FakeJiraError(
+                400, f"At most {MAX_BULK_FETCH} issues can be fetched at once"
+            )
+        issues, errors = [], []
+        for id_or_key in ids:
+            n = self.site.index(id_or_key)
+            if n is None:
+                errors.append(id_or_key)
+                continue
+            issues.append(
+                self.site.project_fields(self.site.issue_json(n), body.get("fields"))
+            )
+        issue_errors = (
+            [
+                {
+                    "issueIdsOrKeys": errors,
+                    "errorMessage": "Issues do not exist or you do not have permission to see them.",
+                }
+            ]
+            if errors
+            else []
+        )
+        return {"expand": "schema,names", "issues": issues, "issueErrors": issue_errors}
+
+    def worklog_list(self, params: dict, body) -> list[dict]:
+        ids = body.get("ids", [])
+        if len(ids) > 1000:
+            raise FakeJiraError(400, "At most 1000 worklogs can be fetched at once")
+        return [
+            worklog
+            for worklog in (self.site.worklog_json(int(i)) for i in ids)
+            if worklog is not None
+        ]
+
+    def worklog_feed(self, change: str, params: dict, body) -> dict:
+        since = int(params.get("since", ["0"])[0])
+        return self.site.worklog_feed(change, since)
+
+    def changelogs(self, params: dict, body) -> dict:
+        changelogs = []
+        for id_or_key in body.get("issueIdsOrKeys", []):
+            n = self.site.index(id_or_key)
+            histories = self.site.changes.histories.get(n) if n is not None else None
+            if histories:
+                changelogs.append(
+                    {
+                        "issueId": str(self.site.issue_id(n)),
+                        "changeHistories": list(histories),
+                    }
+                )
+        return {"issueChangeLogs": changelogs}
+
+    def bulk_edit(self, params: dict, body) -> dict:
+        version_fields = body["editedFieldsInput"]["multipleVersionPickerFields"]
+        versions = [
+            {"id": version_id}
+            for version_field in version_fields
+            for version_id in version_field["versionIds"]
+        ]
+        for id_or_key in body.get("selectedIssueIdsOrKeys", []):
+            n = self.site.index(id_or_key)
+            if n is not None:
+                self.site.update_fields(n, {"fixVersions": versions})
+        return {"taskId": str(next(self._bulk_tasks))}
+
+    def bulk_task(self, task_id: str, params: dict, body) -> dict:
+        return {
+            "taskId": task_id,
+            "status": "COMPLETE",
+            "failedAccessibleIssues": {},
+            "invalidOrInaccessibleIssueCount": 0,
+            "progressPercent": 100,
+        }
+
+    def watchers(self, id_or_key: str, params: dict, body) -> dict:
+        watchers = self.site.watchers(self._issue_index(id_or_key))
+        return {"watchCount": len(watchers), "isWatching": False, "watchers": watchers}
+
+    def add_watcher(self, id_or_key: str, params: dict, body) -> None:
+        self.site.add_watcher(self._issue_index(id_or_key), str(body))
+
+    def issue(self, id_or_key: str, params: dict, body) -> dict:
+        issue_json = self.site.issue_json(self._issue_index(id_or_key))
+        fields = params.get("fields", ["*all"])[0].split(",")
+        issue_json = self.site.project_fields(issue_json, fields)
+        if "properties" in params:
+            issue_json["properties"] = {}
+        return issue_json
+
+    def update_issue(self, id_or_key: str, params: dict, body) -> None:
+        self.site.update_fields(self._issue_index(id_or_key), body.get("fields", {}))
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeJiraServer
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def _dispatch(self, method: str) -> None:
+        path, _, query = self.path.partition("?")
+        # the jira client joins resource paths with an extra slash
+        path = re.sub("/{2,}", "/", path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        route, endpoint, groups = "unknown", None, ()
+        for route_method, pattern, name, handler in self.server.routes:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                route, endpoint, groups = name, handler, match.groups()
+                break
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if endpoint is not None and self.server.should_throttle():
+            self._send(
+                429, {"errorMessages": ["Rate limit exceeded"]}, route, throttled=True
+            )
+            return
+        if endpoint is None:
+            self._send(404, {"errorMessages": [f"No endpoint {method} {path}"]}, route)
+            return
+        try:
+            body = orjson.loads(raw_body) if raw_body else None
+            result = endpoint(*groups, params=parse_qs(query), body=body)
+        except FakeJiraError as e:
+            self._send(e.status, {"errorMessages": [str(e)], "errors": {}}, route)
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(
+                400, {"errorMessages": [f"Bad request: {e}"], "errors": {}}, route
+            )
+            return
+        self._send(204 if result is None else 200, result, route)
+
+    def _send(self, status: int, payload, route: str, throttled: bool = False) -> None:
+        data = orjson.dumps(payload) if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        if throttled:
+            self.send_header("Retry-After", f"{self.server.retry_after:g}")
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(route, throttled, len(data))
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def site_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the options of the synthetic site and the served latency.
+    """
+    parser.add_argument("--issues", type=int, default=10_000, help="Issues of the site")
+    parser.add_argument("--projects", type=int, default=4, help="Projects of the site")
+    parser.add_argument(
+        "--worklogs-per-issue",
+        type=float,
+        default=2.0,
+        help="Average worklogs per issue",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=1, help="Seed of the synthetic data"
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="Delay of every response"
+    )
+    parser.add_argument(
+        "--throttle",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with 429",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=1.0,
+        help="Retry-After of throttled responses",
+    )
+
+
+def site_from_arguments(args: argparse.Namespace) -> SyntheticSite:
+    return SyntheticSite(
+        SiteConfig(
+            issues=args.issues,
+            projects=args.projects,
+            worklogs_per_issue=args.worklogs_per_issue,
+            seed=args.seed,
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    site_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    site = site_from_arguments(args)
+    server = FakeJiraServer(
+        site,
+        host=args.host,
+        port=args.port,
+        latency=args.latency_ms / 1000,
+        throttle_ratio=args.throttle,
+        retry_after=args.retry_after,
+    )
+    print(
+        f"Serving {len(site)} synthetic issues on {server.url} "
+        f"(generated in {time.perf_counter() - started:.1f}s)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,41 @@
 import argparse
 import sys
-from typing import Type
+from typing import Sequence
 
-from jiruff.base.commands import BaseCommandHandler
-from jiruff.commands.check import CheckCommand
-from jiruff.commands.format import FormatCommand
-from jiruff.commands.freeze import FreezeCommand
-from jiruff.commands.sync import SyncCommand
+from jiruff.commands import COMMANDS
+from jiruff.commands import CommandEntry
 
 
 def add_command(
-    command: Type[BaseCommandHandler],
+    command: CommandEntry,
     subparsers: argparse._SubParsersAction,
+    selected: bool,
 ) -> None:
-    parser = subparsers.add_parser(
-        name=command.command_name, help=command.command_description
-    )
+    """
+    Add the parser of a command.
+
+    Only the selected command is imported to add its arguments and handler,
+    the others are listed in the help by their description.
+    """
+    parser = subparsers.add_parser(name=command.name, help=command.description)
+    if not selected:
+        return
+    handler = command.load()
     parser.add_argument(
         "-c",
         "--config",
         required=False,
         help="TOML configuration file",
     )
-    parser.set_defaults(func=command())
+    handler.add_arguments(parser)
+    parser.set_defaults(func=handler())
+
+
+def selected_command(argv: Sequence[str]) -> str | None:
+    """
+    Name of the command on the command line, global options take no values.
+    """
+    return next((arg for arg in argv if not arg.startswith("-")), None)
 
 
 def main() -> None:
@@ -34,10 +47,9 @@ def main() -> None:
     subparsers = parser.add_subparsers(
         title="Commands", dest="command", required=True, help="Available commands"
     )
-    add_command(CheckCommand, subparsers)
-    add_command(FormatCommand, subparsers)
-    add_command(SyncCommand, subparsers)
-    add_command(FreezeCommand, subparsers)
+    command_name = selected_command(sys.argv[1:])
+    for command in COMMANDS:
+        add_command(command, subparsers, selected=command.name == command_name)
 
     # Parse arguments and dispatch
     args = parser.parse_args()
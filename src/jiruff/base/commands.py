@@ -1,12 +1,23 @@
 import abc
+import logging
+from argparse import ArgumentParser
 from argparse import Namespace
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from jiruff.base.services.cloud_jira import JiraService
 from jiruff.config import Config
+from jiruff.config import ask_jira_token
 from jiruff.config import load_config
-from jiruff.services.cloud_jira import CloudJiraService
-from jiruff.services.local_jira import LocalJiraService
+
+# services pull in jira and requests, they are imported by the commands
+# initializing them to keep the CLI startup fast
+if TYPE_CHECKING:
+    from jiruff.base.services.cloud_jira import JiraService
+    from jiruff.services.async_cloud_jira import AsyncCloudJiraService
+    from jiruff.services.local_jira import LocalJiraService
+    from jiruff.services.rate_limit import SharedRequestBudget
+
+logger = logging.getLogger(__name__)
 
 
 class BaseCommandHandler(abc.ABC):
@@ -20,8 +31,17 @@ class BaseCommandHandler(abc.ABC):
     def __init__(self):
         super().__init__()
         self.config: Config | None = None
-        self.jira: JiraService | None = None
-        self.local_jira: LocalJiraService | None = None
+        self.jira: "JiraService | None" = None
+        self.local_jira: "LocalJiraService | None" = None
+
+    @classmethod
+    def add_arguments(cls, parser: ArgumentParser) -> None:
+        """
+        Add command specific arguments to the command parser.
+
+        :param parser: Parser of the command.
+        """
+        pass
 
     def _load_config(self, args: Namespace) -> None:
         """
@@ -41,19 +61,127 @@ class BaseCommandHandler(abc.ABC):
         else:
             self.config = load_config()
 
-    def _init_jira(self):
-        jira_service = CloudJiraService()
-        jira_service.auth(
+    def _init_jira(
+        self,
+        max_connections: int | None = None,
+        cache: bool = False,
+        rate_budget: "SharedRequestBudget | None" = None,
+    ):
+        """
+        Initialize Jira service.
+
+        :param max_connections: Number of threads sharing the service, the
+            default size of the HTTP connection pool.
+        :param cache: Whether read responses may be served from the on-disk
+            cache, for commands that tolerate data a few minutes old.
+        :param rate_budget: Request budget shared with the services of other
+            companies, the company is its tenant.
+        """
+        from jira import JIRAError
+        from requests import Response
+
+        from jiruff.config.credentials import CredentialCache
+        from jiruff.config.credentials import CredentialsConfig
+        from jiruff.local.paths import HTTP_CACHE_DIR
+        from jiruff.services.cloud_jira import CloudJiraService
+        from jiruff.services.http import HttpSessionConfig
+        from jiruff.services.http_cache import ResponseCache
+        from jiruff.services.http_cache import ResponseCacheConfig
+        from jiruff.services.rate_limit import AdaptiveRateLimiter
+        from jiruff.services.rate_limit import RateLimiterConfig
+
+        rate_limiter_config = RateLimiterConfig.model_validate(
+            self.config.get_config_dict("rate_limit")
+        )
+        http_config = HttpSessionConfig.model_validate(
+            self.config.get_config_dict("http")
+        )
+        cache_config = ResponseCacheConfig.model_validate(
+            self.config.get_config_dict("response_cache")
+        )
+        response_cache = None
+        if cache and cache_config.enabled:
+            response_cache = ResponseCache(
+                HTTP_CACHE_DIR / "responses.sqlite", cache_config
+            )
+        credentials_config = CredentialsConfig.model_validate(
+            self.config.get_config_dict("credentials")
+        )
+        credentials = CredentialCache()
+
+        while True:
+            jira_service = CloudJiraService(
+                rate_limiter=AdaptiveRateLimiter(
+                    rate_limiter_config, budget=rate_budget, tenant=self.config.company
+                ),
+                http_config=http_config,
+                workers=max_connections,
+                response_cache=response_cache,
+            )
+            auth = (self.config.jira_url, self.config.jira_user, self.config.jira_token)
+            try:
+                jira_service.auth(*auth)
+                if not credentials.is_fresh(*auth, credentials_config.validation_ttl):
+                    jira_service.jira.myself()
+                    credentials.validated(*auth)
+                break
+            except JIRAError as je:
+                if je.status_code != 401:
+                    raise
+                credentials.invalidate(*auth)
+                if self.config.jira_token_source != "keyring":
+                    raise
+                logger.info("Old JIRA token is not valid for auth. Need to ask new one")
+                ask_jira_token(self.config)
+
+        # credentials trusted from the cache are validated again by the next
+        # run once Jira rejects them
+        def forget_rejected(response: Response, *args, **kwargs) -> None:
+            if response.status_code == 401:
+                credentials.invalidate(*auth)
+
+        # noinspection PyProtectedMember
+        jira_service.jira._session.hooks["response"].append(forget_rejected)
+        self.jira = jira_service
+
+    async def _init_async_jira(self, max_connections: int) -> "AsyncCloudJiraService":
+        """
+        Initialize an asyncio Jira service sharing the rate limiter of the
+        blocking one, close it when done.
+
+        :param max_connections: Maximum number of requests in flight.
+        """
+        from jiruff.services.async_cloud_jira import AsyncCloudJiraService
+
+        jira_service = AsyncCloudJiraService(
+            rate_limiter=self.jira.rate_limiter,
+            http_config=self.jira.http_config,
+            max_connections=max_connections,
+            response_cache=self.jira.response_cache,
+        )
+        await jira_service.auth(
             url=self.config.jira_url,
             username=self.config.jira_user,
             token=self.config.jira_token,
         )
-        self.jira = jira_service
+        return jira_service
 
     def _init_local_jira(self):
-        self.local_jira = LocalJiraService(
-            local_dir_path=Path.home() / ".jiruff/issues" / self.config.company,
+        from jiruff.local.storage import LocalStorageConfig
+        from jiruff.local.storage import open_delta_store
+        from jiruff.local.storage import open_issue_store
+        from jiruff.services.local_jira import LocalJiraService
+
+        storage_config = LocalStorageConfig.model_validate(
+            self.config.get_config_dict("local")
         )
+        with (
+            open_issue_store(self.config.company, storage_config) as issue_store,
+            open_delta_store(self.config.company, storage_config) as delta_store,
+        ):
+            self.local_jira = LocalJiraService(
+                issue_store=issue_store, delta_store=delta_store
+            )
 
     @abc.abstractmethod
     def __call__(self, *args, **kwargs):
@@ -0,0 +1,51 @@
+import abc
+
+from jiruff.base.services.cloud_jira import JiraService
+from jiruff.services.write_executor import JiraWriteExecutor
+
+
+class FormatRule(abc.ABC):
+    """
+    Formatter rule run by ``jiruff.rules.engine.RuleEngine``.
+
+    Instead of searching Jira itself, a rule declares JQL conditions selecting
+    its candidate issues and the issue fields it reads. The engine fetches the
+    candidates of all rules together and hands every rule pages of the issues
+    matching its conditions.
+    """
+
+    rule_key: str
+    # issue fields read from the candidates, None for all of them
+    fields: tuple[str, ...] | None = None
+
+    def __init__(self, jira: JiraService, writer: JiraWriteExecutor | None = None):
+        self.jira = jira
+        # without a shared writer the rule applies its own writes after the run
+        self._owns_writer = writer is None
+        self.writer = writer if writer is not None else JiraWriteExecutor(jira)
+
+    @abc.abstractmethod
+    def candidate_queries(self) -> dict[str, str]:
+        """
+        :return: JQL conditions of the candidate issues by query name.
+        """
+        pass
+
+    @abc.abstractmethod
+    def process(self, query_name: str, issues: list) -> None:
+        """
+        Handle a page of candidates.
+        :param query_name: Name of the query the issues match.
+        :param issues: Issues fetched with the declared fields.
+        """
+        pass
+
+    def run(self) -> None:
+        """
+        Run the rule on its own.
+        """
+        from jiruff.rules.engine import RuleEngine
+
+        RuleEngine(self.jira, [self]).run()
+        if self._owns_writer:
+            self.writer.execute().log()
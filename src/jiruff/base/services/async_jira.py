@@ -0,0 +1,58 @@
+import abc
+from typing import AsyncIterator
+
+from jira.resources import Issue
+
+
+class AsyncJiraService(abc.ABC):
+    @abc.abstractmethod
+    async def auth(self, server: str, user: str, token: str):
+        pass
+
+    @abc.abstractmethod
+    async def get_all_issues_by_jql(
+        self, jql: str, num_results: int = 0, fields: list[str] | None = None
+    ) -> list[Issue]:
+        pass
+
+    @abc.abstractmethod
+    def iter_issues_by_jql(
+        self, jql: str, fields: list[str] | None = None
+    ) -> AsyncIterator[Issue]:
+        pass
+
+    @abc.abstractmethod
+    async def get_json(self, path: str, data: dict) -> dict:
+        pass
+
+    @abc.abstractmethod
+    async def get_full_issue_json(
+        self, issue_id: int, fields: list[str] | None = None
+    ) -> dict | None:
+        pass
+
+    @abc.abstractmethod
+    async def get_full_issues_json(
+        self, issue_ids: list[int], fields: list[str] | None = None
+    ) -> list[dict]:
+        pass
+
+    @abc.abstractmethod
+    async def add_watcher(self, issue_id: str, watcher_id: str):
+        pass
+
+    @abc.abstractmethod
+    async def update_issue_fields(
+        self, issue_key: str, fields: dict, notify: bool = True
+    ):
+        pass
+
+    @abc.abstractmethod
+    async def aclose(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
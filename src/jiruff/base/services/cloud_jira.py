@@ -1,5 +1,9 @@
 import abc
 from typing import Callable
+from typing import Iterator
+from typing import Literal
+
+from jira.resources import Issue
 
 
 class JiraService(abc.ABC):
@@ -8,25 +12,79 @@ class JiraService(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def get_all_issues_by_jql(self, jql: str, num_results: int = 0):
+    def get_all_issues_by_jql(
+        self, jql: str, num_results: int = 0, fields: list[str] | None = None
+    ):
+        pass
+
+    @abc.abstractmethod
+    def iter_issues_by_jql(
+        self, jql: str, fields: list[str] | None = None
+    ) -> Iterator[Issue]:
         pass
 
     @abc.abstractmethod
     def get_all_children(self, key: str):
         pass
 
+    @abc.abstractmethod
+    def get_children_by_parent(
+        self, keys: list[str], fields: list[str] | None = None
+    ) -> dict[str, list]:
+        pass
+
     @abc.abstractmethod
     def get_json(self, path: str, data: dict) -> dict:
         pass
 
     @abc.abstractmethod
-    def get_full_issue_json(self, issue_id: int) -> dict:
+    def iter_worklog_changes(
+        self, change: Literal["updated", "deleted"], since: int
+    ) -> Iterator[tuple[list[int], int]]:
+        """
+        Stream pages of a worklog change feed.
+        :return: Worklog IDs of every page and the time the feed is read up to.
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_full_issue_json(
+        self, issue_id: int, fields: list[str] | None = None
+    ) -> dict:
+        pass
+
+    @abc.abstractmethod
+    def get_full_issues_json(
+        self, issue_ids: list[int], fields: list[str] | None = None
+    ) -> list[dict]:
+        pass
+
+    @abc.abstractmethod
+    def get_issue_changelogs(self, issue_ids: list[int]) -> dict[int, list[dict]]:
+        """
+        Fetch change histories of issues.
+        :return: Change histories by issue ID, oldest first.
+        """
         pass
 
     @abc.abstractmethod
     def add_watcher(self, issue_id: str, watcher_id: str):
         pass
 
+    @abc.abstractmethod
+    def update_issue_fields(self, issue_key: str, fields: dict, notify: bool = True):
+        pass
+
+    @abc.abstractmethod
+    def bulk_update_issue_fields(
+        self, issue_keys: list[str], fields: dict, notify: bool = True
+    ) -> dict[str, str] | None:
+        """
+        Set the same fields of many issues at once.
+        :return: Errors by issue key, or None if the fields cannot be bulk edited.
+        """
+        pass
+
     @abc.abstractmethod
     def get_all_issues(self, filter_func: Callable[[dict], bool]):
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,59 @@
+import abc
+from typing import Iterable
+from typing import Iterator
+
+
+class RecordStore(abc.ABC):
+    """
+    Base class for local mirror storages.
+
+    A record is an opaque JSON document identified by its integer Jira ID
+    (issue ID or worklog ID).
+    """
+
+    @abc.abstractmethod
+    def get(self, record_id: int) -> bytes | None:
+        pass
+
+    @abc.abstractmethod
+    def contains(self, record_id: int) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def put(self, record_id: int, data: bytes) -> None:
+        pass
+
+    def put_many(self, records: Iterable[tuple[int, bytes]]) -> None:
+        for record_id, data in records:
+            self.put(record_id, data)
+
+    @abc.abstractmethod
+    def delete(self, record_id: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    def ids(self) -> Iterator[int]:
+        pass
+
+    @abc.abstractmethod
+    def scan(self) -> Iterator[tuple[int, bytes]]:
+        """
+        Iterate over all live records in the storage order.
+        """
+        pass
+
+    @abc.abstractmethod
+    def flush(self) -> None:
+        """
+        Make all written records durable.
+        """
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,69 @@
+import importlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Type
+
+if TYPE_CHECKING:
+    from jiruff.base.commands import BaseCommandHandler
+
+
+@dataclass(frozen=True)
+class CommandEntry:
+    """
+    Command known to the CLI without importing its module.
+
+    ``description`` repeats the ``command_description`` of the handler, so the
+    CLI help is built without importing any command.
+    """
+
+    name: str
+    module: str
+    handler: str
+    description: str
+
+    def load(self) -> Type["BaseCommandHandler"]:
+        return getattr(importlib.import_module(self.module), self.handler)
+
+
+COMMANDS = (
+    CommandEntry(
+        name="check",
+        module="jiruff.commands.check",
+        handler="CheckCommand",
+        description="Run checks for GitLab and Jira instances.",
+    ),
+    CommandEntry(
+        name="format",
+        module="jiruff.commands.format",
+        handler="FormatCommand",
+        description="Format gitlab and jira instance according to the configuration.",
+    ),
+    CommandEntry(
+        name="sync",
+        module="jiruff.commands.sync",
+        handler="SyncCommand",
+        description="Synchronize data between GitLab and Jira instances.",
+    ),
+    CommandEntry(
+        name="freeze",
+        module="jiruff.commands.freeze",
+        handler="FreezeCommand",
+        description=(
+            "Stop editing and time tracking for the task and all its children."
+        ),
+    ),
+    CommandEntry(
+        name="migrate",
+        module="jiruff.commands.migrate",
+        handler="MigrateCommand",
+        description="Migrate the local mirror to another storage backend.",
+    ),
+    CommandEntry(
+        name="serve",
+        module="jiruff.commands.serve",
+        handler="ServeCommand",
+        description=(
+            "Serve check, format and report requests from a warm in-memory mirror."
+        ),
+    ),
+)
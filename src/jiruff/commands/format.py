@@ -1,13 +1,52 @@
+import asyncio
 from argparse import Namespace
 from typing import Literal
 
 from jiruff.base.commands import BaseCommandHandler
+from jiruff.base.rules import FormatRule
+from jiruff.base.services.cloud_jira import JiraService
+from jiruff.config import Config
+from jiruff.rules.engine import RuleEngine
 from jiruff.rules.format.issues_001_versions_propagation import (
     FormatIssues001VersionPropagation,
 )
-from jiruff.rules.format.issues_002_child_parent_alignment_version import \
-    FormatIssues002ChildParentAlignmentVersion
 from jiruff.rules.format.issues_007_auto_watch import FormatIssues007AutoWatch
+from jiruff.services.write_executor import JiraWriteExecutor
+from jiruff.services.write_executor import WriteExecutorConfig
+from jiruff.services.write_executor import WriteSummary
+
+
+def format_rules(
+    config: Config, jira: JiraService, writer: JiraWriteExecutor
+) -> list[FormatRule]:
+    """
+    Formatter rules enabled for the company.
+    :param config: Company configuration.
+    :param jira: Service the rules read issues from.
+    :param writer: Writer queueing the changes of all rules.
+    """
+    issues_001 = FormatIssues001VersionPropagation(
+        jira=jira,
+        rule_config=config.get_config_dict(FormatIssues001VersionPropagation.rule_key),
+        writer=writer,
+    )
+
+    # disabled, import it from
+    # jiruff.rules.format.issues_002_child_parent_alignment_version to enable
+    # issues_002 = FormatIssues002ChildParentAlignmentVersion(
+    #     jira=jira,
+    #     rule_config=config.get_config_dict(
+    #         FormatIssues002ChildParentAlignmentVersion.rule_key
+    #     ),
+    #     writer=writer,
+    # )
+
+    issues_007 = FormatIssues007AutoWatch(
+        jira=jira,
+        rule_config=config.get_config_dict(FormatIssues007AutoWatch.rule_key),
+        writer=writer,
+    )
+    return [issues_001, issues_007]
 
 
 class FormatCommand(BaseCommandHandler):
@@ -31,26 +70,25 @@ class FormatCommand(BaseCommandHandler):
         :return: Result of the command execution.
         """
         self._load_config(args)
-        self._init_jira()
-
-        issues_001 = FormatIssues001VersionPropagation(
-            jira=self.jira,
-            rule_config=self.config.get_config_dict(
-                FormatIssues001VersionPropagation.rule_key
-            ),
-        )
-        issues_001.run()
-
-        # issues_002 = FormatIssues002ChildParentAlignmentVersion(
-        #     jira=self.jira,
-        #     rule_config=self.config.get_config_dict(
-        #         FormatIssues002ChildParentAlignmentVersion.rule_key
-        #     )
-        # )
-        # issues_002.run()
-
-        issues_007 = FormatIssues007AutoWatch(
-            jira=self.jira,
-            rule_config=self.config.get_config_dict(FormatIssues007AutoWatch.rule_key),
+        write_config = WriteExecutorConfig.model_validate(
+            self.config.get_config_dict("writes")
         )
-        issues_007.run()
+        self._init_jira(max_connections=write_config.max_workers, cache=True)
+        writer = JiraWriteExecutor(jira=self.jira, config=write_config)
+        rules = format_rules(self.config, self.jira, writer)
+
+        # candidates of all rules are fetched together
+        RuleEngine(jira=self.jira, rules=rules).run()
+
+        if write_config.engine == "asyncio":
+            summary = asyncio.run(self._execute_async(writer, write_config.max_workers))
+        else:
+            summary = writer.execute()
+        summary.log()
+        self.jira.log_stats()
+
+    async def _execute_async(
+        self, writer: JiraWriteExecutor, max_connections: int
+    ) -> WriteSummary:
+        async with await self._init_async_jira(max_connections) as async_jira:
+            return await writer.execute_async(async_jira)
@@ -0,0 +1,140 @@
+import logging
+from argparse import ArgumentParser
+from argparse import Namespace
+from typing import Literal
+
+from jiruff.base.commands import BaseCommandHandler
+from jiruff.local.compression import train_dictionary
+from jiruff.local.storage import LocalStorageConfig
+from jiruff.local.storage import migrate_store
+from jiruff.local.storage import open_delta_store
+from jiruff.local.storage import open_issue_store
+from jiruff.local.storage import open_timesheet_store
+
+logger = logging.getLogger(__name__)
+
+
+class MigrateCommand(BaseCommandHandler):
+    """
+    Command to move the local mirror between storage backends.
+    """
+
+    command_name: Literal["migrate"] = "migrate"
+    command_description: str = "Migrate the local mirror to another storage backend."
+
+    @classmethod
+    def add_arguments(cls, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--to",
+            dest="backend",
+            choices=["files", "segments"],
+            default="segments",
+            help="Target storage backend",
+        )
+        parser.add_argument(
+            "--delete-source",
+            action="store_true",
+            help="Remove migrated records from the source storage",
+        )
+        parser.add_argument(
+            "--compact",
+            action="store_true",
+            help="Compact segment storage instead of migrating",
+        )
+        parser.add_argument(
+            "--train-dictionary",
+            action="store_true",
+            help=(
+                "Train zstd dictionaries on the local mirror and recompress it "
+                "instead of migrating"
+            ),
+        )
+
+    def __call__(self, args: Namespace) -> None:
+        """
+        Method to handle the migrate command.
+        :param args: Command line arguments.
+        """
+        self._load_config(args)
+        storage_config = LocalStorageConfig.model_validate(
+            self.config.get_config_dict("local")
+        )
+        company = self.config.company
+
+        if args.train_dictionary:
+            self._train_dictionaries(company, storage_config)
+            return
+
+        if args.compact:
+            segments_config = storage_config.model_copy(update={"backend": "segments"})
+            for open_store in (
+                open_issue_store,
+                open_timesheet_store,
+                open_delta_store,
+            ):
+                with open_store(company, segments_config) as store:
+                    reclaimed = store.compact()
+                    logger.info(f"Compacted {company} storage: {reclaimed} bytes freed")
+            return
+
+        source_backend = "segments" if args.backend == "files" else "files"
+        source_config = storage_config.model_copy(update={"backend": source_backend})
+        target_config = storage_config.model_copy(update={"backend": args.backend})
+        for name, open_store in (
+            ("issues", open_issue_store),
+            ("timesheets", open_timesheet_store),
+            ("deltas", open_delta_store),
+        ):
+            with (
+                open_store(company, source_config) as source,
+                open_store(company, target_config) as target,
+            ):
+                migrated = migrate_store(
+                    source, target, delete_source=args.delete_source
+                )
+                logger.info(
+                    f"Migrated {migrated} {company} {name} "
+                    f"from {source_backend} to {args.backend}"
+                )
+                if args.delete_source and source_backend == "segments":
+                    # deleted segment records are tombstones until compacted
+                    reclaimed = source.compact()
+                    logger.info(f"Compacted {company} {name}: {reclaimed} bytes freed")
+
+        if storage_config.backend != args.backend:
+            logger.info(
+                f'Set `backend = "{args.backend}"` in the [local] section '
+                f"of the configuration to use the migrated mirror."
+            )
+
+    @staticmethod
+    def _train_dictionaries(company: str, storage_config: LocalStorageConfig) -> None:
+        """
+        Train a dictionary per storage of the mirror and rewrite its records
+        compressed with it.
+        """
+        zstd_config = storage_config.model_copy(update={"compression": "zstd"})
+        for name, open_store in (
+            ("issues", open_issue_store),
+            ("timesheets", open_timesheet_store),
+            ("deltas", open_delta_store),
+        ):
+            with open_store(company, zstd_config) as store:
+                dictionary = train_dictionary(store)
+                if dictionary is None:
+                    continue
+                dict_id = store.dictionaries.add(dictionary)
+                recompressed = store.recompress()
+                logger.info(
+                    f"Recompressed {recompressed} {company} {name} "
+                    f"with dictionary {dict_id}"
+                )
+                if storage_config.backend == "segments":
+                    reclaimed = store.compact()
+                    logger.info(f"Compacted {company} {name}: {reclaimed} bytes freed")
+
+        if storage_config.compression != "zstd":
+            logger.info(
+                'Set `compression = "zstd"` in the [local] section '
+                "of the configuration to keep new records compressed."
+            )
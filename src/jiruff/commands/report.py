@@ -1,7 +1,7 @@
 from argparse import Namespace
 from typing import Literal
 
-from jiruff import BaseCommandHandler
+from jiruff.base.commands import BaseCommandHandler
 
 
 class ReportCommand(BaseCommandHandler):
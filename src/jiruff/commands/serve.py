@@ -0,0 +1,402 @@
+import hashlib
+import hmac
+import json
+import logging
+import signal
+import socketserver
+import threading
+import time
+from argparse import ArgumentParser
+from argparse import Namespace
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Literal
+
+import orjson
+from pydantic import BaseModel
+from pydantic import Field
+
+from jiruff.base.commands import BaseCommandHandler
+from jiruff.base.rules import FormatRule
+from jiruff.commands.format import format_rules
+from jiruff.local.jql import SEARCH_UNAVAILABLE_FIELDS
+from jiruff.local.jql import JqlError
+from jiruff.local.jql import compile_jql
+from jiruff.local.paths import SERVE_SOCKET_FILE
+from jiruff.local.storage import LocalStorageConfig
+from jiruff.local.storage import open_timesheet_store
+from jiruff.rules.engine import RuleEngine
+from jiruff.services.daemon_client import DaemonClient
+from jiruff.services.write_executor import JiraWriteExecutor
+from jiruff.services.write_executor import WriteExecutorConfig
+from jiruff.services.write_executor import WriteSummary
+
+logger = logging.getLogger(__name__)
+
+ISSUE_EVENTS = ("jira:issue_created", "jira:issue_updated")
+WORKLOG_EVENTS = ("worklog_created", "worklog_updated")
+
+
+def needs_jira(rule: FormatRule) -> bool:
+    """
+    Whether conditions of a rule read data the mirror does not keep, like
+    watchers missing from issue JSON.
+    """
+    for jql in rule.candidate_queries().values():
+        try:
+            clauses = compile_jql(jql).clauses()
+        except JqlError:
+            return True
+        if any(clause.field in SEARCH_UNAVAILABLE_FIELDS for clause in clauses):
+            return True
+    return False
+
+
+class ServeConfig(BaseModel):
+    socket: Path = Field(
+        default=SERVE_SOCKET_FILE,
+        description="Unix socket the daemon answers requests on.",
+    )
+    webhook_host: str = Field(
+        default="127.0.0.1", description="Address of the Jira webhook endpoint."
+    )
+    webhook_port: int = Field(
+        default=8765,
+        ge=0,
+        description="Port of the Jira webhook endpoint, 0 to disable it.",
+    )
+    webhook_secret: str | None = Field(
+        default=None,
+        description="Secret of the Jira webhook, deliveries are verified with it.",
+    )
+
+
+class ServeCommand(BaseCommandHandler):
+    """
+    Daemon keeping the Jira session and the local mirror indexes warm.
+
+    Requests are JSON lines on a Unix socket, see ``DaemonClient``:
+
+    * ``check`` runs the formatter rules on the in-memory mirror and reports
+      the writes ``format`` would make,
+    * ``format`` runs them and applies the writes through the kept session,
+    * ``report`` summarizes issues matching a ``jql`` parameter and the time
+      logged on them,
+    * ``stats`` reports the state of the daemon.
+
+    Jira webhooks posted to ``/webhook`` update the issue and worklog indexes
+    in place. The changes are not written to the mirror on disk, ``sync``
+    keeps doing that.
+    """
+
+    command_name: Literal["serve"] = "serve"
+    command_description: str = (
+        "Serve check, format and report requests from a warm in-memory mirror."
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.serve_config: ServeConfig | None = None
+        self.write_config: WriteExecutorConfig | None = None
+        # worklog ID -> (issue ID, seconds logged)
+        self.worklogs: dict[int, tuple[int, int]] = {}
+        self.time_spent: Counter[int] = Counter()
+        self.events = 0
+        self.started_at = time.time()
+        # webhook updates and rule runs do not see the indexes half changed
+        self._lock = threading.RLock()
+
+    @classmethod
+    def add_arguments(cls, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--socket",
+            type=Path,
+            default=None,
+            help="Unix socket of the daemon, overrides the configuration",
+        )
+        parser.add_argument(
+            "--send",
+            choices=["check", "format", "report", "stats"],
+            default=None,
+            help="Send a request to the running daemon and print its result",
+        )
+        parser.add_argument(
+            "--jql", default=None, help="Issues to report on, with --send report"
+        )
+
+    def __call__(self, args: Namespace) -> None:
+        """
+        Method to handle the serve command.
+        :param args: Command line arguments.
+        """
+        if args.send is not None:
+            params = {"jql": args.jql} if args.jql else {}
+            with DaemonClient(args.socket or SERVE_SOCKET_FILE) as client:
+                result = client.request(args.send, **params)
+            print(json.dumps(result, indent=2))
+            return
+
+        self._load_config(args)
+        self.serve_config = ServeConfig.model_validate(
+            self.config.get_config_dict("serve")
+        )
+        if args.socket is not None:
+            self.serve_config.socket = args.socket
+        self.write_config = WriteExecutorConfig.model_validate(
+            self.config.get_config_dict("writes")
+        )
+        self._init_jira(max_connections=self.write_config.max_workers)
+        self._init_local_jira()
+        self._load_worklogs()
+        logger.info(
+            f"Loaded {len(self.local_jira)} issues and {len(self.worklogs)} worklogs"
+        )
+
+        webhook_server = None
+        if self.serve_config.webhook_port:
+            webhook_server = self._start_webhook_server()
+        socket_server = self._socket_server()
+        logger.info(f"Serving requests on {self.serve_config.socket}")
+        # stop on SIGTERM like on Ctrl+C, so the socket is removed
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            socket_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_server.server_close()
+            self.serve_config.socket.unlink(missing_ok=True)
+            if webhook_server is not None:
+                webhook_server.shutdown()
+                webhook_server.server_close()
+            self.jira.log_stats()
+
+    def _load_worklogs(self) -> None:
+        storage_config = LocalStorageConfig.model_validate(
+            self.config.get_config_dict("local")
+        )
+        with open_timesheet_store(self.config.company, storage_config) as store:
+            for _, data in store.scan():
+                self._index_worklog(orjson.loads(data))
+
+    def _index_worklog(self, worklog: dict) -> None:
+        self._unindex_worklog(int(worklog["id"]))
+        issue_id = int(worklog["issueId"])
+        seconds = int(worklog.get("timeSpentSeconds") or 0)
+        self.worklogs[int(worklog["id"])] = (issue_id, seconds)
+        self.time_spent[issue_id] += seconds
+
+    def _unindex_worklog(self, worklog_id: int) -> None:
+        indexed = self.worklogs.pop(worklog_id, None)
+        if indexed is not None:
+            issue_id, seconds = indexed
+            self.time_spent[issue_id] -= seconds
+
+    def apply_event(self, event: dict) -> bool:
+        """
+        Update the indexes with a Jira webhook event.
+        :param event: Webhook payload.
+        :return: False for events the daemon does not index.
+        """
+        event_type = event.get("webhookEvent")
+        with self._lock:
+            if event_type in ISSUE_EVENTS:
+                issue_json = event["issue"]
+                # webhook payloads lack expanded fields like the watchers list
+                stored = self.local_jira.get_full_issue_json(int(issue_json["id"]))
+                if stored is not None:
+                    issue_json = {
+                        **issue_json,
+                        "fields": {**stored["fields"], **issue_json["fields"]},
+                    }
+                    watches = issue_json["fields"].get("watches") or {}
+                    if "watchers" not in watches and "watches" in stored["fields"]:
+                        issue_json["fields"]["watches"] = stored["fields"]["watches"]
+                self.local_jira.upsert_issue(issue_json)
+            elif event_type == "jira:issue_deleted":
+                self.local_jira.remove_issue(int(event["issue"]["id"]))
+            elif event_type in WORKLOG_EVENTS:
+                self._index_worklog(event["worklog"])
+            elif event_type == "worklog_deleted":
+                self._unindex_worklog(int(event["worklog"]["id"]))
+            else:
+                return False
+            self.events += 1
+        logger.debug(f"Applied {event_type} webhook event")
+        return True
+
+    def handle(self, request: dict) -> dict:
+        """
+        Answer a request received on the socket.
+        :param request: ``command`` and its ``params``.
+        :return: Result of the command.
+        """
+        command = request.get("command")
+        params = request.get("params") or {}
+        if command == "check":
+            return self._run_rules(apply=False)
+        if command == "format":
+            return self._run_rules(apply=True)
+        if command == "report":
+            return self._report(params.get("jql"))
+        if command == "stats":
+            return {
+                "issues": len(self.local_jira),
+                "worklogs": len(self.worklogs),
+                "events": self.events,
+                "uptime": time.time() - self.started_at,
+            }
+        raise ValueError(f"Unknown command: {command}")
+
+    def _run_rules(self, apply: bool) -> dict:
+        """
+        Run the formatter rules on the in-memory mirror.
+
+        Rules with conditions the mirror cannot answer search Jira through the
+        kept session instead.
+        :param apply: Apply the queued writes to Jira.
+        """
+        writer = JiraWriteExecutor(jira=self.jira, config=self.write_config)
+        with self._lock:
+            local_rules = [
+                rule
+                for rule in format_rules(self.config, self.local_jira, writer)
+                if not needs_jira(rule)
+            ]
+            RuleEngine(jira=self.local_jira, rules=local_rules).run()
+        jira_rules = [
+            rule
+            for rule in format_rules(self.config, self.jira, writer)
+            if needs_jira(rule)
+        ]
+        if jira_rules:
+            RuleEngine(jira=self.jira, rules=jira_rules).run()
+        result = {"queued_writes": len(writer)}
+        if apply:
+            updates = writer.queued_updates()
+            summary = writer.execute()
+            summary.log()
+            self._apply_updates(updates, summary)
+            result.update(summary.model_dump())
+        return result
+
+    def _apply_updates(
+        self, updates: list[tuple[str, dict]], summary: WriteSummary
+    ) -> None:
+        """
+        Reflect applied field updates in the mirror, so the next request does
+        not queue them again before their webhook events arrive.
+        :param updates: Issue keys and fields of the executed updates.
+        :param summary: Result of executing them.
+        """
+        failed = {
+            failure.issue_key
+            for failure in summary.failures
+            if failure.action == "update"
+        }
+        with self._lock:
+            for issue_key, fields in updates:
+                issue = self.local_jira.get_issue(issue_key)
+                if issue_key in failed or issue is None:
+                    continue
+                issue_json = self.local_jira.get_full_issue_json(int(issue.id))
+                self.local_jira.upsert_issue(
+                    {**issue_json, "fields": {**issue_json["fields"], **fields}}
+                )
+
+    def _report(self, jql: str | None) -> dict:
+        with self._lock:
+            if jql:
+                issue_ids = list(compile_jql(jql).execute(self.local_jira))
+            else:
+                issue_ids = list(self.local_jira.issue_ids())
+            by_status = Counter(
+                (issue_json["fields"].get("status") or {}).get("name")
+                for issue_json in self.local_jira.get_full_issues_json(issue_ids)
+            )
+            time_spent = sum(self.time_spent[issue_id] for issue_id in issue_ids)
+        return {
+            "issues": len(issue_ids),
+            "by_status": dict(by_status),
+            "time_spent_seconds": time_spent,
+        }
+
+    def _socket_server(self) -> socketserver.ThreadingUnixStreamServer:
+        socket_path = self.serve_config.socket
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        # a socket left behind by a daemon that did not shut down cleanly
+        socket_path.unlink(missing_ok=True)
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    try:
+                        response = {
+                            "ok": True,
+                            "result": daemon.handle(orjson.loads(line)),
+                        }
+                    except ValueError as e:
+                        response = {"ok": False, "error": str(e)}
+                    except Exception as e:
+                        logger.exception("Request failed")
+                        response = {"ok": False, "error": str(e)}
+                    self.wfile.write(orjson.dumps(response) + b"\n")
+                    self.wfile.flush()
+
+        server = socketserver.ThreadingUnixStreamServer(
+            str(socket_path), RequestHandler
+        )
+        server.daemon_threads = True
+        socket_path.chmod(0o600)
+        return server
+
+    def _start_webhook_server(self) -> ThreadingHTTPServer:
+        daemon = self
+        secret = self.serve_config.webhook_secret
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if self.path.split("?")[0] != "/webhook":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if secret is not None:
+                    signature = hmac.new(
+                        secret.encode("utf8"), body, hashlib.sha256
+                    ).hexdigest()
+                    if not hmac.compare_digest(
+                        self.headers.get("X-Hub-Signature", ""), f"sha256={signature}"
+                    ):
+                        self.send_response(401)
+                        self.end_headers()
+                        return
+                try:
+                    applied = daemon.apply_event(orjson.loads(body))
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Malformed webhook event: {e}")
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                self.send_response(204 if applied else 202)
+                self.end_headers()
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(f"Webhook: {format % args}")
+
+        server = ThreadingHTTPServer(
+            (self.serve_config.webhook_host, self.serve_config.webhook_port),
+            WebhookHandler,
+        )
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="jiruff-webhook", daemon=True
+        ).start()
+        logger.info(
+            f"Receiving Jira webhooks on http://{self.serve_config.webhook_host}:"
+            f"{server.server_address[1]}/webhook"
+        )
+        return server
@@ -1,21 +1,140 @@
+import asyncio
 import logging
+from argparse import ArgumentParser
 from argparse import Namespace
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from contextlib import contextmanager
 from datetime import datetime
 from datetime import timedelta
+from datetime import timezone
+from itertools import islice
+from pathlib import Path
+from typing import Iterable
+from typing import Iterator
 from typing import Literal
+from typing import Sequence
 
 import orjson
+from pydantic import BaseModel
+from pydantic import Field
 
 from jiruff.base.commands import BaseCommandHandler
-from jiruff.local import load_local_state
-from jiruff.local import save_local_state
-from jiruff.local.paths import LOCAL_ISSUES_DIR
-from jiruff.local.paths import LOCAL_TIMESHEET_DIR
+from jiruff.base.services.async_jira import AsyncJiraService
+from jiruff.base.storage import RecordStore
+from jiruff.local import LocalState
+from jiruff.local import LocalStateCheckpointer
+from jiruff.local import adopt_legacy_state
+from jiruff.local.storage import BackgroundWriter
+from jiruff.local.deltas import changelog_update
+from jiruff.local.deltas import issue_delta
+from jiruff.local.storage import LocalStorageConfig
+from jiruff.local.storage import issue_mirror_exists
+from jiruff.local.storage import open_delta_store
+from jiruff.local.storage import open_issue_store
+from jiruff.local.storage import open_timesheet_store
+from jiruff.services.rate_limit import SharedRequestBudget
 
 logger = logging.getLogger(__name__)
 
 TIMESHEET_BATCH_SIZE = 999
-LEAST_TIMESHEET_ID = 20_000
+# seconds between progress reports of companies synced together
+PROGRESS_INTERVAL = 10.0
+ISSUE_BATCH_SIZE = 100
+# consecutive empty probes taken as the end of the worklog IDs
+FRONTIER_EMPTY_PROBES = 2
+# worklog IDs are probed up to this value at most
+MAX_TIMESHEET_ID = 1 << 40
+# worklogs changed this recently tell where the IDs end at least
+RECENT_WORKLOGS_PERIOD = timedelta(days=7)
+# the worklog change feeds leave out the last minute
+WORKLOG_FEED_LAG = timedelta(minutes=1)
+# fields read by the local Jira service, its JQL subset and the format rules
+LEAN_ISSUE_FIELDS = (
+    "summary",
+    "project",
+    "issuetype",
+    "status",
+    "resolution",
+    "resolutiondate",
+    "priority",
+    "assignee",
+    "reporter",
+    "parent",
+    "fixVersions",
+    "versions",
+    "components",
+    "labels",
+    "created",
+    "updated",
+    "duedate",
+)
+
+
+class SyncCommandConfig(BaseModel):
+    workers: int = Field(
+        default=1,
+        ge=1,
+        description=(
+            "Number of concurrent workers used to download issues, and of "
+            "timesheet batches requested at once."
+        ),
+    )
+    engine: Literal["threads", "asyncio"] = Field(
+        default="threads",
+        description=(
+            "Download new issues from worker threads, or from an asyncio event "
+            "loop keeping up to workers bulk requests in flight."
+        ),
+    )
+    checkpoint_every: int = Field(
+        default=1000,
+        ge=1,
+        description="Save the local state after this many downloaded items.",
+    )
+    checkpoint_interval: float = Field(
+        default=5.0,
+        ge=0,
+        description="Save the local state at least every this many seconds.",
+    )
+    profile: Literal["full", "lean", "changelog"] = Field(
+        default="full",
+        description=(
+            "Fields fetched for updated issues: all of them, only lean_fields "
+            "merged into the mirrored issue, or the changes in their changelogs "
+            "applied to it. New issues are always fetched in full."
+        ),
+    )
+    lean_fields: list[str] = Field(
+        default_factory=lambda: list(LEAN_ISSUE_FIELDS),
+        description="Issue fields kept fresh by the lean profile.",
+    )
+
+
+class IssueIdWatermark:
+    """
+    Tracks the highest issue ID below which every ID is fully downloaded.
+
+    Downloads complete out of order, so finished IDs above the first gap are
+    parked until the gap is closed.
+    """
+
+    def __init__(self, last_finished_id: int):
+        self.value = last_finished_id
+        self._finished: set[int] = set()
+
+    def finish(self, issue_id: int) -> None:
+        """
+        Mark issue ID as finished and move the watermark past closed gaps.
+        :param issue_id: Downloaded (or missing) issue ID.
+        """
+        self._finished.add(issue_id)
+        while self.value + 1 in self._finished:
+            self.value += 1
+            self._finished.remove(self.value)
 
 
 class SyncCommand(BaseCommandHandler):
@@ -28,6 +147,38 @@ class SyncCommand(BaseCommandHandler):
 
     def __init__(self):
         super().__init__()
+        self.sync_config: SyncCommandConfig | None = None
+        self.storage_config: LocalStorageConfig | None = None
+        self.phase = "starting"
+        self.state_checkpointer: LocalStateCheckpointer | None = None
+        self.issue_store: RecordStore | None = None
+        self.timesheet_store: RecordStore | None = None
+        self.delta_store: RecordStore | None = None
+        self._timesheet_fetcher: ThreadPoolExecutor | None = None
+        self._timesheet_writer: BackgroundWriter | None = None
+
+    @classmethod
+    def add_arguments(cls, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--profile",
+            choices=["full", "lean", "changelog"],
+            default=None,
+            help="Fields fetched for updated issues, overrides the configuration",
+        )
+        parser.add_argument(
+            "--configs",
+            nargs="+",
+            type=Path,
+            default=None,
+            metavar="CONFIG",
+            help="Sync the companies of several configuration files concurrently",
+        )
+        parser.add_argument(
+            "--shared-rate",
+            type=float,
+            default=50.0,
+            help="Requests per second shared by the companies synced with --configs",
+        )
 
     def __call__(self, args: Namespace):
         """
@@ -37,75 +188,596 @@ class SyncCommand(BaseCommandHandler):
         :return: Result of the command execution.
         """
         logger.debug("Starting sync command")
+        if args.configs:
+            self._sync_companies(args)
+            return
+        self._prepare(args)
+        self._adopt_legacy_state()
+        self._sync()
+
+    def _prepare(
+        self, args: Namespace, rate_budget: SharedRequestBudget | None = None
+    ) -> None:
+        """
+        Load the configuration and open the Jira session.
+        :param args: Command line arguments.
+        :param rate_budget: Request budget shared with other companies.
+        """
         self._load_config(args)
-        self._init_jira()
+        self.sync_config = SyncCommandConfig.model_validate(
+            self.config.get_config_dict("sync")
+        )
+        if args.profile is not None:
+            self.sync_config.profile = args.profile
+        self.storage_config = LocalStorageConfig.model_validate(
+            self.config.get_config_dict("local")
+        )
+        self._init_jira(
+            max_connections=self.sync_config.workers, rate_budget=rate_budget
+        )
 
-        self.download_timesheets()
-        self.download_new_issues()
-        # self.check_downloads()
-        self.download_updated_issues()
+    def _adopt_legacy_state(self) -> None:
+        """
+        Resume from the global sync state of older versions.
+
+        It belongs to the one site synced before the upgrade, so it is only
+        adopted when a single company is synced and its mirror exists.
+        """
+        if issue_mirror_exists(self.config.company, self.storage_config):
+            adopt_legacy_state(self.config.company)
+
+    def _sync(self) -> None:
+        company = self.config.company
+        with (
+            open_issue_store(company, self.storage_config) as self.issue_store,
+            open_timesheet_store(company, self.storage_config) as self.timesheet_store,
+            open_delta_store(company, self.storage_config) as self.delta_store,
+            LocalStateCheckpointer(
+                company,
+                flush_every=self.sync_config.checkpoint_every,
+                flush_interval=self.sync_config.checkpoint_interval,
+                stores=[self.issue_store, self.timesheet_store, self.delta_store],
+            ) as self.state_checkpointer,
+        ):
+            self.phase = "timesheets"
+            self.download_timesheets()
+            self.phase = "new issues"
+            self.download_new_issues()
+            # self.check_downloads()
+            self.phase = "updated issues"
+            self.download_updated_issues()
+        self.phase = "done"
+        self.jira.log_stats()
+
+    def _sync_companies(self, args: Namespace) -> None:
+        """
+        Sync the companies of several configuration files concurrently.
+
+        Their requests share a budget of ``--shared-rate`` requests per second
+        on top of the rate limit of each Jira site. Sessions are opened one
+        after another first, as they may ask for a token. A failing company
+        does not stop the others.
+        :param args: Command line arguments.
+        """
+        rate_budget = SharedRequestBudget(rate=args.shared_rate)
+        syncs = []
+        for config_path in args.configs:
+            sync = SyncCommand()
+            sync._prepare(
+                Namespace(**{**vars(args), "config": config_path}), rate_budget
+            )
+            syncs.append(sync)
+        companies = [sync.config.company for sync in syncs]
+        if len(set(companies)) != len(companies):
+            raise ValueError(f"Companies are synced more than once: {companies}")
+        if len(syncs) == 1:
+            syncs[0]._adopt_legacy_state()
+
+        failures: dict[str, BaseException] = {}
+        with ThreadPoolExecutor(
+            max_workers=len(syncs), thread_name_prefix="jiruff-company"
+        ) as executor:
+            futures = {executor.submit(sync._sync): sync for sync in syncs}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+                for future in done:
+                    company = futures[future].config.company
+                    error = future.exception()
+                    if error is None:
+                        logger.info(f"{company} is synced")
+                    else:
+                        logger.error(f"Sync of {company} failed", exc_info=error)
+                        failures[company] = error
+                for future in pending:
+                    futures[future].log_progress()
+
+        if failures:
+            raise RuntimeError(
+                f"Sync failed for {', '.join(failures)}: "
+                + "; ".join(f"{company}: {e}" for company, e in failures.items())
+            )
+
+    def log_progress(self) -> None:
+        items = self.state_checkpointer.items if self.state_checkpointer else 0
+        rate_limiter = self.jira.rate_limiter
+        logger.info(
+            f"{self.config.company}: {self.phase}, {items} items, "
+            f"{rate_limiter.sent} requests, {rate_limiter.effective_rate:.1f} req/s"
+        )
 
     def download_timesheets(self):
         logger.info(f"Downloading {self.config.company} timesheets")
 
-        local_state = load_local_state()
-        start_id = local_state.last_downloaded_timesheet_entry_id
-
-        while True:
-            logger.debug(f"Downloading timesheets starting from ID {start_id}")
-            ids = [str(i) for i in range(start_id, start_id + TIMESHEET_BATCH_SIZE)]
-            timesheets_json = self.jira.get_json(
-                path="/worklog/list", data={"ids": ids}
+        local_state = self.state_checkpointer.state
+        if local_state.last_timesheet_sync_at is None:
+            # changes made during the scan are read from the feeds next time
+            synced_at = datetime.now(timezone.utc) - WORKLOG_FEED_LAG
+            with self._timesheet_pipeline():
+                self._scan_timesheets(local_state.last_downloaded_timesheet_entry_id)
+        else:
+            since_ms = int(local_state.last_timesheet_sync_at.timestamp() * 1000)
+            with self._timesheet_pipeline():
+                updated_until = self._download_updated_timesheets(since_ms)
+            # once all updates are written, so deleted worklogs do not come back
+            deleted_until = self._delete_timesheets(since_ms)
+            synced_at = datetime.fromtimestamp(
+                min(updated_until, deleted_until) / 1000, tz=timezone.utc
             )
+        local_state.last_timesheet_sync_at = synced_at
+        self.state_checkpointer.flush()
 
-            if len(timesheets_json) == 0 and start_id > LEAST_TIMESHEET_ID:
-                logger.debug(f"Starting {start_id} timesheet list is empty.")
-                break
+    @contextmanager
+    def _timesheet_pipeline(self) -> Iterator[None]:
+        """
+        Download worklog batches from ``workers`` threads and write them from
+        a thread of their own, so requests and disk writes overlap.
+        """
+        workers = self.sync_config.workers
+        with (
+            ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="jiruff-timesheets"
+            ) as self._timesheet_fetcher,
+            BackgroundWriter(
+                self.timesheet_store, max_pending=workers * 2
+            ) as self._timesheet_writer,
+        ):
+            yield
 
-            if len(timesheets_json) == 0 and start_id <= LEAST_TIMESHEET_ID:
-                start_id += TIMESHEET_BATCH_SIZE
-                continue
+    def _fetch_timesheets(self, ids: Iterable[int]) -> list[dict]:
+        """
+        :param ids: Worklog IDs, at most ``TIMESHEET_BATCH_SIZE``.
+        :return: Worklogs of the IDs that exist.
+        """
+        return self.jira.get_json(
+            path="/worklog/list", data={"ids": [str(i) for i in ids]}
+        )
+
+    def _fetch_ahead(
+        self, batches: Iterable[Sequence[int]]
+    ) -> Iterator[tuple[Sequence[int], list[dict]]]:
+        """
+        Download worklog batches with up to ``workers`` requests in flight.
+        :return: Batches and their worklogs in the order of ``batches``.
+        """
+        pending: deque[tuple[Sequence[int], Future]] = deque()
+        try:
+            for batch in batches:
+                future = self._timesheet_fetcher.submit(self._fetch_timesheets, batch)
+                pending.append((batch, future))
+                if len(pending) >= self.sync_config.workers:
+                    batch, future = pending.popleft()
+                    yield batch, future.result()
+            while pending:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        finally:
+            # batches requested ahead of a consumer stopping early are dropped
+            for _, future in pending:
+                future.cancel()
 
-            for timesheet in timesheets_json:
-                timesheet_id = int(timesheet["id"])
-                file_path = (
-                    LOCAL_TIMESHEET_DIR
-                    / self.config.company
-                    / str(timesheet_id // 1000)
-                    / f"{timesheet_id}.json"
+    def _write_timesheets(
+        self, timesheets: list[dict], progress: int | None = None
+    ) -> None:
+        """
+        Queue downloaded worklogs for writing.
+        :param timesheets: Worklogs JSON.
+        :param progress: Worklog ID the next scan can start from once they are
+            written.
+        """
+        local_state = self.state_checkpointer.state
+
+        def on_written() -> None:
+            if progress is not None:
+                local_state.last_downloaded_timesheet_entry_id = max(
+                    local_state.last_downloaded_timesheet_entry_id, progress
                 )
-                if not file_path.parent.exists():
-                    file_path.parent.mkdir(parents=True)
-                file_path.write_bytes(orjson.dumps(timesheet))
+            self.state_checkpointer.checkpoint(len(timesheets))
+
+        self._timesheet_writer.submit(
+            [
+                (int(timesheet["id"]), orjson.dumps(timesheet))
+                for timesheet in timesheets
+            ],
+            on_written,
+        )
+
+    def _probe_timesheet_window(self, start_id: int) -> bool:
+        """
+        Download a window of worklog IDs.
+        :return: Whether the window holds any worklogs.
+        """
+        timesheets = self._fetch_timesheets(
+            range(start_id, start_id + TIMESHEET_BATCH_SIZE)
+        )
+        if timesheets:
+            self._write_timesheets(timesheets)
+        return bool(timesheets)
+
+    def _scan_timesheets(self, start_id: int) -> None:
+        """
+        Download all worklogs from an ID on.
+
+        A first sync downloads the worklog IDs listed by the updated feed since
+        the epoch, which holds every worklog of the site. A scan resumed from a
+        saved ID downloads every window up to the frontier found by
+        ``_find_timesheet_frontier``.
+        """
+        if start_id == 0:
+            self._download_listed_timesheets()
+            return
+        frontier = self._find_timesheet_frontier(start_id)
+        recent_since = datetime.now(timezone.utc) - RECENT_WORKLOGS_PERIOD
+        recent_ids, _ = next(
+            self.jira.iter_worklog_changes(
+                "updated", int(recent_since.timestamp() * 1000)
+            )
+        )
+        if recent_ids:
+            # probes may have stopped in a wide gap below the newest worklogs
+            frontier = max(frontier or 0, max(recent_ids) + 1)
+        if frontier is None:
+            logger.info(f"No timesheets from ID {start_id} on")
+            return
+        logger.debug(f"Scanning timesheet IDs [{start_id}..{frontier})")
+
+        # windows between probes may hold worklogs, none of them is skipped
+        for ids, timesheets in self._fetch_ahead(
+            range(window_start, window_start + TIMESHEET_BATCH_SIZE)
+            for window_start in range(start_id, frontier, TIMESHEET_BATCH_SIZE)
+        ):
+            logger.debug(f"Downloaded timesheets starting from ID {ids.start}")
+            self._write_timesheets(timesheets, progress=min(ids.stop, frontier))
+
+    def _download_listed_timesheets(self) -> None:
+        """
+        Download the worklogs of all IDs listed by the updated feed.
 
-                start_id = timesheet_id + 1
+        The feed is ordered by update time, not by ID, so no scan progress is
+        saved on the way and an interrupted first sync starts over.
+        """
+
+        def batches() -> Iterator[list[int]]:
+            for worklog_ids, _ in self.jira.iter_worklog_changes("updated", 0):
+                for start in range(0, len(worklog_ids), TIMESHEET_BATCH_SIZE):
+                    yield worklog_ids[start : start + TIMESHEET_BATCH_SIZE]
+
+        downloaded = 0
+        for _, timesheets in self._fetch_ahead(batches()):
+            self._write_timesheets(timesheets)
+            downloaded += len(timesheets)
+        logger.info(f"{downloaded} timesheets are downloaded")
+
+    def _find_timesheet_frontier(self, start_id: int) -> int | None:
+        """
+        Find where worklog IDs end with exponential and binary probing.
+
+        Windows at exponentially growing distances from ``start_id`` are probed
+        until worklogs are found and then missed ``FRONTIER_EMPTY_PROBES``
+        times in a row, the last window holding worklogs is then located by
+        bisecting up to the first empty probe.
+        :return: ID past the last window holding worklogs, None if there are
+            no worklogs from ``start_id`` on.
+        """
+        last_found = None
+        first_empty = None
+        empty_probes = 0
+        probe, step = start_id, TIMESHEET_BATCH_SIZE
+        while probe < MAX_TIMESHEET_ID:
+            if self._probe_timesheet_window(probe):
+                last_found, first_empty, empty_probes = probe, None, 0
+            elif last_found is not None:
+                first_empty = first_empty or probe
+                empty_probes += 1
+                if empty_probes == FRONTIER_EMPTY_PROBES:
+                    break
+            probe, step = start_id + step, step * 2
+        if last_found is None:
+            return None
+
+        low, high = last_found, first_empty or probe
+        while high - low > TIMESHEET_BATCH_SIZE:
+            middle = (low + high) // 2
+            if self._probe_timesheet_window(middle):
+                low = middle
+            else:
+                high = middle
+        return low + TIMESHEET_BATCH_SIZE
+
+    def _download_updated_timesheets(self, since_ms: int) -> int:
+        """
+        Download worklogs created or edited since the last sync.
+        :param since_ms: Epoch milliseconds of the last sync.
+        :return: Epoch milliseconds the updated feed is read up to.
+        """
+        read_up_to = since_ms
+
+        def batches() -> Iterator[list[int]]:
+            nonlocal read_up_to
+            for worklog_ids, until_ms in self.jira.iter_worklog_changes(
+                "updated", since_ms
+            ):
+                logger.debug(f"{len(worklog_ids)} timesheets are updated")
+                for start in range(0, len(worklog_ids), TIMESHEET_BATCH_SIZE):
+                    yield worklog_ids[start : start + TIMESHEET_BATCH_SIZE]
+                read_up_to = until_ms
 
-        local_state.last_downloaded_timesheet_entry_id = start_id
-        save_local_state(local_state)
+        for ids, timesheets in self._fetch_ahead(batches()):
+            self._write_timesheets(timesheets, progress=max(ids) + 1)
+        return read_up_to
+
+    def _delete_timesheets(self, since_ms: int) -> int:
+        """
+        Drop worklogs deleted since the last sync from the local mirror.
+        :param since_ms: Epoch milliseconds of the last sync.
+        :return: Epoch milliseconds the deleted feed is read up to.
+        """
+        read_up_to = since_ms
+        for worklog_ids, read_up_to in self.jira.iter_worklog_changes(
+            "deleted", since_ms
+        ):
+            logger.debug(f"{len(worklog_ids)} timesheets are deleted")
+            for worklog_id in worklog_ids:
+                self.timesheet_store.delete(worklog_id)
+            self.state_checkpointer.checkpoint(len(worklog_ids))
+        return read_up_to
 
     def download_new_issues(self):
         logger.info(f"Downloading {self.config.company} issues")
 
         latest_issue = self.jira.get_all_issues_by_jql(
-            jql='created < now("-10000d") order by created DESC', num_results=1
+            jql="created >= -10000d order by created DESC", num_results=1
         )
         max_issue_id = int(latest_issue[0].id)
 
-        local_state = load_local_state()
-        if local_state.last_downloaded_issue_entry_id == max_issue_id:
+        local_state = self.state_checkpointer.state
+        if local_state.last_downloaded_issue_entry_id >= max_issue_id:
             logger.info("No new issues")
             return
 
-        for issue_id in range(
-            local_state.last_downloaded_issue_entry_id + 1, max_issue_id + 1
-        ):
-            self.download_issue(issue_id, update_local_state=False)
+        batches = iter(
+            range(batch_start, min(batch_start + ISSUE_BATCH_SIZE, max_issue_id + 1))
+            for batch_start in range(
+                local_state.last_downloaded_issue_entry_id + 1,
+                max_issue_id + 1,
+                ISSUE_BATCH_SIZE,
+            )
+        )
+        watermark = IssueIdWatermark(local_state.last_downloaded_issue_entry_id)
+        if self.sync_config.engine == "asyncio":
+            asyncio.run(self._download_batches_async(batches, watermark))
+        else:
+            self._download_batches(batches, watermark)
+
+    def _finish_batch(self, watermark: IssueIdWatermark, batch: range) -> None:
+        for issue_id in batch:
+            watermark.finish(issue_id)
+        self.state_checkpointer.state.last_downloaded_issue_entry_id = watermark.value
+        self.state_checkpointer.checkpoint(len(batch))
+
+    def _download_batches(
+        self, batches: Iterator[range], watermark: IssueIdWatermark
+    ) -> None:
+        workers = self.sync_config.workers
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="jiruff-sync"
+        ) as executor:
+            pending: dict[Future, range] = {}
+
+            def submit_next() -> None:
+                batch = next(batches, None)
+                if batch is not None:
+                    future = executor.submit(self.download_issues, list(batch))
+                    pending[future] = batch
+
+            # keep the queue bounded: a couple of tasks per worker is enough
+            # to hide the scheduling gap without materializing the whole range
+            for _ in range(workers * 2):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = pending.pop(future)
+                    future.result()
+                    self._finish_batch(watermark, batch)
+                    submit_next()
+
+    async def _download_batches_async(
+        self, batches: Iterator[range], watermark: IssueIdWatermark
+    ) -> None:
+        workers = self.sync_config.workers
+        async with await self._init_async_jira(workers) as async_jira:
+            pending: dict[asyncio.Task, range] = {}
+
+            def submit_next() -> None:
+                batch = next(batches, None)
+                if batch is not None:
+                    task = asyncio.create_task(
+                        self._download_issues_async(async_jira, list(batch))
+                    )
+                    pending[task] = batch
+
+            for _ in range(workers * 2):
+                submit_next()
+
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    batch = pending.pop(task)
+                    task.result()
+                    self._finish_batch(watermark, batch)
+                    submit_next()
+
+    async def _download_issues_async(
+        self, async_jira: AsyncJiraService, issue_ids: list[int]
+    ) -> None:
+        """
+        Download the issues of a batch missing from the local mirror.
+        """
+        issue_ids = [
+            issue_id
+            for issue_id in issue_ids
+            if not self.issue_store.contains(issue_id)
+        ]
+        if not issue_ids:
+            return
+        logger.debug(f"Start downloading issues [{issue_ids[0]}..{issue_ids[-1]}]")
+        for issue_json in await async_jira.get_full_issues_json(issue_ids):
+            logger.info(
+                f"Issue is downloaded: {issue_json['key']}. {issue_json['fields'].get('summary')}"
+            )
+            self.issue_store.put(int(issue_json["id"]), orjson.dumps(issue_json))
+
+    def download_issues(
+        self, issue_ids: list[int], force=False, fields: list[str] | None = None
+    ) -> list[dict]:
+        """
+        Download a batch of issues into the local mirror with bulk requests.
+
+        Missing (deleted or not visible) issues are skipped. The local state is
+        left to the caller, so it is safe to call from several threads.
+        :param issue_ids: Issue IDs to download.
+        :param force: Re-download issues that are already in the mirror.
+        :param fields: Fields to download and merge into the mirrored issues,
+            all of them if None.
+        :return: Downloaded issues JSON as stored in the mirror.
+        """
+        if not force:
+            issue_ids = [
+                issue_id
+                for issue_id in issue_ids
+                if not self.issue_store.contains(issue_id)
+            ]
+        if not issue_ids:
+            return []
+
+        logger.debug(f"Start downloading issues [{issue_ids[0]}..{issue_ids[-1]}]")
+        issues_json = self.jira.get_full_issues_json(issue_ids, fields=fields)
+        if fields is not None:
+            issues_json = [self._merge_issue(issue_json) for issue_json in issues_json]
+        for issue_json in issues_json:
+            logger.info(
+                f"Issue is downloaded: {issue_json['key']}. {issue_json['fields'].get('summary')}"
+            )
+            self.issue_store.put(int(issue_json["id"]), orjson.dumps(issue_json))
+        return issues_json
+
+    def _merge_issue(self, issue_json: dict) -> dict:
+        """
+        Merge a partial issue into its mirrored version.
+        """
+        stored = self.issue_store.get(int(issue_json["id"]))
+        if stored is None:
+            return issue_json
+        merged = orjson.loads(stored)
+        merged_fields = merged.get("fields", {})
+        merged_fields.update(issue_json["fields"])
+        merged.update(issue_json)
+        merged["fields"] = merged_fields
+        return merged
+
+    def apply_changelogs(self, updated_by_id: dict[int, str]) -> list[dict]:
+        """
+        Bring mirrored issues up to date from their changelogs.
+
+        Fields the changelog fully describes are changed in place, the other
+        changed fields are fetched on their own. Issues missing from the
+        mirror, or with changes the changelog cannot tell apart, are fetched
+        in full. Previous values of the changed fields are kept as deltas.
+        :param updated_by_id: Current ``updated`` value of the issues by ID.
+        :return: Updated issues JSON as stored in the mirror.
+        """
+        stored = {}
+        for issue_id in updated_by_id:
+            data = self.issue_store.get(issue_id)
+            if data is not None:
+                stored[issue_id] = orjson.loads(data)
+        full_ids = [issue_id for issue_id in updated_by_id if issue_id not in stored]
+        changelogs = self.jira.get_issue_changelogs(list(stored)) if stored else {}
+
+        issues_json: dict[int, dict] = {}
+        fetch_ids = []
+        fetch_fields = {"updated"}
+        for issue_id, issue_json in stored.items():
+            update = changelog_update(
+                issue_json, changelogs.get(issue_id, []), updated_by_id[issue_id]
+            )
+            if not update.complete:
+                full_ids.append(issue_id)
+                continue
+            issues_json[issue_id] = {
+                **issue_json,
+                "fields": {**issue_json.get("fields", {}), **update.fields},
+            }
+            if update.fetch_fields:
+                fetch_ids.append(issue_id)
+                fetch_fields.update(update.fetch_fields)
+
+        if fetch_ids:
+            logger.debug(
+                f"Fetching {', '.join(sorted(fetch_fields))} of {len(fetch_ids)} issues"
+            )
+            for fetched_json in self.jira.get_full_issues_json(
+                fetch_ids, fields=sorted(fetch_fields)
+            ):
+                issue_id = int(fetched_json["id"])
+                issues_json[issue_id]["fields"].update(fetched_json["fields"])
+        if full_ids:
+            logger.debug(f"Fetching {len(full_ids)} issues in full")
+            for fetched_json in self.jira.get_full_issues_json(full_ids):
+                issues_json[int(fetched_json["id"])] = fetched_json
+
+        for issue_id, issue_json in issues_json.items():
+            previous_json = stored.get(issue_id)
+            if issue_json == previous_json:
+                continue
+            if previous_json is not None:
+                delta = issue_delta(previous_json, issue_json)
+                if delta is not None:
+                    self._append_delta(issue_id, delta)
+            logger.info(
+                f"Issue is updated: {issue_json['key']}. {issue_json['fields'].get('summary')}"
+            )
+            self.issue_store.put(issue_id, orjson.dumps(issue_json))
+        return list(issues_json.values())
+
+    def _append_delta(self, issue_id: int, delta: dict) -> None:
+        stored = self.delta_store.get(issue_id)
+        deltas = orjson.loads(stored) if stored is not None else []
+        deltas.append(delta)
+        self.delta_store.put(issue_id, orjson.dumps(deltas))
 
     def download_issue(self, issue_id: int, force=False, update_local_state=True):
-        issue_path = LOCAL_ISSUES_DIR / self.config.company / f"{issue_id}.json"
-        if not issue_path.parent.exists():
-            issue_path.parent.mkdir(parents=True)
-        if issue_path.exists() and not force:
+        """
+        Download a single issue into the local mirror.
+
+        It is safe to call from several threads as long as ``update_local_state``
+        is False: the local state is then left to the caller.
+        """
+        if self.issue_store.contains(issue_id) and not force:
             return
 
         logger.debug(f"Start downloading issue [{issue_id}]")
@@ -115,38 +787,60 @@ class SyncCommand(BaseCommandHandler):
             logger.info(
                 f"Issue is downloaded: {issue_json['key']}. {issue_json['fields']['summary']}"
             )
-            issue_path.write_bytes(orjson.dumps(issue_json))
+            self.issue_store.put(issue_id, orjson.dumps(issue_json))
+
+            if update_local_state:
+                self._update_local_state(self.state_checkpointer.state, [issue_json])
+                self.state_checkpointer.checkpoint()
 
-            local_state = load_local_state()
+    @staticmethod
+    def _update_local_state(local_state: LocalState, issues_json: list[dict]):
+        for issue_json in issues_json:
+            issue_id = int(issue_json["id"])
             if issue_id > local_state.last_downloaded_issue_entry_id:
                 local_state.last_downloaded_issue_entry_id = issue_id
-            if update_local_state:
-                updated_at = datetime.fromisoformat(issue_json["fields"]["updated"])
-                if (
-                    isinstance(local_state.last_updated_issue_at, str)
-                    or local_state.last_updated_issue_at < updated_at
-                ):
-                    local_state.last_updated_issue_at = updated_at
-                save_local_state(local_state)
+            updated_at = datetime.fromisoformat(issue_json["fields"]["updated"])
+            if (
+                isinstance(local_state.last_updated_issue_at, str)
+                or local_state.last_updated_issue_at < updated_at
+            ):
+                local_state.last_updated_issue_at = updated_at
 
     def check_downloads(self):
         logger.debug(f"Checking {self.config.company} downloads")
-        for timesheet_path in (LOCAL_TIMESHEET_DIR / self.config.company).rglob(
-            "**/*.json"
-        ):
-            timesheet_json = orjson.loads(timesheet_path.read_bytes())
+        for _, timesheet_data in self.timesheet_store.scan():
+            timesheet_json = orjson.loads(timesheet_data)
             issue_id = int(timesheet_json["issueId"])
             self.download_issue(issue_id, force=False)
 
     def download_updated_issues(self):
         logger.info(f"Downloading {self.config.company} updated issues")
-        local_state = load_local_state()
+        local_state = self.state_checkpointer.state
         since = local_state.last_updated_issue_at
         if isinstance(since, datetime):
             since = since - timedelta(minutes=1)
             since = since.strftime("%Y-%m-%d %H:%M")
-        updated_jql = f'updated > "{since}" order by updated desc'
-        for issue in self.jira.get_all_issues_by_jql(updated_jql, num_results=0):
-            issue_id = int(issue.id)
-            self.download_issue(issue_id, force=True)
+        # oldest first, so checkpoints taken mid-way never skip older changes
+        updated_jql = f'updated > "{since}" order by updated asc'
+        changelog = self.sync_config.profile == "changelog"
+        # issues are fetched in bulk below, only their IDs are needed and for
+        # the changelog profile when they were updated
+        updated_issues = self.jira.iter_issues_by_jql(
+            updated_jql, fields=["updated"] if changelog else []
+        )
+        fields = None
+        if self.sync_config.profile == "lean":
+            # the local state follows the updated field
+            fields = list(dict.fromkeys([*self.sync_config.lean_fields, "updated"]))
+        while issues := list(islice(updated_issues, ISSUE_BATCH_SIZE)):
+            if changelog:
+                issues_json = self.apply_changelogs(
+                    {int(issue.id): issue.raw["fields"]["updated"] for issue in issues}
+                )
+            else:
+                issues_json = self.download_issues(
+                    [int(issue.id) for issue in issues], force=True, fields=fields
+                )
+            self._update_local_state(local_state, issues_json)
+            self.state_checkpointer.checkpoint(len(issues_json))
         logger.info(f"Finished downloading {self.config.company} updated issues")
@@ -3,18 +3,15 @@ import os
 import tomllib
 from getpass import getpass
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
-from jiruff.services.cloud_jira import CloudJiraService
-
 logger = logging.getLogger(__name__)
 
+# created on the first write, a missing file is reported by load_config
 LOCAL_CONFIG_FILE = Path.home() / ".config/jiruff/config.toml"
-if not LOCAL_CONFIG_FILE.exists():
-    LOCAL_CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    LOCAL_CONFIG_FILE.touch()
 
 
 class Config(BaseSettings):
@@ -23,6 +20,9 @@ class Config(BaseSettings):
     jira_url: str | None = None
     jira_user: str | None = None
     jira_token: str | None = None
+    # where the token came from, only keyring tokens are asked for again
+    # when Jira rejects them
+    jira_token_source: Literal["config", "env", "keyring"] | None = None
 
     gitlab_url: str | None = None
     gitlab_token: str | None = None
@@ -74,6 +74,7 @@ def append_jira_auth_info(config: Config):
 
     if config.jira_user is not None and config.jira_token is not None:
         logger.debug("JIRA user and token are already set in the configuration.")
+        config.jira_token_source = "config"
         return
 
     # first try to load from environment variables
@@ -88,6 +89,7 @@ def append_jira_auth_info(config: Config):
         logger.debug(f"Loaded JIRA user from environment: {config.jira_user}")
         config.jira_user = jira_user_env
         config.jira_token = jira_token_env
+        config.jira_token_source = "env"
         return
 
     # second try to load from local keyring
@@ -107,6 +109,7 @@ def append_jira_auth_info(config: Config):
         if config.jira_user is None:
             # let's ask user for jira user
             config.jira_user = input(f"Enter JIRA user for {config.company}: ").strip()
+            LOCAL_CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
             LOCAL_CONFIG_FILE.write_text(
                 data=f"{config.company.lower()}_jira_user = '{config.jira_user}'\n",
                 encoding="utf8",
@@ -115,35 +118,14 @@ def append_jira_auth_info(config: Config):
         jira_token_keyring = keyring.get_password(
             service_name=f"{config.company.lower()}-jira", username=config.jira_user
         )
+        # the token is validated by the Jira client of the command, see
+        # BaseCommandHandler._init_jira
         if jira_token_keyring is not None:
-            from jiruff.base.services.cloud_jira import JiraService
-            jira = CloudJiraService()
-            from jira import JIRAError
-            try:
-                jira.auth(url=config.jira_url,
-                          username=config.jira_user,
-                          token=jira_token_keyring)
-                print(jira.jira.myself())
-            except JIRAError as je:
-                if je.status_code == 401:
-                    jira_token_keyring = None
-                    logger.info("Old JIRA token is not valid for auth. Need to ask new one")
-                pass
-            if jira_token_keyring:
-                config.jira_token = jira_token_keyring
-                logger.debug(f"Loaded JIRA token from keyring for user {config.jira_user}.")
-                return
-
-        if jira_token_keyring is None:
-            # ask user for jira token
-            config.jira_token = getpass(
-                f"Enter JIRA token for {config.jira_user}: "
-            ).strip()
-            keyring.set_password(
-                service_name=f"{config.company.lower()}-jira",
-                username=config.jira_user,
-                password=config.jira_token,
-            )
+            config.jira_token = jira_token_keyring
+            logger.debug(f"Loaded JIRA token from keyring for user {config.jira_user}.")
+        else:
+            ask_jira_token(config)
+        config.jira_token_source = "keyring"
     except ImportError:
         logger.error("Keyring module is not installed. Cannot load JIRA credentials.")
 
@@ -151,6 +133,22 @@ def append_jira_auth_info(config: Config):
         raise ValueError("JIRA token is not set. Please raise an issue.")
 
 
+def ask_jira_token(config: Config) -> None:
+    """
+    Ask the user for a JIRA token and save it in the keyring.
+
+    :param config: Config object with the JIRA user set.
+    """
+    import keyring
+
+    config.jira_token = getpass(f"Enter JIRA token for {config.jira_user}: ").strip()
+    keyring.set_password(
+        service_name=f"{config.company.lower()}-jira",
+        username=config.jira_user,
+        password=config.jira_token,
+    )
+
+
 def append_gitlab_auth_info(config: Config):
     """
     Append GitLab authentication information to the configuration.
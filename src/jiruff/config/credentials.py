@@ -0,0 +1,64 @@
+import hashlib
+import logging
+import time
+from pathlib import Path
+
+from pydantic import BaseModel
+from pydantic import Field
+
+from jiruff.local import write_file_atomic
+from jiruff.local.paths import CREDENTIALS_CACHE_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialsConfig(BaseModel):
+    validation_ttl: int = Field(
+        default=24 * 60 * 60,
+        ge=0,
+        description="Seconds a validated Jira token is trusted without asking Jira.",
+    )
+
+
+class ValidatedCredentials(BaseModel):
+    # credential hash -> unix time of the last successful validation
+    validated_at: dict[str, float] = Field(default_factory=dict)
+
+
+class CredentialCache:
+    """
+    Times Jira credentials were last validated.
+
+    Credentials are kept only as a hash of the server URL, user and token, so
+    the cache holds nothing that grants access. A run trusts credentials
+    validated less than ``ttl`` seconds ago and skips the validation request,
+    credentials Jira rejects are forgotten so the next run validates them.
+    """
+
+    def __init__(self, path: Path = CREDENTIALS_CACHE_FILE):
+        self._path = path
+        try:
+            self._cache = ValidatedCredentials.model_validate_json(path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            self._cache = ValidatedCredentials()
+
+    @staticmethod
+    def _key(url: str, username: str, token: str) -> str:
+        return hashlib.sha256(f"{url}\0{username}\0{token}".encode()).hexdigest()
+
+    def is_fresh(self, url: str, username: str, token: str, ttl: int) -> bool:
+        validated_at = self._cache.validated_at.get(self._key(url, username, token))
+        return validated_at is not None and time.time() - validated_at < ttl
+
+    def validated(self, url: str, username: str, token: str) -> None:
+        self._cache.validated_at[self._key(url, username, token)] = time.time()
+        self._save()
+
+    def invalidate(self, url: str, username: str, token: str) -> None:
+        if self._cache.validated_at.pop(self._key(url, username, token), None):
+            logger.debug("Forgot rejected Jira credentials")
+            self._save()
+
+    def _save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomic(self._path, self._cache.model_dump_json().encode())
@@ -1,25 +1,161 @@
+import logging
+import os
+import tempfile
+import threading
+import time
 from datetime import datetime
+from pathlib import Path
+from typing import Sequence
 
 from pydantic import BaseModel
 from pydantic import Field
 
+from jiruff.base.storage import RecordStore
+from jiruff.local.paths import LOCAL_STATE_DIR
 from jiruff.local.paths import LOCAL_STATE_FILE
 
+logger = logging.getLogger(__name__)
+
 
 class LocalState(BaseModel):
     last_downloaded_timesheet_entry_id: int = Field(default=0)
     last_downloaded_issue_entry_id: int = Field(default=0)
 
     last_updated_issue_at: datetime | str = Field(default="-1d")
+    # None until the worklog IDs were scanned once, then the change feeds
+    # are read from it
+    last_timesheet_sync_at: datetime | None = Field(default=None)
+
+
+def local_state_file(company: str) -> Path:
+    return LOCAL_STATE_DIR / f"{company}.json"
+
+
+def adopt_legacy_state(company: str) -> bool:
+    """
+    Move the global state file of older versions to a company.
+
+    The file does not tell which site it belongs to, callers only adopt it
+    for the company whose mirror it describes.
+    :param company: Company name from the configuration.
+    :return: Whether the file was moved.
+    """
+    state_file = local_state_file(company)
+    if state_file.exists() or not LOCAL_STATE_FILE.exists():
+        return False
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(LOCAL_STATE_FILE, state_file)
+    logger.info(f"Local state of {company} is moved to {state_file}")
+    return True
+
+
+def load_local_state(company: str) -> LocalState:
+    """
+    Load the sync progress of a company.
+    :param company: Company name from the configuration.
+    """
+    state_file = local_state_file(company)
+    if not state_file.exists():
+        if LOCAL_STATE_FILE.exists():
+            logger.warning(
+                f"{LOCAL_STATE_FILE} of an older version is left in place, if it "
+                f"holds the sync progress of {company} move it to {state_file} "
+                f"to resume from it"
+            )
+        save_local_state(company, LocalState())
+
+    return LocalState.model_validate_json(state_file.read_bytes())
+
+
+def save_local_state(company: str, state: LocalState):
+    state_file = local_state_file(company)
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    write_file_atomic(state_file, state.model_dump_json().encode())
+
+
+def write_file_atomic(path: Path, data: bytes) -> None:
+    """
+    Write a file so that readers see either the old or the new content.
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and renamed over the target.
+    :param path: Target file path.
+    :param data: File content.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class LocalStateCheckpointer:
+    """
+    Keeps the local state in memory and saves it in checkpoints.
+
+    Callers change ``state`` in place and report progress with ``checkpoint``.
+    The state is saved once ``flush_every`` items were reported or
+    ``flush_interval`` seconds passed since the last save, and when the
+    checkpointer is closed. Use it as a context manager to save on shutdown.
+
+    The ``stores`` the state refers to are flushed before every save, so the
+    saved progress never gets ahead of the durable data.
+    """
+
+    def __init__(
+        self,
+        company: str,
+        flush_every: int = 1000,
+        flush_interval: float = 5.0,
+        stores: Sequence[RecordStore] = (),
+    ):
+        self.company = company
+        self.state = load_local_state(company)
+        # items reported over the whole run, for progress reports
+        self.items = 0
+        self._stores = stores
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._pending_items = 0
+        self._last_flush_at = time.monotonic()
+        self._lock = threading.Lock()
 
+    def checkpoint(self, items: int = 1) -> None:
+        """
+        Report progress and save the state if a checkpoint is due.
+        :param items: Number of items processed since the previous call.
+        """
+        with self._lock:
+            self._pending_items += items
+            self.items += items
+            if (
+                self._pending_items >= self._flush_every
+                or time.monotonic() - self._last_flush_at >= self._flush_interval
+            ):
+                self._flush()
 
-def load_local_state() -> LocalState:
-    if not LOCAL_STATE_FILE.exists():
-        local_state = LocalState()
-        LOCAL_STATE_FILE.write_text(local_state.model_dump_json())
+    def flush(self) -> None:
+        """
+        Save the state right away.
+        """
+        with self._lock:
+            self._flush()
 
-    return LocalState.model_validate_json(LOCAL_STATE_FILE.read_bytes())
+    def _flush(self) -> None:
+        for store in self._stores:
+            store.flush()
+        save_local_state(self.company, self.state)
+        logger.debug(f"Local state is saved after {self._pending_items} items")
+        self._pending_items = 0
+        self._last_flush_at = time.monotonic()
 
+    def __enter__(self) -> "LocalStateCheckpointer":
+        return self
 
-def save_local_state(state: LocalState):
-    LOCAL_STATE_FILE.write_text(state.model_dump_json())
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.flush()
@@ -0,0 +1,230 @@
+import logging
+import random
+import threading
+from pathlib import Path
+from typing import Iterable
+from typing import Iterator
+
+from jiruff.base.storage import RecordStore
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# first bytes of every zstd frame, JSON records never start with them
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DICTIONARY_SUFFIX = ".zdict"
+# dictionary the records are compressed with, older ones are kept for reading
+CURRENT_DICTIONARY = "current"
+
+DEFAULT_DICTIONARY_SIZE = 112 * 1024
+DEFAULT_SAMPLE_SIZE = 5000
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError(
+            "zstandard is not installed, install jiruff[zstd] to use a compressed "
+            "local mirror"
+        )
+
+
+def is_compressed(data: bytes) -> bool:
+    return data[:4] == ZSTD_MAGIC
+
+
+class DictionaryDirectory:
+    """
+    Trained zstd dictionaries of a record storage.
+
+    Dictionaries are kept as ``<dictionary id>.zdict``, so records compressed
+    with a dictionary replaced by a newer one can still be read.
+    """
+
+    def __init__(self, root: Path):
+        self._root = root
+        self._dictionaries: dict[int, "zstandard.ZstdCompressionDict"] = {}
+
+    def get(self, dict_id: int) -> "zstandard.ZstdCompressionDict | None":
+        if dict_id not in self._dictionaries:
+            path = self._root / f"{dict_id}{DICTIONARY_SUFFIX}"
+            if not path.exists():
+                return None
+            self._dictionaries[dict_id] = zstandard.ZstdCompressionDict(
+                path.read_bytes()
+            )
+        return self._dictionaries[dict_id]
+
+    def current(self) -> "zstandard.ZstdCompressionDict | None":
+        try:
+            dict_id = int((self._root / CURRENT_DICTIONARY).read_text())
+        except FileNotFoundError:
+            return None
+        return self.get(dict_id)
+
+    def add(self, dictionary: "zstandard.ZstdCompressionDict") -> int:
+        """
+        Save a dictionary and make it the current one.
+        :return: Dictionary ID.
+        """
+        dict_id = dictionary.dict_id()
+        self._root.mkdir(parents=True, exist_ok=True)
+        (self._root / f"{dict_id}{DICTIONARY_SUFFIX}").write_bytes(
+            dictionary.as_bytes()
+        )
+        (self._root / CURRENT_DICTIONARY).write_text(str(dict_id))
+        self._dictionaries[dict_id] = dictionary
+        return dict_id
+
+
+class CompressedRecordStore(RecordStore):
+    """
+    Storage compressing records of another storage with zstd.
+
+    Records are compressed with the current trained dictionary of the storage,
+    or without one until a dictionary is trained. Reads tell compressed
+    records by the zstd frame magic and pass plain JSON records through, so a
+    mirror can be read while only part of it is compressed and stays readable
+    after compression is turned off.
+
+    zstd contexts are not thread safe, every thread gets contexts of its own.
+    """
+
+    def __init__(
+        self,
+        store: RecordStore,
+        dictionaries: DictionaryDirectory,
+        compress: bool = True,
+        level: int = 3,
+    ):
+        """
+        :param store: Storage keeping the compressed records.
+        :param dictionaries: Dictionaries of the storage.
+        :param compress: Compress written records, False to only decompress reads.
+        :param level: zstd compression level.
+        """
+        if compress:
+            _require_zstandard()
+        self._store = store
+        self.dictionaries = dictionaries
+        self._compress = compress
+        self._level = level
+        self._contexts = threading.local()
+        # bumped when the current dictionary changes, so threads drop compressors
+        self._generation = 0
+
+    def _compressor(self) -> "zstandard.ZstdCompressor":
+        if getattr(self._contexts, "generation", None) != self._generation:
+            self._contexts.compressor = zstandard.ZstdCompressor(
+                level=self._level, dict_data=self.dictionaries.current()
+            )
+            self._contexts.generation = self._generation
+        return self._contexts.compressor
+
+    def _decompressor(self, dict_id: int) -> "zstandard.ZstdDecompressor":
+        if not hasattr(self._contexts, "decompressors"):
+            self._contexts.decompressors = {}
+        decompressors = self._contexts.decompressors
+        if dict_id not in decompressors:
+            dictionary = None
+            if dict_id:
+                dictionary = self.dictionaries.get(dict_id)
+                if dictionary is None:
+                    raise RuntimeError(
+                        f"zstd dictionary {dict_id} of the local mirror is missing"
+                    )
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressors[dict_id]
+
+    def _decompress(self, data: bytes) -> bytes:
+        if not is_compressed(data):
+            return data
+        _require_zstandard()
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        return self._decompressor(dict_id).decompress(data)
+
+    def _encode(self, data: bytes) -> bytes:
+        if not self._compress:
+            return data
+        return self._compressor().compress(data)
+
+    def get(self, record_id: int) -> bytes | None:
+        data = self._store.get(record_id)
+        return None if data is None else self._decompress(data)
+
+    def contains(self, record_id: int) -> bool:
+        return self._store.contains(record_id)
+
+    def put(self, record_id: int, data: bytes) -> None:
+        self._store.put(record_id, self._encode(data))
+
+    def put_many(self, records: Iterable[tuple[int, bytes]]) -> None:
+        self._store.put_many(
+            (record_id, self._encode(data)) for record_id, data in records
+        )
+
+    def delete(self, record_id: int) -> None:
+        self._store.delete(record_id)
+
+    def ids(self) -> Iterator[int]:
+        return self._store.ids()
+
+    def scan(self) -> Iterator[tuple[int, bytes]]:
+        for record_id, data in self._store.scan():
+            yield record_id, self._decompress(data)
+
+    def compact(self, *args, **kwargs) -> int:
+        return self._store.compact(*args, **kwargs)
+
+    def recompress(self) -> int:
+        """
+        Rewrite all records with the current dictionary.
+        :return: Number of rewritten records.
+        """
+        self._generation += 1
+        rewritten = 0
+        for record_id in list(self.ids()):
+            data = self.get(record_id)
+            if data is None:
+                continue
+            self.put(record_id, data)
+            rewritten += 1
+            if rewritten % 10_000 == 0:
+                logger.info(f"Recompressed {rewritten} records")
+        self.flush()
+        return rewritten
+
+    def flush(self) -> None:
+        self._store.flush()
+
+    def close(self) -> None:
+        self._store.close()
+
+
+def train_dictionary(
+    store: RecordStore,
+    dictionary_size: int = DEFAULT_DICTIONARY_SIZE,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> "zstandard.ZstdCompressionDict | None":
+    """
+    Train a zstd dictionary on a random sample of the records of a storage.
+    :param store: Storage returning uncompressed records.
+    :param dictionary_size: Maximum dictionary size in bytes.
+    :param sample_size: Number of records to train on.
+    :return: Dictionary, None if the storage has too few records to train on.
+    """
+    _require_zstandard()
+    record_ids = list(store.ids())
+    if len(record_ids) > sample_size:
+        record_ids = random.sample(record_ids, sample_size)
+    samples = [data for data in map(store.get, record_ids) if data is not None and data]
+    if not samples:
+        return None
+    try:
+        return zstandard.train_dictionary(dictionary_size, samples)
+    except zstandard.ZstdError as e:
+        logger.warning(f"Cannot train a dictionary on {len(samples)} records: {e}")
+        return None
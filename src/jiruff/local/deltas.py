@@ -0,0 +1,144 @@
+"""
+Field-level deltas of mirrored issues.
+
+Changelog entries of an issue are turned into changes of its mirrored JSON.
+Fields whose JSON is fully described by a changelog item are changed in
+place, the other changed fields are listed for the caller to fetch from Jira
+field by field.
+
+Every change of a mirrored issue is kept as a delta holding the previous
+values of the changed fields, so past versions of an issue can be restored by
+reverting its deltas newest first::
+
+    {"updated": "<issue updated after the change>",
+     "previous_updated": "<issue updated before the change>",
+     "fields": {"<field>": <previous JSON value>, ...},
+     "added": ["<field missing before the change>", ...]}
+"""
+
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from typing import Callable
+
+# issue fields changed without a changelog entry
+NON_CHANGELOG_FIELDS = ("comment", "worklog", "watches", "votes")
+# changelog items of fields identified only by their name
+CHANGELOG_FIELD_NAMES = {
+    "Link": "issuelinks",
+    "Parent": "parent",
+    "IssueParentAssociation": "parent",
+    "WorklogId": "worklog",
+    "Attachment": "attachment",
+}
+
+
+def _set_text(fields: dict, field_id: str, item: dict) -> None:
+    fields[field_id] = item.get("toString")
+
+
+def _set_labels(fields: dict, field_id: str, item: dict) -> None:
+    fields[field_id] = (item.get("toString") or "").split()
+
+
+def _set_date(fields: dict, field_id: str, item: dict) -> None:
+    fields[field_id] = item.get("to")
+
+
+# fields whose JSON value a changelog item fully describes
+DIRECT_FIELDS: dict[str, Callable[[dict, str, dict], None]] = {
+    "summary": _set_text,
+    "labels": _set_labels,
+    "duedate": _set_date,
+}
+
+
+def parse_jira_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+@dataclass
+class ChangelogUpdate:
+    # field values applied from the changelog
+    fields: dict = field(default_factory=dict)
+    # fields changed in a way only Jira can tell
+    fetch_fields: set[str] = field(default_factory=set)
+    # False if the changes cannot be told apart, the whole issue is refetched
+    complete: bool = True
+
+
+def changelog_update(
+    issue_json: dict, histories: list[dict], updated: str
+) -> ChangelogUpdate:
+    """
+    Work out how the changelog changes a mirrored issue.
+    :param issue_json: Mirrored issue.
+    :param histories: Change histories of the issue, oldest first.
+    :param updated: Current ``updated`` value of the issue in Jira.
+    :return: Fields to set and fields to fetch.
+    """
+    update = ChangelogUpdate()
+    fields = issue_json.get("fields", {})
+    mirrored_at = parse_jira_datetime(fields["updated"])
+    new_histories = [
+        history
+        for history in histories
+        if parse_jira_datetime(history["created"]) > mirrored_at
+    ]
+    last_change_at = mirrored_at
+    for history in new_histories:
+        last_change_at = max(last_change_at, parse_jira_datetime(history["created"]))
+        for item in history.get("items", []):
+            field_id = item.get("fieldId") or CHANGELOG_FIELD_NAMES.get(item["field"])
+            if field_id is None:
+                update.complete = False
+                return update
+            if field_id in DIRECT_FIELDS and field_id not in update.fetch_fields:
+                DIRECT_FIELDS[field_id](update.fields, field_id, item)
+            else:
+                update.fetch_fields.add(field_id)
+                update.fields.pop(field_id, None)
+
+    # changes after the last changelog entry were comments, worklogs or votes
+    if parse_jira_datetime(updated) > last_change_at:
+        update.fetch_fields.update(NON_CHANGELOG_FIELDS)
+    update.fields["updated"] = updated
+    return update
+
+
+def issue_delta(old_json: dict, new_json: dict) -> dict | None:
+    """
+    Delta reverting a new version of an issue to the old one.
+    :return: Delta, None if no field changed.
+    """
+    old_fields = old_json.get("fields", {})
+    new_fields = new_json.get("fields", {})
+    changed = {
+        field_id: old_fields[field_id]
+        for field_id in new_fields
+        if field_id in old_fields
+        and field_id != "updated"
+        and old_fields[field_id] != new_fields[field_id]
+    }
+    added = [field_id for field_id in new_fields if field_id not in old_fields]
+    if not changed and not added:
+        return None
+    return {
+        "updated": new_fields.get("updated"),
+        "previous_updated": old_fields.get("updated"),
+        "fields": changed,
+        "added": added,
+    }
+
+
+def revert_delta(issue_json: dict, delta: dict) -> dict:
+    """
+    Restore the version of an issue before a delta.
+    :return: Reverted copy of the issue.
+    """
+    fields = dict(issue_json.get("fields", {}))
+    for field_id in delta.get("added", []):
+        fields.pop(field_id, None)
+    fields.update(delta["fields"])
+    fields["updated"] = delta["previous_updated"]
+    return {**issue_json, "fields": fields}
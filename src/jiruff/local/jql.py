@@ -0,0 +1,674 @@
+"""
+Compiler for the JQL subset used by jiruff rules.
+
+A query is parsed into a tree of clauses combined with ``and``, ``or`` and
+``not``. Execution walks the tree against the indexes of a
+``LocalJiraService``: clauses on indexed fields (key, ID, parent, fixVersion,
+issue type, watcher, created, updated) become set lookups or range scans of the
+sorted date indexes, the other clauses filter the candidates left by their
+indexed siblings. Relative dates are resolved at execution time, so compiled
+queries can be cached and reused.
+
+A compiled query can also match single issue JSON documents, e.g. search
+results fetched for several queries at once, as long as it does not use
+fields missing from search results.
+"""
+
+import re
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+
+if TYPE_CHECKING:
+    from jiruff.services.local_jira import LocalJiraService
+
+
+class JqlError(ValueError):
+    """
+    Raised for JQL that is malformed or outside the supported subset.
+    """
+
+
+TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<operator>!=|>=|<=|!~|&&|\|\||[=<>~(),!])
+      | (?P<word>[^\s"'=<>~(),!&|]+)
+    )
+    """,
+    re.VERBOSE,
+)
+KEYWORDS = {
+    "and",
+    "or",
+    "not",
+    "in",
+    "is",
+    "empty",
+    "null",
+    "order",
+    "by",
+    "asc",
+    "desc",
+}
+RELATIVE_DATE_RE = re.compile(r"^([+-])?((?:\d+[wdhm]\s*)+)$")
+RELATIVE_PART_RE = re.compile(r"(\d+)([wdhm])")
+DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M", "%Y-%m-%d", "%Y/%m/%d")
+RELATIVE_UNITS = {"w": "weeks", "d": "days", "h": "hours", "m": "minutes"}
+
+INDEXED_FIELDS = {"key", "id", "parent", "fixVersion", "issuetype", "watcher"}
+DATE_INDEXED_FIELDS = {"created", "updated"}
+DATE_FIELDS = DATE_INDEXED_FIELDS | {"resolutiondate", "duedate", "lastViewed"}
+# lowercase JQL field name -> canonical name
+FIELD_ALIASES = {
+    **{name.lower(): name for name in INDEXED_FIELDS | DATE_FIELDS},
+    "issuekey": "key",
+    "issue": "key",
+    "type": "issuetype",
+    "affectedversion": "affectedVersion",
+    "statuscategory": "statusCategory",
+    "createddate": "created",
+    "updateddate": "updated",
+    "resolved": "resolutiondate",
+    "due": "duedate",
+}
+# issue JSON field read for a canonical JQL field name
+JSON_FIELDS = {
+    "fixVersion": "fixVersions",
+    "affectedVersion": "versions",
+    "component": "components",
+    "statusCategory": "status",
+}
+REF_KEYS = ("key", "id", "name", "value", "accountId", "displayName", "emailAddress")
+# fields search results do not carry, clauses on them can only be run by Jira
+SEARCH_UNAVAILABLE_FIELDS = {"watcher"}
+
+
+@dataclass(frozen=True)
+class Function:
+    name: str
+    args: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class Empty:
+    pass
+
+
+Value = str | Function | Empty | tuple
+
+
+@dataclass
+class Clause:
+    field: str
+    operator: str
+    value: Value
+
+    @property
+    def indexed(self) -> bool:
+        if self.field in DATE_INDEXED_FIELDS:
+            return self.operator in (">", ">=", "<", "<=")
+        if self.field not in INDEXED_FIELDS:
+            return False
+        if self.operator in ("is", "is not"):
+            return True
+        return self.operator in ("=", "in") and not isinstance(self.value, Empty)
+
+
+@dataclass
+class And:
+    children: list
+
+
+@dataclass
+class Or:
+    children: list
+
+
+@dataclass
+class Not:
+    child: object
+
+
+@dataclass
+class Query:
+    where: object | None
+    order_by: list[tuple[str, bool]] = field(default_factory=list)
+
+    def execute(self, service: "LocalJiraService") -> list[int]:
+        """
+        Run the query against a local Jira service.
+        :param service: Service providing the indexes.
+        :return: Matching issue IDs in query order.
+        """
+        context = _Context(service=service, now=datetime.now().astimezone())
+        if self.where is None:
+            issue_ids = set(service.issue_ids())
+        else:
+            issue_ids = _evaluate(self.where, context, None)
+        return _sort(issue_ids, self.order_by, context)
+
+    def clauses(self) -> Iterator[Clause]:
+        return _clauses(self.where)
+
+    def match_fields(self) -> set[str] | None:
+        """
+        Issue JSON fields read by ``matcher``.
+        :return: None if some clause cannot be matched on a search result.
+        """
+        json_fields = set()
+        for clause in self.clauses():
+            # Jira's text search stems words, a substring match could miss issues
+            if clause.field in SEARCH_UNAVAILABLE_FIELDS or clause.operator in (
+                "~",
+                "!~",
+            ):
+                return None
+            if clause.field not in ("key", "id"):
+                json_fields.add(JSON_FIELDS.get(clause.field, clause.field))
+        return json_fields
+
+    def matcher(self, now: datetime | None = None) -> Callable[[dict], bool]:
+        """
+        Build a predicate matching single issues against the query condition.
+        :param now: Moment relative dates are resolved against, defaults to now.
+        :return: Function of the issue JSON.
+        """
+        context = _Context(service=None, now=now or datetime.now().astimezone())
+        if self.where is None:
+            return lambda issue: True
+        return _matcher(self.where, context)
+
+
+class _Parser:
+    def __init__(self, jql: str):
+        self._jql = jql
+        self._tokens = self._tokenize(jql)
+        self._position = 0
+
+    @staticmethod
+    def _tokenize(jql: str) -> list[tuple[str, str]]:
+        tokens = []
+        position = 0
+        jql = jql.rstrip()
+        while position < len(jql):
+            match = TOKEN_RE.match(jql, position)
+            if match is None or match.end() == position:
+                raise JqlError(f"Unexpected character at {position} in JQL: {jql}")
+            position = match.end()
+            if match.group("string") is not None:
+                raw = match.group("string")[1:-1]
+                tokens.append(("string", re.sub(r"\\(.)", r"\1", raw)))
+            elif match.group("operator") is not None:
+                operator = {"&&": "and", "||": "or", "!": "not"}.get(
+                    match.group("operator"), match.group("operator")
+                )
+                kind = "keyword" if operator in KEYWORDS else "operator"
+                tokens.append((kind, operator))
+            else:
+                word = match.group("word")
+                if word.lower() in KEYWORDS:
+                    tokens.append(("keyword", word.lower()))
+                else:
+                    tokens.append(("word", word))
+        return tokens
+
+    def _peek(self, offset: int = 0) -> tuple[str, str] | None:
+        position = self._position + offset
+        return self._tokens[position] if position < len(self._tokens) else None
+
+    def _next(self) -> tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise JqlError(f"Unexpected end of JQL: {self._jql}")
+        self._position += 1
+        return token
+
+    def _accept(self, kind: str, value: str | None = None) -> bool:
+        token = self._peek()
+        if token is not None and token[0] == kind and value in (None, token[1]):
+            self._position += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: str | None = None) -> str:
+        token = self._next()
+        if token[0] != kind or value not in (None, token[1]):
+            raise JqlError(
+                f"Expected {value or kind}, got {token[1]!r} in JQL: {self._jql}"
+            )
+        return token[1]
+
+    def parse(self) -> Query:
+        where = None
+        if self._peek() is not None and self._peek() != ("keyword", "order"):
+            where = self._parse_or()
+        order_by = []
+        if self._accept("keyword", "order"):
+            self._expect("keyword", "by")
+            while True:
+                order_field = self._parse_field()
+                ascending = True
+                if self._accept("keyword", "desc"):
+                    ascending = False
+                else:
+                    self._accept("keyword", "asc")
+                order_by.append((order_field, ascending))
+                if not self._accept("operator", ","):
+                    break
+        if self._peek() is not None:
+            raise JqlError(f"Unexpected {self._peek()[1]!r} in JQL: {self._jql}")
+        return Query(where=where, order_by=order_by)
+
+    def _parse_or(self):
+        children = [self._parse_and()]
+        while self._accept("keyword", "or"):
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _parse_and(self):
+        children = [self._parse_not()]
+        while self._accept("keyword", "and"):
+            children.append(self._parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def _parse_not(self):
+        if self._accept("keyword", "not"):
+            return Not(self._parse_not())
+        if self._accept("operator", "("):
+            node = self._parse_or()
+            self._expect("operator", ")")
+            return node
+        return self._parse_clause()
+
+    def _parse_field(self) -> str:
+        kind, name = self._next()
+        if kind not in ("word", "string"):
+            raise JqlError(f"Expected field name, got {name!r} in JQL: {self._jql}")
+        custom_field = re.fullmatch(r"cf\[(\d+)]", name, re.IGNORECASE)
+        if custom_field:
+            return f"customfield_{custom_field.group(1)}"
+        return FIELD_ALIASES.get(name.lower(), name)
+
+    def _parse_clause(self) -> Clause:
+        clause_field = self._parse_field()
+        if self._accept("keyword", "is"):
+            operator = "is not" if self._accept("keyword", "not") else "is"
+            if not (
+                self._accept("keyword", "empty") or self._accept("keyword", "null")
+            ):
+                raise JqlError(f"Expected EMPTY after IS in JQL: {self._jql}")
+            return Clause(clause_field, operator, Empty())
+        if self._accept("keyword", "not"):
+            self._expect("keyword", "in")
+            return Clause(clause_field, "not in", self._parse_list())
+        if self._accept("keyword", "in"):
+            return Clause(clause_field, "in", self._parse_list())
+
+        operator = self._expect("operator")
+        if operator not in ("=", "!=", ">", ">=", "<", "<=", "~", "!~"):
+            raise JqlError(f"Unsupported operator {operator!r} in JQL: {self._jql}")
+        value = self._parse_value()
+        if isinstance(value, Empty) and operator in ("=", "!="):
+            return Clause(clause_field, "is" if operator == "=" else "is not", value)
+        return Clause(clause_field, operator, value)
+
+    def _parse_list(self) -> Value:
+        if not self._accept("operator", "("):
+            # a function returning a list, e.g. standardIssueTypes()
+            return self._parse_value()
+        values = [self._parse_value()]
+        while self._accept("operator", ","):
+            values.append(self._parse_value())
+        self._expect("operator", ")")
+        return tuple(values)
+
+    def _parse_value(self) -> Value:
+        kind, value = self._next()
+        if kind == "keyword" and value in ("empty", "null"):
+            return Empty()
+        if kind == "word" and self._accept("operator", "("):
+            args = []
+            while not self._accept("operator", ")"):
+                args.append(self._next()[1])
+                self._accept("operator", ",")
+            return Function(value, tuple(args))
+        if kind not in ("word", "string"):
+            raise JqlError(f"Expected value, got {value!r} in JQL: {self._jql}")
+        return value
+
+
+@lru_cache(maxsize=256)
+def compile_jql(jql: str) -> Query:
+    """
+    Parse a JQL string into an executable query.
+
+    :param jql: JQL string.
+    :raises JqlError: If the query is malformed or not supported.
+    """
+    return _Parser(jql).parse()
+
+
+@dataclass
+class _Context:
+    service: "LocalJiraService | None"
+    now: datetime
+
+
+def _evaluate(node, context: _Context, candidates: set[int] | None) -> set[int]:
+    """
+    Evaluate a node, restricted to ``candidates`` when they are known.
+    """
+    if isinstance(node, And):
+        # indexed clauses first: they narrow candidates for the filters
+        for child in sorted(node.children, key=lambda c: not _is_indexed(c)):
+            candidates = _evaluate(child, context, candidates)
+            if not candidates:
+                break
+        return candidates
+    if isinstance(node, Or):
+        result: set[int] = set()
+        for child in node.children:
+            result |= _evaluate(child, context, candidates)
+        return result
+    if isinstance(node, Not):
+        universe = (
+            candidates if candidates is not None else set(context.service.issue_ids())
+        )
+        return universe - _evaluate(node.child, context, universe)
+
+    if node.indexed:
+        result = _lookup(node, context)
+        return result if candidates is None else result & candidates
+    if candidates is None:
+        candidates = set(context.service.issue_ids())
+    predicate = _predicate(node, context)
+    issue_json = context.service.get_full_issue_json
+    return {issue_id for issue_id in candidates if predicate(issue_json(issue_id))}
+
+
+def _is_indexed(node) -> bool:
+    if isinstance(node, Clause):
+        return node.indexed
+    if isinstance(node, And):
+        return any(_is_indexed(child) for child in node.children)
+    if isinstance(node, Or):
+        return all(_is_indexed(child) for child in node.children)
+    return False
+
+
+def _clauses(node) -> Iterator[Clause]:
+    if isinstance(node, (And, Or)):
+        for child in node.children:
+            yield from _clauses(child)
+    elif isinstance(node, Not):
+        yield from _clauses(node.child)
+    elif node is not None:
+        yield node
+
+
+def _matcher(node, context: _Context) -> Callable[[dict], bool]:
+    if isinstance(node, And):
+        matchers = [_matcher(child, context) for child in node.children]
+        return lambda issue: all(match(issue) for match in matchers)
+    if isinstance(node, Or):
+        matchers = [_matcher(child, context) for child in node.children]
+        return lambda issue: any(match(issue) for match in matchers)
+    if isinstance(node, Not):
+        match = _matcher(node.child, context)
+        return lambda issue: not match(issue)
+    return _predicate(node, context)
+
+
+def _values(value: Value) -> tuple:
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _lookup(clause: Clause, context: _Context) -> set[int]:
+    service = context.service
+    if clause.field in DATE_INDEXED_FIELDS:
+        moment = _resolve_datetime(clause.value, context)
+        if clause.operator in (">", ">="):
+            return set(
+                service.ids_by_date(
+                    clause.field,
+                    since=moment,
+                    since_inclusive=clause.operator == ">=",
+                )
+            )
+        return set(
+            service.ids_by_date(
+                clause.field,
+                until=moment,
+                until_inclusive=clause.operator == "<=",
+            )
+        )
+
+    if clause.operator == "is":
+        return set(service.issue_ids()) - service.non_empty_ids(clause.field)
+    if clause.operator == "is not":
+        return service.non_empty_ids(clause.field)
+
+    result: set[int] = set()
+    for value in _values(clause.value):
+        if isinstance(value, Function):
+            result |= _lookup_function(clause.field, value, context)
+        elif clause.field == "id" and not str(value).isdigit():
+            raise JqlError(f"Issue ID {value!r} is not a number")
+        else:
+            result |= service.ids_by_index(clause.field, value)
+    return result
+
+
+def _lookup_function(index: str, function: Function, context: _Context) -> set[int]:
+    if _subtask_flag(index, function):
+        return set(context.service.subtask_ids())
+    return set(context.service.issue_ids()) - context.service.subtask_ids()
+
+
+def _subtask_flag(clause_field: str, function: Function) -> bool:
+    """
+    Map an issue type function to the ``subtask`` flag of the types it lists.
+    """
+    name = function.name.lower()
+    if clause_field == "issuetype" and name == "standardissuetypes":
+        return False
+    if clause_field == "issuetype" and name == "subtaskissuetypes":
+        return True
+    raise JqlError(f"Function {function.name}() is not supported for {clause_field}")
+
+
+def _resolve_datetime(value: Value, context: _Context) -> datetime:
+    now = context.now
+    if isinstance(value, Function):
+        name = value.name.lower()
+        offset = _relative_delta(value.args[0]) if value.args else timedelta()
+        if name == "now":
+            return now + offset
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if name == "startofday":
+            return start_of_day + offset
+        if name == "endofday":
+            return start_of_day + timedelta(days=1) + offset
+        if name == "startofweek":
+            return start_of_day - timedelta(days=(now.weekday() + 1) % 7) + offset
+        if name == "startofmonth":
+            return start_of_day.replace(day=1) + offset
+        if name == "startofyear":
+            return start_of_day.replace(month=1, day=1) + offset
+        raise JqlError(f"Function {value.name}() is not supported for dates")
+    if not isinstance(value, str):
+        raise JqlError(f"Expected a date, got {value!r}")
+    if RELATIVE_DATE_RE.match(value.strip()):
+        return now + _relative_delta(value)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).astimezone()
+        except ValueError:
+            continue
+    raise JqlError(f"Unsupported date value {value!r}")
+
+
+def _relative_delta(value: str) -> timedelta:
+    match = RELATIVE_DATE_RE.match(str(value).strip())
+    if match is None:
+        if re.fullmatch(r"[+-]?\d+", str(value).strip()):
+            return timedelta(days=int(value))
+        raise JqlError(f"Unsupported relative date {value!r}")
+    delta = timedelta()
+    for amount, unit in RELATIVE_PART_RE.findall(match.group(2)):
+        delta += timedelta(**{RELATIVE_UNITS[unit]: int(amount)})
+    return -delta if match.group(1) == "-" else delta
+
+
+def _raw_field(issue_json: dict, clause_field: str):
+    if clause_field == "key":
+        return issue_json.get("key")
+    if clause_field == "id":
+        return issue_json.get("id")
+    if clause_field == "watcher":
+        return (issue_json["fields"].get("watches") or {}).get("watchers")
+    raw = issue_json["fields"].get(JSON_FIELDS.get(clause_field, clause_field))
+    if clause_field == "statusCategory" and raw:
+        return raw.get("statusCategory")
+    return raw
+
+
+def _refs(raw) -> list[str]:
+    """
+    Flatten a field value into the lowercase strings JQL can match it by.
+    """
+    if raw is None:
+        return []
+    if isinstance(raw, list):
+        return [ref for item in raw for ref in _refs(item)]
+    if isinstance(raw, dict):
+        return [str(raw[key]).lower() for key in REF_KEYS if raw.get(key) is not None]
+    return [str(raw).lower()]
+
+
+def _text(raw) -> str:
+    if raw is None:
+        return ""
+    if isinstance(raw, (list, dict)):
+        return " ".join(_refs(raw))
+    return str(raw).lower()
+
+
+def _predicate(clause: Clause, context: _Context) -> Callable[[dict], bool]:
+    clause_field = clause.field
+    operator = clause.operator
+
+    if operator in ("is", "is not"):
+        empty = operator == "is"
+        return lambda issue: (not _refs(_raw_field(issue, clause_field))) == empty
+
+    if operator in ("~", "!~"):
+        needle = str(clause.value).lower().strip("*")
+        contains = operator == "~"
+        return lambda issue: (
+            (needle in _text(_raw_field(issue, clause_field))) == contains
+        )
+
+    if operator in (">", ">=", "<", "<=") or (
+        clause_field in DATE_FIELDS and operator in ("=", "!=")
+    ):
+        return _comparison_predicate(clause, context)
+
+    expected = set()
+    subtask_flags = set()
+    for value in _values(clause.value):
+        if isinstance(value, Function):
+            subtask_flags.add(_subtask_flag(clause_field, value))
+        else:
+            expected.add(str(value).lower())
+
+    def matches(raw) -> bool:
+        if subtask_flags and raw and bool(raw.get("subtask")) in subtask_flags:
+            return True
+        return not expected.isdisjoint(_refs(raw))
+
+    if operator in ("=", "in"):
+        return lambda issue: matches(_raw_field(issue, clause_field))
+    if operator in ("!=", "not in"):
+        # like Jira, negative matches skip issues with an empty field
+        def predicate(issue: dict) -> bool:
+            raw = _raw_field(issue, clause_field)
+            return bool(_refs(raw)) and not matches(raw)
+
+        return predicate
+    raise JqlError(f"Unsupported operator {operator!r} for {clause_field}")
+
+
+def _comparison_predicate(clause: Clause, context: _Context) -> Callable[[dict], bool]:
+    compare = {
+        ">": lambda a, b: a > b,
+        ">=": lambda a, b: a >= b,
+        "<": lambda a, b: a < b,
+        "<=": lambda a, b: a <= b,
+        "=": lambda a, b: a == b,
+        "!=": lambda a, b: a != b,
+    }[clause.operator]
+
+    if clause.field in DATE_FIELDS:
+        moment = _resolve_datetime(clause.value, context)
+
+        def predicate(issue: dict) -> bool:
+            raw = _raw_field(issue, clause.field)
+            return raw is not None and compare(_parse_datetime(raw), moment)
+
+        return predicate
+
+    try:
+        number = float(clause.value)
+    except (TypeError, ValueError):
+        raise JqlError(f"Cannot compare {clause.field} with {clause.value!r}") from None
+
+    def predicate(issue: dict) -> bool:
+        raw = _raw_field(issue, clause.field)
+        try:
+            return raw is not None and compare(float(raw), number)
+        except (TypeError, ValueError):
+            return False
+
+    return predicate
+
+
+def _parse_datetime(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo is not None else moment.astimezone()
+
+
+def _sort(
+    issue_ids: Iterable[int], order_by: list[tuple[str, bool]], context: _Context
+) -> list[int]:
+    ordered = sorted(issue_ids)
+    issue_json = context.service.get_full_issue_json
+    # stable sorts applied from the last key to the first one
+    for order_field, ascending in reversed(order_by):
+        sort_keys = {i: _sort_key(issue_json(i), order_field) for i in ordered}
+        present = [i for i in ordered if sort_keys[i] is not None]
+        present.sort(key=sort_keys.__getitem__, reverse=not ascending)
+        # issues without the field go last in both directions
+        ordered = present + [i for i in ordered if sort_keys[i] is None]
+    return ordered
+
+
+def _sort_key(issue: dict, order_field: str):
+    if order_field in ("id", "rank"):
+        return int(issue["id"])
+    if order_field == "key":
+        project, _, number = issue["key"].rpartition("-")
+        return project, int(number)
+    if order_field in DATE_FIELDS:
+        raw = _raw_field(issue, order_field)
+        return None if raw is None else _parse_datetime(raw)
+    refs = _refs(_raw_field(issue, order_field))
+    return refs[0] if refs else None
@@ -1,15 +1,24 @@
 from pathlib import Path
 
+# directories are created by the code writing into them, not on import
 JIRUFF_PATH = Path.home() / ".jiruff"
 
+# sync progress of every company, the global file is left from older versions
+LOCAL_STATE_DIR = JIRUFF_PATH / "state"
 LOCAL_STATE_FILE = JIRUFF_PATH / "local_state.json"
-if not LOCAL_STATE_FILE.parent.exists():
-    LOCAL_STATE_FILE.parent.mkdir(parents=True)
 
 LOCAL_TIMESHEET_DIR = JIRUFF_PATH / "timesheets"
-if not LOCAL_TIMESHEET_DIR.exists():
-    LOCAL_TIMESHEET_DIR.mkdir(parents=True)
 
 LOCAL_ISSUES_DIR = JIRUFF_PATH / "issues"
-if not LOCAL_ISSUES_DIR.exists():
-    LOCAL_ISSUES_DIR.mkdir(parents=True)
+
+LOCAL_SEGMENTS_DIR = JIRUFF_PATH / "segments"
+
+LOCAL_DELTAS_DIR = JIRUFF_PATH / "deltas"
+
+LOCAL_DICTIONARIES_DIR = JIRUFF_PATH / "dictionaries"
+
+HTTP_CACHE_DIR = JIRUFF_PATH / "http_cache"
+
+CREDENTIALS_CACHE_FILE = JIRUFF_PATH / "credentials.json"
+
+SERVE_SOCKET_FILE = JIRUFF_PATH / "jiruff.sock"
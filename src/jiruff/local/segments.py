@@ -0,0 +1,338 @@
+import logging
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable
+from typing import Iterator
+
+from jiruff.base.storage import RecordStore
+from jiruff.local import write_file_atomic
+
+logger = logging.getLogger(__name__)
+
+# record header: record id, payload length (-1 for tombstones), payload crc32
+RECORD_HEADER = struct.Struct("<QiI")
+# index entry: record id, segment number, offset of the record header, payload length
+INDEX_ENTRY = struct.Struct("<QIII")
+# index header: magic, active segment number, active segment size at index time
+INDEX_HEADER = struct.Struct("<8sIQ")
+INDEX_MAGIC = b"JRFIDX01"
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_FILE_NAME = "index.bin"
+DEFAULT_SEGMENT_SIZE = 256 * 1024 * 1024
+MAX_SEGMENT_SIZE = 2**32 - 1
+SCAN_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class SegmentRecordStore(RecordStore):
+    """
+    Append-only storage packing many records into a few segment files.
+
+    Every ``put`` appends the record to the active segment, and an in-memory
+    index maps record IDs to the location of their latest version, so lookups
+    cost one ``pread``. Superseded versions stay in the segments until
+    ``compact`` rewrites them away.
+
+    The index is persisted on ``flush``. Records appended after the last
+    persisted index are recovered on open by replaying the active segment
+    tail; a record torn by a crash at its end is truncated, corruption anywhere
+    else fails the open.
+    """
+
+    def __init__(self, root: Path, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError(f"segment_size must be in (0, {MAX_SEGMENT_SIZE}]")
+        self._root = root
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._segment_size = segment_size
+        self._lock = threading.RLock()
+        # record id -> (segment number, header offset, payload length)
+        self._index: dict[int, tuple[int, int, int]] = {}
+        # segment number -> bytes taken by superseded records and tombstones
+        self._dead_bytes: dict[int, int] = {}
+        self._read_fds: dict[int, int] = {}
+        self._active_segment = 0
+        self._active_file = None
+        self._active_size = 0
+        self._load()
+
+    def _segment_path(self, segment: int) -> Path:
+        return self._root / f"{segment:08d}{SEGMENT_SUFFIX}"
+
+    def _segments(self) -> list[int]:
+        return sorted(
+            int(path.stem)
+            for path in self._root.glob(f"*{SEGMENT_SUFFIX}")
+            if path.stem.isdigit()
+        )
+
+    def _load(self) -> None:
+        segments = self._segments()
+        index_path = self._root / INDEX_FILE_NAME
+        replay_from: tuple[int, int] = (segments[0], 0) if segments else (1, 0)
+
+        if index_path.exists():
+            data = index_path.read_bytes()
+            magic, segment, segment_size = INDEX_HEADER.unpack_from(data)
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{index_path} is not a jiruff segment index")
+            for record_id, entry_segment, offset, length in INDEX_ENTRY.iter_unpack(
+                data[INDEX_HEADER.size :]
+            ):
+                self._index[record_id] = (entry_segment, offset, length)
+            replay_from = (segment, segment_size)
+
+        for segment in segments:
+            if segment < replay_from[0]:
+                continue
+            start = replay_from[1] if segment == replay_from[0] else 0
+            self._replay(segment, start, active=segment == segments[-1])
+
+        self._recount_dead_bytes(segments)
+        self._active_segment = segments[-1] if segments else 1
+        self._open_active()
+
+    def _replay(self, segment: int, start: int, active: bool) -> None:
+        """
+        Add records appended after the persisted index to the in-memory index.
+
+        Only the last record of the active segment can be torn by a crash in
+        the middle of an append, it is truncated. A bad record anywhere else
+        means the segment is corrupt.
+        :param active: Whether the segment is the active one.
+        :raise ValueError: If the segment is corrupt.
+        """
+        path = self._segment_path(segment)
+        size = path.stat().st_size
+        valid_size = start
+        with path.open("rb", buffering=SCAN_BUFFER_SIZE) as segment_file:
+            segment_file.seek(start)
+            for record_id, offset, length, crc, payload in self._read_records(
+                segment_file
+            ):
+                if length < -1 or (length >= 0 and zlib.crc32(payload) != crc):
+                    break
+                if length < 0:
+                    self._index.pop(record_id, None)
+                else:
+                    self._index[record_id] = (segment, offset, length)
+                valid_size = segment_file.tell()
+            # a short record is read up to the end of the segment
+            bad_record_end = segment_file.tell()
+
+        if valid_size >= size:
+            return
+        if not active or bad_record_end < size:
+            logger.error(f"Corrupt record in {path} at {valid_size} bytes")
+            raise ValueError(f"{path} is corrupt at {valid_size} bytes")
+        logger.warning(f"Truncating torn tail of {path} at {valid_size} bytes")
+        os.truncate(path, valid_size)
+
+    @staticmethod
+    def _read_records(segment_file) -> Iterator[tuple[int, int, int, int, bytes]]:
+        """
+        Read records sequentially from the current position of a segment.
+
+        Iteration stops at a truncated record.
+        :return: Record ID, header offset, payload length, crc32 and payload.
+        """
+        while True:
+            offset = segment_file.tell()
+            header = segment_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            record_id, length, crc = RECORD_HEADER.unpack(header)
+            payload = segment_file.read(length) if length > 0 else b""
+            if len(payload) < max(length, 0):
+                return
+            yield record_id, offset, length, crc, payload
+
+    def _recount_dead_bytes(self, segments: list[int]) -> None:
+        live_bytes: dict[int, int] = {}
+        for segment, _, length in self._index.values():
+            live_bytes[segment] = (
+                live_bytes.get(segment, 0) + RECORD_HEADER.size + length
+            )
+        self._dead_bytes = {
+            segment: self._segment_path(segment).stat().st_size
+            - live_bytes.get(segment, 0)
+            for segment in segments
+        }
+
+    def _open_active(self) -> None:
+        path = self._segment_path(self._active_segment)
+        self._active_file = path.open("ab")
+        self._active_size = self._active_file.tell()
+        self._dead_bytes.setdefault(self._active_segment, 0)
+
+    def _roll_segment(self) -> None:
+        self._active_file.close()
+        self._active_segment += 1
+        self._open_active()
+
+    def _read_fd(self, segment: int) -> int:
+        fd = self._read_fds.get(segment)
+        if fd is None:
+            fd = os.open(self._segment_path(segment), os.O_RDONLY)
+            self._read_fds[segment] = fd
+        return fd
+
+    def _append(self, record_id: int, payload: bytes | None) -> tuple[int, int]:
+        length = -1 if payload is None else len(payload)
+        record_size = RECORD_HEADER.size + max(length, 0)
+        if (
+            self._active_size > 0
+            and self._active_size + record_size > self._segment_size
+        ):
+            self._roll_segment()
+
+        offset = self._active_size
+        header = RECORD_HEADER.pack(
+            record_id, length, zlib.crc32(payload) if payload else 0
+        )
+        self._active_file.write(header)
+        if payload:
+            self._active_file.write(payload)
+        self._active_size += record_size
+        return self._active_segment, offset
+
+    def _supersede(self, record_id: int) -> None:
+        previous = self._index.get(record_id)
+        if previous is not None:
+            segment, _, length = previous
+            self._dead_bytes[segment] = (
+                self._dead_bytes.get(segment, 0) + RECORD_HEADER.size + length
+            )
+
+    def get(self, record_id: int) -> bytes | None:
+        with self._lock:
+            location = self._index.get(record_id)
+            if location is None:
+                return None
+            segment, offset, length = location
+            if segment == self._active_segment:
+                # make buffered appends visible to pread
+                self._active_file.flush()
+            return os.pread(self._read_fd(segment), length, offset + RECORD_HEADER.size)
+
+    def contains(self, record_id: int) -> bool:
+        return record_id in self._index
+
+    def put(self, record_id: int, data: bytes) -> None:
+        with self._lock:
+            self._supersede(record_id)
+            segment, offset = self._append(record_id, data)
+            self._index[record_id] = (segment, offset, len(data))
+
+    def put_many(self, records: Iterable[tuple[int, bytes]]) -> None:
+        with self._lock:
+            for record_id, data in records:
+                self.put(record_id, data)
+
+    def delete(self, record_id: int) -> None:
+        with self._lock:
+            if record_id not in self._index:
+                return
+            self._supersede(record_id)
+            self._append(record_id, None)
+            self._dead_bytes[self._active_segment] += RECORD_HEADER.size
+            del self._index[record_id]
+
+    def ids(self) -> Iterator[int]:
+        return iter(list(self._index))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def scan(self) -> Iterator[tuple[int, bytes]]:
+        """
+        Read all live records segment by segment with large sequential reads.
+        """
+        with self._lock:
+            self._active_file.flush()
+            segments = self._segments()
+        for segment in segments:
+            path = self._segment_path(segment)
+            with path.open("rb", buffering=SCAN_BUFFER_SIZE) as segment_file:
+                for record_id, offset, length, _, payload in self._read_records(
+                    segment_file
+                ):
+                    if self._index.get(record_id) == (segment, offset, length):
+                        yield record_id, payload
+
+    def flush(self) -> None:
+        with self._lock:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._write_index()
+
+    def _write_index(self) -> None:
+        entries = bytearray(
+            INDEX_HEADER.pack(INDEX_MAGIC, self._active_segment, self._active_size)
+        )
+        for record_id, (segment, offset, length) in self._index.items():
+            entries += INDEX_ENTRY.pack(record_id, segment, offset, length)
+        write_file_atomic(self._root / INDEX_FILE_NAME, bytes(entries))
+
+    def compact(self, min_dead_ratio: float = 0.3) -> int:
+        """
+        Rewrite segments dominated by superseded records.
+
+        Live records of every sealed segment whose dead bytes ratio reaches
+        ``min_dead_ratio`` are appended to the active segment, then the old
+        segment is removed. An active segment reaching the ratio is sealed
+        first, so the space of deleted records is freed wherever they are.
+        :param min_dead_ratio: Fraction of dead bytes that makes a segment
+            worth rewriting.
+        :return: Number of bytes reclaimed.
+        """
+        reclaimed = 0
+        with self._lock:
+            active_dead_bytes = self._dead_bytes.get(self._active_segment, 0)
+            if (
+                self._active_size > 0
+                and active_dead_bytes / self._active_size >= min_dead_ratio
+            ):
+                self._roll_segment()
+            for segment in self._segments():
+                if segment == self._active_segment:
+                    continue
+                segment_path = self._segment_path(segment)
+                segment_size = segment_path.stat().st_size
+                dead_bytes = self._dead_bytes.get(segment, 0)
+                if segment_size == 0 or dead_bytes / segment_size < min_dead_ratio:
+                    continue
+
+                logger.debug(f"Compacting {segment_path}: {dead_bytes} dead bytes")
+                with segment_path.open(
+                    "rb", buffering=SCAN_BUFFER_SIZE
+                ) as segment_file:
+                    for record_id, offset, length, _, payload in self._read_records(
+                        segment_file
+                    ):
+                        if self._index.get(record_id) == (segment, offset, length):
+                            self._index[record_id] = (
+                                *self._append(record_id, payload),
+                                length,
+                            )
+
+                # the index must not point to the old segment once it is gone
+                self.flush()
+                fd = self._read_fds.pop(segment, None)
+                if fd is not None:
+                    os.close(fd)
+                segment_path.unlink()
+                self._dead_bytes.pop(segment, None)
+                reclaimed += dead_bytes
+        return reclaimed
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._active_file.close()
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
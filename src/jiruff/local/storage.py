@@ -0,0 +1,270 @@
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+from jiruff.base.storage import RecordStore
+from jiruff.local.compression import CompressedRecordStore
+from jiruff.local.compression import DictionaryDirectory
+from jiruff.local.paths import LOCAL_DELTAS_DIR
+from jiruff.local.paths import LOCAL_DICTIONARIES_DIR
+from jiruff.local.paths import LOCAL_ISSUES_DIR
+from jiruff.local.paths import LOCAL_SEGMENTS_DIR
+from jiruff.local.paths import LOCAL_TIMESHEET_DIR
+from jiruff.local.segments import DEFAULT_SEGMENT_SIZE
+from jiruff.local.segments import SegmentRecordStore
+
+logger = logging.getLogger(__name__)
+
+TIMESHEET_SHARD_SIZE = 1000
+
+
+class LocalStorageConfig(BaseModel):
+    backend: Literal["files", "segments"] = Field(
+        default="files",
+        description="Local mirror layout: a file per record or packed segments.",
+    )
+    segment_size: int = Field(
+        default=DEFAULT_SEGMENT_SIZE,
+        description="Maximum size of a segment file in bytes.",
+    )
+    compression: Literal["none", "zstd"] = Field(
+        default="none",
+        description=(
+            "Compress written records with zstd and a dictionary trained on the "
+            "mirror, compressed records are read with either setting."
+        ),
+    )
+    compression_level: int = Field(
+        default=3, ge=1, le=22, description="zstd compression level."
+    )
+
+
+class FileRecordStore(RecordStore):
+    """
+    Storage keeping every record in its own JSON file.
+
+    With ``shard_size`` set records are grouped into ``<id // shard_size>``
+    subdirectories.
+    """
+
+    def __init__(self, root: Path, shard_size: int | None = None):
+        self._root = root
+        self._shard_size = shard_size
+        # directories known to exist, so writes do not check them every time
+        self._dirs: set[Path] = set()
+
+    def _path(self, record_id: int) -> Path:
+        if self._shard_size is None:
+            return self._root / f"{record_id}.json"
+        return self._root / str(record_id // self._shard_size) / f"{record_id}.json"
+
+    def get(self, record_id: int) -> bytes | None:
+        try:
+            return self._path(record_id).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def contains(self, record_id: int) -> bool:
+        return self._path(record_id).exists()
+
+    def _writable_path(self, record_id: int) -> Path:
+        path = self._path(record_id)
+        if path.parent not in self._dirs:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(path.parent)
+        return path
+
+    def put(self, record_id: int, data: bytes) -> None:
+        self._writable_path(record_id).write_bytes(data)
+
+    def put_many(self, records: Iterable[tuple[int, bytes]]) -> None:
+        for record_id, data in records:
+            self._writable_path(record_id).write_bytes(data)
+
+    def delete(self, record_id: int) -> None:
+        self._path(record_id).unlink(missing_ok=True)
+
+    def ids(self) -> Iterator[int]:
+        if not self._root.exists():
+            return
+        for path in self._root.rglob("*.json"):
+            if path.stem.isdigit():
+                yield int(path.stem)
+
+    def scan(self) -> Iterator[tuple[int, bytes]]:
+        for record_id in self.ids():
+            data = self.get(record_id)
+            if data is not None:
+                yield record_id, data
+
+    def flush(self) -> None:
+        # every put writes its file straight away, nothing is buffered
+        pass
+
+
+class BackgroundWriter:
+    """
+    Writes records to a storage from a thread of its own, so downloads go on
+    while earlier records are written.
+
+    Batches are written in submission order with ``put_many``, the
+    ``on_written`` callback of a batch runs on the writer thread once it is
+    written. ``submit`` blocks while ``max_pending`` batches wait to be written.
+    An error of the writer is raised by the next ``submit`` or by ``close``.
+    """
+
+    def __init__(self, store: RecordStore, max_pending: int = 8):
+        self._store = store
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._run, name="jiruff-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (batch := self._queue.get()) is not None:
+            records, on_written = batch
+            if self._error is not None:
+                # keep draining, so submitters are not blocked
+                continue
+            try:
+                self._store.put_many(records)
+                if on_written is not None:
+                    on_written()
+            except BaseException as e:
+                self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def submit(
+        self,
+        records: list[tuple[int, bytes]],
+        on_written: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Queue records to be written.
+        :param records: Record IDs and data.
+        :param on_written: Called once the records are written.
+        """
+        self._raise_error()
+        self._queue.put((records, on_written))
+
+    def close(self) -> None:
+        """
+        Wait until all queued records are written.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def _compressed(
+    store: RecordStore, company: str, name: str, config: LocalStorageConfig
+) -> CompressedRecordStore:
+    return CompressedRecordStore(
+        store,
+        DictionaryDirectory(LOCAL_DICTIONARIES_DIR / company / name),
+        compress=config.compression == "zstd",
+        level=config.compression_level,
+    )
+
+
+def issue_mirror_exists(company: str, config: LocalStorageConfig) -> bool:
+    """
+    Whether the local issues mirror of a company was opened before.
+    :param company: Company name from the configuration.
+    :param config: Local storage configuration.
+    """
+    if config.backend == "segments":
+        return (LOCAL_SEGMENTS_DIR / "issues" / company).is_dir()
+    return (LOCAL_ISSUES_DIR / company).is_dir()
+
+
+def open_issue_store(company: str, config: LocalStorageConfig) -> RecordStore:
+    """
+    Open the local issues mirror of a company.
+    :param company: Company name from the configuration.
+    :param config: Local storage configuration.
+    """
+    if config.backend == "segments":
+        store = SegmentRecordStore(
+            LOCAL_SEGMENTS_DIR / "issues" / company, segment_size=config.segment_size
+        )
+    else:
+        store = FileRecordStore(LOCAL_ISSUES_DIR / company)
+    return _compressed(store, company, "issues", config)
+
+
+def open_timesheet_store(company: str, config: LocalStorageConfig) -> RecordStore:
+    """
+    Open the local worklogs mirror of a company.
+    :param company: Company name from the configuration.
+    :param config: Local storage configuration.
+    """
+    if config.backend == "segments":
+        store = SegmentRecordStore(
+            LOCAL_SEGMENTS_DIR / "timesheets" / company,
+            segment_size=config.segment_size,
+        )
+    else:
+        store = FileRecordStore(LOCAL_TIMESHEET_DIR / company, TIMESHEET_SHARD_SIZE)
+    return _compressed(store, company, "timesheets", config)
+
+
+def open_delta_store(company: str, config: LocalStorageConfig) -> RecordStore:
+    """
+    Open the field-level deltas of the local issues mirror of a company.
+    :param company: Company name from the configuration.
+    :param config: Local storage configuration.
+    """
+    if config.backend == "segments":
+        store = SegmentRecordStore(
+            LOCAL_SEGMENTS_DIR / "deltas" / company, segment_size=config.segment_size
+        )
+    else:
+        store = FileRecordStore(LOCAL_DELTAS_DIR / company)
+    return _compressed(store, company, "deltas", config)
+
+
+def migrate_store(
+    source: RecordStore, target: RecordStore, delete_source: bool = False
+) -> int:
+    """
+    Copy all records from one storage to another.
+
+    Source records are deleted only after the target is flushed. Deleting from
+    a segment storage only appends tombstones, ``compact`` it to free space.
+    :param source: Storage to read records from.
+    :param target: Storage to write records to.
+    :param delete_source: Remove migrated records from the source.
+    :return: Number of migrated records.
+    """
+    migrated_ids = []
+    for record_id, data in source.scan():
+        target.put(record_id, data)
+        migrated_ids.append(record_id)
+        if len(migrated_ids) % 10_000 == 0:
+            logger.info(f"Migrated {len(migrated_ids)} records")
+    target.flush()
+
+    if delete_source:
+        for record_id in migrated_ids:
+            source.delete(record_id)
+    return len(migrated_ids)
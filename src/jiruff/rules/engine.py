@@ -0,0 +1,129 @@
+import logging
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Sequence
+
+from jiruff.base.rules import FormatRule
+from jiruff.base.services.cloud_jira import JiraService
+from jiruff.local.jql import JqlError
+from jiruff.local.jql import compile_jql
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+
+
+@dataclass
+class _Subscription:
+    rule: FormatRule
+    query_name: str
+    page: list = field(default_factory=list)
+
+
+@dataclass
+class _Condition:
+    jql: str
+    # None for conditions only Jira can evaluate
+    match: Callable[[dict], bool] | None
+    subscriptions: list[_Subscription] = field(default_factory=list)
+
+
+@dataclass
+class Fetch:
+    jql: str
+    conditions: list[_Condition]
+
+
+class RuleEngine:
+    """
+    Runs formatter rules over a shared fetch of their candidate issues.
+
+    Identical conditions of different rules are searched once. Conditions
+    that can be matched on search results are combined into a single ``or``
+    search and every fetched issue is matched against each of them locally,
+    so adding a rule does not add a search. Conditions on data missing from
+    search results, like watchers, keep a search of their own. All searches
+    request the union of the fields the rules read.
+    """
+
+    def __init__(
+        self,
+        jira: JiraService,
+        rules: Sequence[FormatRule],
+        page_size: int = PAGE_SIZE,
+    ):
+        self.jira = jira
+        self.rules = rules
+        self.page_size = page_size
+
+    def plan(self) -> tuple[list[Fetch], list[str] | None]:
+        """
+        Group the rule conditions into searches.
+        :return: Searches to run and the issue fields to request.
+        """
+        conditions: dict[str, _Condition] = {}
+        fields: set[str] | None = set()
+        for rule in self.rules:
+            if rule.fields is None:
+                fields = None
+            elif fields is not None:
+                fields.update(rule.fields)
+            for query_name, jql in rule.candidate_queries().items():
+                jql = " ".join(jql.split())
+                if jql not in conditions:
+                    conditions[jql] = self._condition(jql)
+                    if fields is not None and conditions[jql].match is not None:
+                        fields.update(compile_jql(jql).match_fields())
+                conditions[jql].subscriptions.append(_Subscription(rule, query_name))
+
+        shared = [c for c in conditions.values() if c.match is not None]
+        fetches = [Fetch(jql=c.jql, conditions=[c]) for c in conditions.values()]
+        if len(shared) > 1:
+            fetches = [
+                Fetch(
+                    jql=" or ".join(f"({condition.jql})" for condition in shared),
+                    conditions=shared,
+                ),
+                *(fetch for fetch in fetches if fetch.conditions[0].match is None),
+            ]
+        return fetches, None if fields is None else sorted(fields)
+
+    @staticmethod
+    def _condition(jql: str) -> _Condition:
+        try:
+            query = compile_jql(jql)
+            if query.order_by or query.match_fields() is None:
+                return _Condition(jql=jql, match=None)
+            return _Condition(jql=jql, match=query.matcher())
+        except JqlError as je:
+            logger.debug(f"Condition {jql!r} is left to Jira: {je}")
+            return _Condition(jql=jql, match=None)
+
+    def run(self) -> None:
+        """
+        Fetch the candidates and pass them to the rules page by page.
+        """
+        for rule in self.rules:
+            logger.info(f"Running {rule.rule_key.upper()} formatter rule")
+        fetches, fields = self.plan()
+        for fetch in fetches:
+            logger.debug(f"Fetching candidates of {len(fetch.conditions)} conditions")
+            shared = len(fetch.conditions) > 1
+            for issue in self.jira.iter_issues_by_jql(fetch.jql, fields=fields):
+                for condition in fetch.conditions:
+                    if shared and not condition.match(issue.raw):
+                        continue
+                    for subscription in condition.subscriptions:
+                        subscription.page.append(issue)
+                        if len(subscription.page) >= self.page_size:
+                            self._deliver(subscription)
+            for condition in fetch.conditions:
+                for subscription in condition.subscriptions:
+                    self._deliver(subscription)
+
+    @staticmethod
+    def _deliver(subscription: _Subscription) -> None:
+        if subscription.page:
+            page, subscription.page = subscription.page, []
+            subscription.rule.process(subscription.query_name, page)
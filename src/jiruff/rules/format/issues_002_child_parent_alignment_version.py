@@ -4,7 +4,9 @@ from typing import Literal
 from pydantic import BaseModel
 from pydantic import Field
 
+from jiruff.base.rules import FormatRule
 from jiruff.base.services.cloud_jira import JiraService
+from jiruff.services.write_executor import JiraWriteExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -20,52 +22,67 @@ class FormatIssues002Config(BaseModel):
     )
 
 
-class FormatIssues002ChildParentAlignmentVersion:
+class FormatIssues002ChildParentAlignmentVersion(FormatRule):
     rule_key: Literal["issues-002"] = "issues-002"
+    fields = ("fixVersions",)
 
     def __init__(
-        self, jira: JiraService, rule_config: dict[str, str] | None = None
+        self,
+        jira: JiraService,
+        rule_config: dict[str, str] | None = None,
+        writer: JiraWriteExecutor | None = None,
     ) -> None:
-        self.jira = jira
+        super().__init__(jira, writer)
         rule_config_dict: dict[str, str] = (
             rule_config if rule_config is not None else {}
         )
         self.rule_config = FormatIssues002Config(**rule_config_dict)
 
-    def run(self) -> None:
+    def candidate_queries(self) -> dict[str, str]:
+        return {
+            "versioned": (
+                f"fixVersion != EMPTY and "
+                f"  issuetype in standardIssueTypes() and "
+                f"  updated >= {self.rule_config.updated_history_depth}"
+            )
+        }
+
+    def process(self, query_name: str, issues: list) -> None:
         """
-        Run the version alignment for ISSUES-002.
+        Run the version alignment for ISSUES-002 on a page of versioned issues.
         """
-        logger.info("Running ISSUES-002 version alignment formatter rule.")
-        issues_with_versions = self.jira.get_all_issues_by_jql(
-            f"fixVersion != EMPTY and "
-            f"  issuetype in standardIssueTypes() and "
-            f"  updated >= {self.rule_config.updated_history_depth}"
+        # children are fetched for the whole page of parents at once
+        children_by_parent = self.jira.get_children_by_parent(
+            [issue.key for issue in issues], fields=list(self.fields)
         )
-        for issue in issues_with_versions:
-            versions = issue.fields.fixVersions
-            if len(versions) == 0:
-                raise ValueError(
-                    f"Issue {issue.key} has no fix versions set, but it should have at least one."
-                )
+        for issue in issues:
+            self._propagate_version(issue, children_by_parent[issue.key])
+
+    def _propagate_version(self, issue, children: list) -> None:
+        versions = issue.fields.fixVersions
+        if len(versions) == 0:
+            raise ValueError(
+                f"Issue {issue.key} has no fix versions set, but it should have at least one."
+            )
 
-            if len(versions) > 1:
-                logger.warning(
-                    "Issue %s has multiple fix versions set: %s",
-                    issue.key,
-                    issue.fields.fixVersions,
-                )
+        if len(versions) > 1:
+            logger.warning(
+                "Issue %s has multiple fix versions set: %s",
+                issue.key,
+                issue.fields.fixVersions,
+            )
 
-            version = versions[0]
-            for child in self.jira.get_all_children(issue.key):
-                if len(child.fields.fixVersions) >= 1:
-                    continue
-                logger.info(
-                    "Setting fix version for child issue %s to %s", child.key, version
-                )
-                child.update(
-                    fields={
-                        "fixVersions": [{"id": version.id}],
-                    },
-                    notify=self.rule_config.notify,
-                )
+        version = versions[0]
+        for child in children:
+            if len(child.fields.fixVersions) >= 1:
+                continue
+            logger.info(
+                "Setting fix version for child issue %s to %s", child.key, version
+            )
+            self.writer.update_fields(
+                child.key,
+                fields={
+                    "fixVersions": [{"id": version.id}],
+                },
+                notify=self.rule_config.notify,
+            )
@@ -4,7 +4,9 @@ from typing import Literal
 from pydantic import BaseModel
 from pydantic import Field
 
+from jiruff.base.rules import FormatRule
 from jiruff.base.services.cloud_jira import JiraService
+from jiruff.services.write_executor import JiraWriteExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -18,27 +20,32 @@ class FormatIssues007Config(BaseModel):
     auto_watch_rules: list[FormatIssues007AutoWatchRule]
 
 
-class FormatIssues007AutoWatch:
+class FormatIssues007AutoWatch(FormatRule):
     rule_key: Literal["issues-007"] = "issues-007"
+    fields = ()
 
     def __init__(
-        self, jira: JiraService, rule_config: dict[str, str] | None = None
+        self,
+        jira: JiraService,
+        rule_config: dict[str, str] | None = None,
+        writer: JiraWriteExecutor | None = None,
     ) -> None:
-        self.jira = jira
+        super().__init__(jira, writer)
         self.rule_config = FormatIssues007Config.model_validate(rule_config)
 
-    def run(self) -> None:
+    def candidate_queries(self) -> dict[str, str]:
+        return {
+            auto_watch_rule.jira_user_id: (
+                f"created >= -180d and watcher != '{auto_watch_rule.jira_user_id}'"
+            )
+            for auto_watch_rule in self.rule_config.auto_watch_rules
+        }
+
+    def process(self, query_name: str, issues: list) -> None:
         """
-        Run the auto watch rule.
+        Make the user named by the query watch a page of issues.
         """
-
-        logger.info("Running ISSUES-007 auto watch rule")
-        for auto_watch_rule in self.rule_config.auto_watch_rules:
-            jira_user_id = auto_watch_rule.jira_user_id
-
-            issues = self.jira.get_all_issues_by_jql(
-                f"created >= -180d and watcher != '{jira_user_id}'"
-            )
-            for issue in issues:
-                logger.info(f"auto watch issue: {issue.key} by {jira_user_id}")
-                self.jira.add_watcher(issue.key, jira_user_id)
+        jira_user_id = query_name
+        for issue in issues:
+            logger.info(f"auto watch issue: {issue.key} by {jira_user_id}")
+            self.writer.add_watcher(issue.key, jira_user_id)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from jira import JIRAError
+from jira.resources import Issue
+
+from jiruff.base.services.async_jira import AsyncJiraService
+from jiruff.services.cloud_jira import BULK_FETCH_SIZE
+from jiruff.services.cloud_jira import SEARCH_PAGE_SIZE
+from jiruff.services.http import HttpSessionConfig
+from jiruff.services.http_cache import ResponseCache
+from jiruff.services.rate_limit import RETRY_STATUS_CODES
+from jiruff.services.rate_limit import AdaptiveRateLimiter
+from jiruff.services.rate_limit import Priority
+from jiruff.services.rate_limit import parse_retry_after
+from jiruff.services.rate_limit import request_priority
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+
+
+class AsyncCloudJiraService(AsyncJiraService):
+    """
+    Jira Cloud service on an asyncio HTTP client.
+
+    One pooled ``httpx.AsyncClient`` carries all requests, so a single event
+    loop can keep hundreds of them in flight. Requests go through the same
+    ``AdaptiveRateLimiter`` as the blocking service, share it to keep both
+    within one budget. Failed requests raise ``JIRAError`` like the blocking
+    service does. Writes drop the cached responses of the issues they change
+    from the ``ResponseCache`` of the blocking service.
+
+    Requires the optional ``httpx`` dependency (``jiruff[async]``).
+    """
+
+    def __init__(
+        self,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        http_config: HttpSessionConfig | None = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        response_cache: ResponseCache | None = None,
+    ):
+        if httpx is None:
+            raise RuntimeError(
+                "httpx is not installed, install jiruff[async] to use asyncio"
+            )
+        self.rate_limiter = (
+            rate_limiter if rate_limiter is not None else AdaptiveRateLimiter()
+        )
+        self.http_config = (
+            http_config if http_config is not None else HttpSessionConfig()
+        )
+        self.max_connections = max_connections
+        self.response_cache = response_cache
+        self.client: httpx.AsyncClient | None = None
+
+    async def auth(self, url: str, username: str, token: str):
+        """
+        Set up the HTTP client for the Jira server.
+        :param url: Jira server URL.
+        :param username: Username for authentication.
+        :param token: API token for authentication.
+        """
+        if url is None or username is None or token is None:
+            raise RuntimeError(f"url = {url}, username = {username}, token = {token}")
+
+        if self.client:
+            return
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        self.client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/api/2/",
+            auth=(username, token),
+            headers={
+                "Accept": "application/json",
+                "Accept-Encoding": self.http_config.accept_encoding(),
+            },
+            transport=httpx.AsyncHTTPTransport(
+                limits=limits, socket_options=self.http_config.socket_options()
+            ),
+            timeout=self.http_config.timeout,
+        )
+
+    async def _request(self, method: str, path: str, **kwargs) -> "httpx.Response":
+        """
+        Send a request through the rate limiter, retrying throttled ones.
+        :raise JIRAError: For error responses.
+        :raise httpx.HTTPError: When no response is received.
+        """
+        url = str(self.client.base_url.join(path))
+        priority = request_priority(method, url)
+        if self.response_cache is not None and priority != Priority.READ:
+            request = self.client.build_request(method, path, **kwargs)
+            self.response_cache.invalidate_written(url, request.content)
+        max_retries = self.rate_limiter.config.max_retries
+        for attempt in range(max_retries + 1):
+            await self.rate_limiter.acquire_async(priority)
+            response = await self.client.request(method, path, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES:
+                self.rate_limiter.on_success(
+                    near_limit=response.headers.get("X-RateLimit-NearLimit") == "true"
+                )
+                break
+
+            retry_after = parse_retry_after(response.headers)
+            self.rate_limiter.on_throttled(retry_after)
+            if attempt == max_retries:
+                break
+            logger.debug(
+                f"{method} {url} returned {response.status_code}, "
+                f"retry {attempt + 1}/{max_retries}"
+            )
+            await asyncio.sleep(self.rate_limiter.retry_delay(attempt, retry_after))
+
+        if response.is_error:
+            raise JIRAError(
+                text=response.text, status_code=response.status_code, url=url
+            )
+        return response
+
+    async def get_all_issues_by_jql(
+        self, jql: str, num_results: int = 0, fields: list[str] | None = None
+    ) -> list[Issue]:
+        """
+        Search issues.
+        :param jql: JQL string.
+        :param num_results: Maximum number of issues, 0 for all of them.
+        :param fields: Issue fields to fetch, all of them if None.
+        """
+        issues = []
+        async for issue in self.iter_issues_by_jql(jql, fields=fields):
+            issues.append(issue)
+            if len(issues) == num_results:
+                break
+        return issues
+
+    async def iter_issues_by_jql(
+        self,
+        jql: str,
+        fields: list[str] | None = None,
+        page_size: int = SEARCH_PAGE_SIZE,
+    ) -> AsyncIterator[Issue]:
+        """
+        Stream issues of a search, requesting the next page while the current
+        one is consumed.
+        :param jql: JQL string.
+        :param fields: Issue fields to fetch, all of them if None.
+        :param page_size: Number of issues requested per page.
+        """
+
+        async def fetch_page(page_token: str | None) -> dict:
+            search = {
+                "jql": jql,
+                "maxResults": page_size,
+                # an empty field list would make Jira return its default fields
+                "fields": ["*all"] if fields is None else list(fields) or ["id"],
+            }
+            if page_token:
+                search["nextPageToken"] = page_token
+            response = await self._request("POST", "search/jql", json=search)
+            return response.json()
+
+        next_page = asyncio.ensure_future(fetch_page(None))
+        try:
+            while next_page is not None:
+                page = await next_page
+                page_token = page.get("nextPageToken")
+                next_page = (
+                    asyncio.ensure_future(fetch_page(page_token))
+                    if page_token and not page.get("isLast", False)
+                    else None
+                )
+                for raw_issue in page.get("issues", []):
+                    yield Issue(options={}, session=None, raw=raw_issue)
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def get_json(self, path: str, data: dict) -> dict:
+        response = await self._request("POST", path.lstrip("/"), json=data)
+        return response.json()
+
+    async def get_full_issue_json(
+        self, issue_id: int, fields: list[str] | None = None
+    ) -> dict | None:
+        """
+        Fetch an issue.
+        :param issue_id: Issue ID.
+        :param fields: Fields to fetch, all fields and properties if None.
+        :return: Issue JSON, None if the issue cannot be fetched.
+        """
+        if fields is None:
+            params = {"fields": "*all", "properties": "*all"}
+        else:
+            params = {"fields": ",".join(fields)}
+        try:
+            response = await self._request("GET", f"issue/{issue_id}", params=params)
+        except JIRAError:
+            return None
+        return response.json()
+
+    async def get_full_issues_json(
+        self, issue_ids: list[int], fields: list[str] | None = None
+    ) -> list[dict]:
+        """
+        Fetch issues with concurrent bulk fetch requests.
+
+        Issues that do not exist or are not visible are skipped.
+        :param issue_ids: Issue IDs to fetch.
+        :param fields: Fields to fetch, all of them if None.
+        """
+
+        async def fetch_batch(batch: list[int]) -> list[dict]:
+            response = await self._request(
+                "POST",
+                "issue/bulkfetch",
+                json={
+                    "issueIdsOrKeys": [str(issue_id) for issue_id in batch],
+                    "fields": ["*all"] if fields is None else fields,
+                },
+            )
+            response_json = response.json()
+            for issue_error in response_json.get("issueErrors", []):
+                logger.debug("Bulk fetch skipped issues: %s", issue_error)
+            return response_json.get("issues", [])
+
+        batches = await asyncio.gather(
+            *(
+                fetch_batch(issue_ids[start : start + BULK_FETCH_SIZE])
+                for start in range(0, len(issue_ids), BULK_FETCH_SIZE)
+            )
+        )
+        return [issue_json for batch in batches for issue_json in batch]
+
+    async def add_watcher(self, issue_id: str, watcher_id: str):
+        await self._request("POST", f"issue/{issue_id}/watchers", json=watcher_id)
+
+    async def update_issue_fields(
+        self, issue_key: str, fields: dict, notify: bool = True
+    ):
+        params = {} if notify else {"notifyUsers": "false"}
+        await self._request(
+            "PUT", f"issue/{issue_key}", params=params, json={"fields": fields}
+        )
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -1,18 +1,75 @@
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from typing import Callable
+from typing import Iterator
+from typing import Literal
 
 from jira import JIRA
 from jira import JIRAError
+from jira.resources import Issue
+from jira.resources import Resource
 
 from jiruff.base.services.cloud_jira import JiraService
+from jiruff.services.http import ConnectionMetrics
+from jiruff.services.http import HttpSessionConfig
+from jiruff.services.http import JiraHTTPAdapter
+from jiruff.services.http import configure_session
+from jiruff.services.http_cache import ResponseCache
+from jiruff.services.rate_limit import AdaptiveRateLimiter
 
 logger = logging.getLogger(__name__)
 
+# maximum number of issues the bulk fetch endpoint returns per request
+BULK_FETCH_SIZE = 100
+# maximum number of issues and of change histories per bulk changelog request
+CHANGELOG_FETCH_SIZE = 1000
+# issues per search page, the maximum Jira returns with all fields
+SEARCH_PAGE_SIZE = 100
+# number of parent keys put into one `parent in (...)` search
+CHILDREN_SEARCH_PARENTS = 50
+# seconds between bulk edit task status checks
+BULK_EDIT_POLL_INTERVAL = 1.0
+# seconds a bulk edit task is waited for before its batch is reported failed
+BULK_EDIT_TIMEOUT = 600.0
+
 
 class CloudJiraService(JiraService):
-    def __init__(self):
+    """
+    Jira Cloud service on top of the ``jira`` client.
+
+    All requests go through one ``AdaptiveRateLimiter``, which also retries
+    throttled requests, over a pool of kept-alive connections sized by
+    ``HttpSessionConfig``. Reads are answered from a ``ResponseCache`` when
+    one is given.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        http_config: HttpSessionConfig | None = None,
+        workers: int | None = None,
+        response_cache: ResponseCache | None = None,
+    ):
+        """
+        :param rate_limiter: Rate limiter shared with other services.
+        :param http_config: HTTP session configuration.
+        :param workers: Number of threads sharing the service, the default
+            connection pool size.
+        :param response_cache: Cache of read responses, None to always ask Jira.
+        """
         self.jira: JIRA | None = None
+        self.rate_limiter = (
+            rate_limiter if rate_limiter is not None else AdaptiveRateLimiter()
+        )
+        self.http_config = (
+            http_config if http_config is not None else HttpSessionConfig()
+        )
+        self.pool_size = self.http_config.resolve_pool_size(workers)
+        self.response_cache = response_cache
+        self._adapter: JiraHTTPAdapter | None = None
 
     def auth(self, url: str, username: str, token: str):
         """
@@ -27,32 +84,353 @@ class CloudJiraService(JiraService):
         if self.jira:
             return
 
-        self.jira = JIRA(server=url, basic_auth=(username, token))
+        # retries are left to the rate limiter, and the server info is only
+        # requested once the session is configured
+        self.jira = JIRA(
+            server=url,
+            basic_auth=(username, token),
+            max_retries=0,
+            get_server_info=False,
+            timeout=self.http_config.timeout,
+        )
+        # noinspection PyProtectedMember
+        self._adapter = configure_session(
+            self.jira._session,
+            self.rate_limiter,
+            self.http_config,
+            self.pool_size,
+            cache=self.response_cache,
+        )
+        server_info = self.jira.server_info()
+        # noinspection PyProtectedMember
+        self.jira._version = tuple(server_info["versionNumbers"])
+        self.jira.deploymentType = server_info.get("deploymentType")
+
+    def log_stats(self) -> None:
+        """
+        Log request rate, connection reuse and cache statistics.
+        """
+        self.rate_limiter.log()
+        self.connection_metrics().log()
+        if self.response_cache is not None:
+            self.response_cache.log()
+
+    def connection_metrics(self) -> ConnectionMetrics:
+        """
+        Count connections opened and requests sent by the HTTP session.
+        """
+        if self._adapter is None:
+            return ConnectionMetrics()
+        return self._adapter.metrics()
+
+    def get_all_issues_by_jql(
+        self, jql: str, num_results: int = 0, fields: list[str] | None = None
+    ):
+        """
+        Search issues.
+        :param jql: JQL string.
+        :param num_results: Maximum number of issues, 0 for all of them.
+        :param fields: Issue fields to fetch, all of them if None.
+        """
+        if 0 < num_results <= SEARCH_PAGE_SIZE:
+            # a single page, nothing to prefetch
+            page = self._search_page(jql, fields, num_results, None)
+            return [self._issue(raw_issue) for raw_issue in page.get("issues", [])]
+        issues = self.iter_issues_by_jql(jql, fields=fields)
+        return list(islice(issues, num_results or None))
+
+    def iter_issues_by_jql(
+        self,
+        jql: str,
+        fields: list[str] | None = None,
+        page_size: int = SEARCH_PAGE_SIZE,
+    ) -> Iterator[Issue]:
+        """
+        Stream issues of a search page by page.
+
+        The next page is requested in the background while the caller consumes
+        the current one, so at most two pages are held in memory whatever the
+        size of the result.
+        :param jql: JQL string.
+        :param fields: Issue fields to fetch, all of them if None.
+        :param page_size: Number of issues requested per page.
+        """
+
+        def fetch_page(page_token: str | None) -> dict:
+            return self._search_page(jql, fields, page_size, page_token)
 
-    def get_all_issues_by_jql(self, jql: str, num_results: int = 0):
-        return self.jira.search_issues(jql_str=jql, maxResults=num_results)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jiruff-search")
+        try:
+            next_page = executor.submit(fetch_page, None)
+            while next_page is not None:
+                page = next_page.result()
+                page_token = page.get("nextPageToken")
+                next_page = (
+                    executor.submit(fetch_page, page_token)
+                    if page_token and not page.get("isLast", False)
+                    else None
+                )
+                for raw_issue in page.get("issues", []):
+                    yield self._issue(raw_issue)
+        finally:
+            # a consumer stopping early does not wait for the prefetched page
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _search_page(
+        self,
+        jql: str,
+        fields: list[str] | None,
+        page_size: int,
+        page_token: str | None,
+    ) -> dict:
+        return self.jira.enhanced_search_issues(
+            jql_str=jql,
+            nextPageToken=page_token,
+            maxResults=page_size,
+            # an empty field list would make Jira return its default fields
+            fields=["*all"] if fields is None else list(fields) or ["id"],
+            json_result=True,
+            use_post=True,
+        )
+
+    def _issue(self, raw_issue: dict) -> Issue:
+        # noinspection PyProtectedMember
+        return Issue(self.jira._options, self.jira._session, raw=raw_issue)
 
     def get_all_children(self, key: str):
         return self.get_all_issues_by_jql(f"parent = {key}")
 
+    def get_children_by_parent(
+        self, keys: list[str], fields: list[str] | None = None
+    ) -> dict[str, list]:
+        """
+        Get children of many issues with a few `parent in (...)` searches.
+        :param keys: Parent issue keys.
+        :param fields: Child fields to fetch, all of them if None.
+        :return: Children issues grouped by parent key.
+        """
+        if fields is not None:
+            # children are grouped by it
+            fields = [*fields, "parent"]
+        children_by_parent: dict[str, list] = {key: [] for key in keys}
+        for start in range(0, len(keys), CHILDREN_SEARCH_PARENTS):
+            parent_keys = ", ".join(keys[start : start + CHILDREN_SEARCH_PARENTS])
+            for child in self.iter_issues_by_jql(
+                f"parent in ({parent_keys})", fields=fields
+            ):
+                # a moved or renamed parent is reported under its current key
+                children_by_parent.setdefault(child.fields.parent.key, []).append(child)
+        return children_by_parent
+
     def get_json(self, path: str, data: dict) -> dict:
         return self.jira._get_json(path, data, use_post=True)
 
-    def get_full_issue_json(self, issue_id: int) -> dict | None:
+    def iter_worklog_changes(
+        self, change: Literal["updated", "deleted"], since: int
+    ) -> Iterator[tuple[list[int], int]]:
+        """
+        Stream pages of a worklog change feed.
+
+        Jira leaves out changes of the last minute, they show up in the feed
+        read from the returned time on.
+        :param change: "updated" for created and edited worklogs, "deleted"
+            for removed ones.
+        :param since: Epoch milliseconds to read changes from.
+        :return: Worklog IDs of every page and the time the feed is read up to.
+        """
+        while True:
+            # noinspection PyProtectedMember
+            page = self.jira._get_json(f"worklog/{change}", params={"since": since})
+            until = page.get("until", since)
+            yield [int(value["worklogId"]) for value in page.get("values", [])], until
+            if page.get("lastPage", True) or until <= since:
+                break
+            since = until
+
+    def get_full_issue_json(
+        self, issue_id: int, fields: list[str] | None = None
+    ) -> dict | None:
+        """
+        Fetch an issue.
+        :param issue_id: Issue ID.
+        :param fields: Fields to fetch, all fields and properties if None.
+        :return: Issue JSON, None if the issue cannot be fetched.
+        """
         try:
-            return self.jira.issue(
-                id=str(issue_id), fields="*all", properties="*all"
-            ).raw
+            if fields is None:
+                issue = self.jira.issue(
+                    id=str(issue_id), fields="*all", properties="*all"
+                )
+            else:
+                issue = self.jira.issue(id=str(issue_id), fields=",".join(fields))
+            return issue.raw
         except JIRAError:
             return None
 
+    def get_full_issues_json(
+        self, issue_ids: list[int] | list[str], fields: list[str] | None = None
+    ) -> list[dict]:
+        """
+        Fetch issues using the bulk fetch endpoint.
+
+        Issue properties are not part of the bulk response, use
+        ``get_full_issue_json`` when they are needed. Issues that do not exist or
+        are not visible are skipped.
+        :param issue_ids: Issue IDs or keys to fetch.
+        :param fields: Fields to fetch, all of them if None.
+        :return: Issues JSON in the order returned by Jira.
+        """
+        issues_json = []
+        for start in range(0, len(issue_ids), BULK_FETCH_SIZE):
+            batch = [
+                str(issue_id) for issue_id in issue_ids[start : start + BULK_FETCH_SIZE]
+            ]
+            # noinspection PyProtectedMember
+            response = self.jira._get_json(
+                "issue/bulkfetch",
+                {
+                    "issueIdsOrKeys": batch,
+                    "fields": ["*all"] if fields is None else fields,
+                },
+                use_post=True,
+            )
+            issues_json.extend(response.get("issues", []))
+            for issue_error in response.get("issueErrors", []):
+                logger.debug("Bulk fetch skipped issues: %s", issue_error)
+        return issues_json
+
+    def get_issue_changelogs(self, issue_ids: list[int]) -> dict[int, list[dict]]:
+        """
+        Fetch change histories of issues with the bulk changelog endpoint.
+        :param issue_ids: Issue IDs.
+        :return: Change histories by issue ID, oldest first.
+        """
+        changelogs: dict[int, list[dict]] = {issue_id: [] for issue_id in issue_ids}
+        for start in range(0, len(issue_ids), CHANGELOG_FETCH_SIZE):
+            changelog_request = {
+                "issueIdsOrKeys": [
+                    str(issue_id)
+                    for issue_id in issue_ids[start : start + CHANGELOG_FETCH_SIZE]
+                ],
+                "maxResults": CHANGELOG_FETCH_SIZE,
+            }
+            while True:
+                # noinspection PyProtectedMember
+                response = self.jira._session.post(
+                    self._get_v3_url("changelog/bulkfetch"),
+                    data=json.dumps(changelog_request),
+                ).json()
+                for changelog in response.get("issueChangeLogs", []):
+                    changelogs.setdefault(int(changelog["issueId"]), []).extend(
+                        changelog.get("changeHistories", [])
+                    )
+                if not response.get("nextPageToken"):
+                    break
+                changelog_request["nextPageToken"] = response["nextPageToken"]
+        for histories in changelogs.values():
+            histories.sort(key=lambda history: int(history["id"]))
+        return changelogs
+
     def add_watcher(self, issue_id: str, watcher_id: str):
         # noinspection PyProtectedMember
         url = self.jira._get_url("issue/" + issue_id + "/watchers")
         # noinspection PyProtectedMember
         self.jira._session.post(url, data=json.dumps(watcher_id))
 
-    def get_all_issues(self, filter_func: Callable[[dict], bool]):
-        raise NotImplementedError()
+    def update_issue_fields(self, issue_key: str, fields: dict, notify: bool = True):
+        # noinspection PyProtectedMember
+        url = self.jira._get_url("issue/" + issue_key)
+        params = None if notify else {"notifyUsers": "false"}
+        # noinspection PyProtectedMember
+        self.jira._session.put(url, params=params, data=json.dumps({"fields": fields}))
+
+    def bulk_update_issue_fields(
+        self, issue_keys: list[str], fields: dict, notify: bool = True
+    ) -> dict[str, str] | None:
+        """
+        Replace fix versions of many issues with a bulk edit task.
+
+        Only ``fixVersions`` updates are translated to the bulk edit API, other
+        fields have to be updated issue by issue. A task still queued or running
+        after ``BULK_EDIT_TIMEOUT`` fails the whole batch.
+        :param issue_keys: Issue keys, at most 1000.
+        :param fields: Fields payload as accepted by the edit issue API.
+        :param notify: Whether to send a bulk notification.
+        :return: Errors by issue key, or None if the fields cannot be bulk edited.
+        :raise JIRAError: If Jira did not create the bulk edit task.
+        """
+        if set(fields) != {"fixVersions"}:
+            return None
+
+        edit_request = {
+            "selectedIssueIdsOrKeys": issue_keys,
+            "selectedActions": ["fixVersions"],
+            "editedFieldsInput": {
+                "multipleVersionPickerFields": [
+                    {
+                        "fieldId": "fixVersions",
+                        "bulkEditMultiSelectFieldOption": "REPLACE",
+                        "versionIds": [v["id"] for v in fields["fixVersions"]],
+                    }
+                ]
+            },
+            "sendBulkNotification": notify,
+        }
+        url = self._get_v3_url("bulk/issues/fields")
+        # noinspection PyProtectedMember
+        response = self.jira._session.post(url, data=json.dumps(edit_request))
+        task_id = response.json().get("taskId")
+        if task_id is None:
+            raise JIRAError(
+                text=f"Bulk edit task was not created: {response.text}",
+                status_code=response.status_code,
+                url=url,
+            )
+        task_url = self._get_v3_url(f"bulk/queue/{task_id}")
+        deadline = time.monotonic() + BULK_EDIT_TIMEOUT
+        while True:
+            # noinspection PyProtectedMember
+            task = self.jira._session.get(task_url).json()
+            if task.get("status") not in ("ENQUEUED", "RUNNING"):
+                break
+            if time.monotonic() >= deadline:
+                error = (
+                    f"bulk edit task {task_id} is still {task.get('status')} "
+                    f"after {BULK_EDIT_TIMEOUT:.0f}s"
+                )
+                logger.warning(error)
+                return {key: error for key in issue_keys}
+            time.sleep(BULK_EDIT_POLL_INTERVAL)
 
+        if task.get("status") != "COMPLETE":
+            return {key: f"bulk edit task {task.get('status')}" for key in issue_keys}
+        failed_issues = task.get("failedAccessibleIssues") or {}
+        if not failed_issues and not task.get("invalidOrInaccessibleIssueCount"):
+            return {}
+        # Jira reports failed issues by ID and inaccessible ones only by count,
+        # the batch is read back to tell which keys were left unchanged
+        version_ids = {version["id"] for version in fields["fixVersions"]}
+        keys_by_id = {}
+        edited_keys = set()
+        for issue in self.get_full_issues_json(issue_keys, fields=["fixVersions"]):
+            keys_by_id[issue["id"]] = issue["key"]
+            issue_versions = issue["fields"].get("fixVersions") or []
+            if {version["id"] for version in issue_versions} == version_ids:
+                edited_keys.add(issue["key"])
+        errors = {
+            keys_by_id[issue_id]: "; ".join(issue_errors)
+            for issue_id, issue_errors in failed_issues.items()
+            if issue_id in keys_by_id
+        }
+        for key in issue_keys:
+            if key not in edited_keys and key not in errors:
+                errors[key] = "issue not found or not editable"
+        return errors
 
+    def _get_v3_url(self, path: str) -> str:
+        # noinspection PyProtectedMember
+        options = {**self.jira._options, "rest_api_version": "3", "path": path}
+        return Resource.JIRA_BASE_URL.format(**options)
+
+    def get_all_issues(self, filter_func: Callable[[dict], bool]):
+        raise NotImplementedError()
@@ -0,0 +1,74 @@
+import json
+import socket
+from pathlib import Path
+
+from jiruff.local.paths import SERVE_SOCKET_FILE
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+class DaemonClient:
+    """
+    Client of a running ``jiruff serve`` daemon.
+
+    Requests and responses are JSON documents, one per line, sent over the
+    Unix socket of the daemon. The connection is kept open, so repeated
+    requests do not pay for a new one. Imports nothing beyond the standard
+    library, to keep callers like git hooks fast.
+    """
+
+    def __init__(self, socket_path: Path = SERVE_SOCKET_FILE, timeout: float = 600.0):
+        self._socket_path = socket_path
+        self._timeout = timeout
+        self._socket: socket.socket | None = None
+        self._reader = None
+
+    def _connect(self) -> None:
+        if self._socket is not None:
+            return
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(self._timeout)
+        try:
+            self._socket.connect(str(self._socket_path))
+        except OSError as e:
+            self.close()
+            raise DaemonError(
+                f"jiruff daemon is not running on {self._socket_path}: {e}"
+            ) from e
+        self._reader = self._socket.makefile("rb")
+
+    def request(self, command: str, **params) -> dict:
+        """
+        Send a request to the daemon.
+        :param command: ``check``, ``format``, ``report`` or ``stats``.
+        :param params: Parameters of the command.
+        :return: Result of the command.
+        :raise DaemonError: When the daemon is not running or the command fails.
+        """
+        self._connect()
+        request = json.dumps({"command": command, "params": params})
+        self._socket.sendall(request.encode("utf8") + b"\n")
+        line = self._reader.readline()
+        if not line:
+            self.close()
+            raise DaemonError("jiruff daemon closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "unknown error"))
+        return response["result"]
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,199 @@
+import logging
+import socket
+
+from pydantic import BaseModel
+from pydantic import Field
+from requests import PreparedRequest
+from requests import Response
+from requests import Session
+from requests.adapters import DEFAULT_POOLSIZE
+from urllib3.connection import HTTPConnection
+from urllib3.util.request import ACCEPT_ENCODING
+
+from jiruff.services.http_cache import ResponseCache
+from jiruff.services.http_cache import cached_response
+from jiruff.services.rate_limit import AdaptiveRateLimiter
+from jiruff.services.rate_limit import Priority
+from jiruff.services.rate_limit import RateLimitedAdapter
+from jiruff.services.rate_limit import request_priority
+
+logger = logging.getLogger(__name__)
+
+
+class HttpSessionConfig(BaseModel):
+    pool_size: int | None = Field(
+        default=None,
+        ge=1,
+        description=(
+            "Connections kept alive per host, defaults to the number of workers "
+            "sharing the session."
+        ),
+    )
+    keep_alive_idle: int = Field(
+        default=30,
+        ge=1,
+        description="Seconds of silence before TCP keep-alive probes start.",
+    )
+    keep_alive_interval: int = Field(
+        default=10, ge=1, description="Seconds between TCP keep-alive probes."
+    )
+    keep_alive_probes: int = Field(
+        default=3,
+        ge=1,
+        description="Unanswered probes after which a connection is dropped.",
+    )
+    compression: bool = Field(
+        default=True,
+        description=(
+            "Ask for compressed responses: gzip, plus br and zstd when brotli "
+            "and zstandard are installed."
+        ),
+    )
+    timeout: float = Field(
+        default=60.0, gt=0, description="Seconds to wait for a connection or data."
+    )
+
+    def resolve_pool_size(self, workers: int | None) -> int:
+        if self.pool_size is not None:
+            return self.pool_size
+        return max(workers or 0, DEFAULT_POOLSIZE)
+
+    def socket_options(self) -> list[tuple[int, int, int]]:
+        """
+        Socket options enabling TCP keep-alive, so idle pooled connections
+        survive NAT and load balancer timeouts instead of being re-handshaked.
+        """
+        options = [
+            *HTTPConnection.default_socket_options,
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        # Linux names it TCP_KEEPIDLE, macOS TCP_KEEPALIVE
+        keep_idle = getattr(
+            socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None)
+        )
+        if keep_idle is not None:
+            options.append((socket.IPPROTO_TCP, keep_idle, self.keep_alive_idle))
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, self.keep_alive_interval)
+            )
+        if hasattr(socket, "TCP_KEEPCNT"):
+            options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, self.keep_alive_probes)
+            )
+        return options
+
+    def accept_encoding(self) -> str:
+        return ACCEPT_ENCODING if self.compression else "identity"
+
+
+class ConnectionMetrics(BaseModel):
+    opened: int = 0
+    requests: int = 0
+
+    @property
+    def reused(self) -> int:
+        """
+        Requests sent over an already open connection.
+        """
+        return max(self.requests - self.opened, 0)
+
+    def log(self) -> None:
+        logger.info(
+            f"Sent {self.requests} HTTP requests over {self.opened} connections, "
+            f"{self.reused} reused a kept-alive connection"
+        )
+
+
+class JiraHTTPAdapter(RateLimitedAdapter):
+    """
+    Rate limited adapter with TCP keep-alive on pooled connections and
+    counters of opened connections.
+
+    With a ``ResponseCache`` reads are answered from the cache while fresh and
+    revalidated once stale, cache hits do not take rate limiter tokens.
+    """
+
+    def __init__(
+        self,
+        limiter: AdaptiveRateLimiter,
+        config: HttpSessionConfig,
+        cache: ResponseCache | None = None,
+        **kwargs,
+    ):
+        self.http_config = config
+        self.cache = cache
+        super().__init__(limiter, **kwargs)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if self.cache is None or kwargs.get("stream"):
+            return super().send(request, **kwargs)
+        if request_priority(request.method, request.url) != Priority.READ:
+            self.cache.invalidate_written(request.url, request.body)
+            return super().send(request, **kwargs)
+        if not self.cache.cacheable(request):
+            return super().send(request, **kwargs)
+
+        key = self.cache.request_key(request)
+        cached = self.cache.get(key)
+        if cached is not None and self.cache.fresh(cached):
+            self.cache.hits += 1
+            return cached_response(cached, request)
+
+        if cached is not None and cached.etag:
+            revalidation = request.copy()
+            revalidation.headers["If-None-Match"] = cached.etag
+            response = super().send(revalidation, **kwargs)
+            if response.status_code == 304:
+                response.close()
+                self.cache.revalidated += 1
+                self.cache.refresh(cached)
+                return cached_response(cached, request)
+        else:
+            response = super().send(request, **kwargs)
+
+        self.cache.misses += 1
+        if response.status_code == 200:
+            self.cache.store(key, response)
+        return response
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        kwargs["socket_options"] = self.http_config.socket_options()
+        super().init_poolmanager(*args, **kwargs)
+
+    def metrics(self) -> ConnectionMetrics:
+        metrics = ConnectionMetrics()
+        for pool_key in self.poolmanager.pools.keys():
+            pool = self.poolmanager.pools[pool_key]
+            metrics.opened += pool.num_connections
+            metrics.requests += pool.num_requests
+        return metrics
+
+
+def configure_session(
+    session: Session,
+    limiter: AdaptiveRateLimiter,
+    config: HttpSessionConfig,
+    pool_size: int,
+    cache: ResponseCache | None = None,
+) -> JiraHTTPAdapter:
+    """
+    Mount a tuned adapter on a requests session.
+    :param session: Session to configure.
+    :param limiter: Rate limiter all requests go through.
+    :param config: HTTP session configuration.
+    :param pool_size: Number of connections kept alive per host.
+    :param cache: Cache of read responses, None to always ask Jira.
+    :return: Mounted adapter.
+    """
+    adapter = JiraHTTPAdapter(
+        limiter,
+        config,
+        cache=cache,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = config.accept_encoding()
+    return adapter
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+from pydantic import BaseModel
+from pydantic import Field
+from requests import PreparedRequest
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# reads that must always reach Jira, like bulk edit task status polls
+UNCACHED_PATHS = ("/bulk/queue/",)
+# response headers kept with a cached body, the body is stored decoded
+CACHED_HEADERS = ("Content-Type", "ETag")
+# timestamp format of the issue `updated` field
+JIRA_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+ISSUE_PATH_PATTERN = re.compile(r"/issue/([^/?]+)")
+
+SCHEMA = """
+create table if not exists entries (
+    key text primary key,
+    url text not null,
+    headers text not null,
+    body blob not null,
+    etag text,
+    size integer not null,
+    stored_at real not null,
+    accessed_at real not null
+);
+create index if not exists entries_accessed_at on entries (accessed_at);
+create table if not exists entry_issues (
+    entry_key text not null references entries (key) on delete cascade,
+    issue_id text,
+    issue_key text,
+    updated real
+);
+create index if not exists entry_issues_entry_key on entry_issues (entry_key);
+create index if not exists entry_issues_issue_id on entry_issues (issue_id);
+create index if not exists entry_issues_issue_key on entry_issues (issue_key);
+"""
+
+
+class ResponseCacheConfig(BaseModel):
+    enabled: bool = Field(
+        default=True, description="Whether to cache Jira read responses on disk."
+    )
+    ttl: int = Field(
+        default=300,
+        ge=0,
+        description="Seconds a cached response is served without asking Jira.",
+    )
+    max_size_mb: int = Field(
+        default=256,
+        ge=1,
+        description="Size of the cache, least recently used responses are evicted.",
+    )
+
+
+class CachedResponse(BaseModel):
+    key: str
+    url: str
+    headers: dict[str, str]
+    body: bytes
+    etag: str | None
+    stored_at: float
+
+
+class ResponseCache:
+    """
+    Persistent cache of Jira read responses.
+
+    Responses are keyed by the normalized request: method, URL with sorted
+    query parameters, JSON body with sorted keys and a hash of the
+    credentials. A response is served as is for ``ttl`` seconds, after that it
+    is revalidated with ``If-None-Match`` when Jira sent an ``ETag``.
+
+    Responses are dropped before their time when they hold an issue that a
+    newer response shows with a later ``updated`` timestamp, or that a write
+    request changes. The least recently used responses are evicted once the
+    cache outgrows ``max_size_mb``.
+    """
+
+    def __init__(self, path: Path, config: ResponseCacheConfig | None = None):
+        self.config = config if config is not None else ResponseCacheConfig()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("pragma journal_mode = wal")
+        self._db.execute("pragma synchronous = normal")
+        self._db.execute("pragma foreign_keys = on")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._size = self._db.execute(
+            "select coalesce(sum(size), 0) from entries"
+        ).fetchone()[0]
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.evicted = 0
+
+    @staticmethod
+    def cacheable(request: PreparedRequest) -> bool:
+        path = urlsplit(request.url).path
+        return not any(uncached in path for uncached in UNCACHED_PATHS)
+
+    @staticmethod
+    def request_key(request: PreparedRequest) -> str:
+        """
+        Key of a request, equal for requests Jira answers the same way.
+        """
+        scheme, netloc, path, query, _ = urlsplit(request.url)
+        query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf8")
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True).encode("utf8")
+        except ValueError:
+            pass
+        key = hashlib.sha256()
+        for part in (
+            request.method.encode("utf8"),
+            urlunsplit((scheme, netloc, path, query, "")).encode("utf8"),
+            body,
+            request.headers.get("Authorization", "").encode("utf8"),
+        ):
+            key.update(hashlib.sha256(part).digest())
+        return key.hexdigest()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._db.execute(
+                "select url, headers, body, etag, stored_at from entries where key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "update entries set accessed_at = ? where key = ?", (time.time(), key)
+            )
+        url, headers, body, etag, stored_at = row
+        return CachedResponse(
+            key=key,
+            url=url,
+            headers=json.loads(headers),
+            body=body,
+            etag=etag,
+            stored_at=stored_at,
+        )
+
+    def fresh(self, cached: CachedResponse) -> bool:
+        return time.time() - cached.stored_at < self.config.ttl
+
+    def refresh(self, cached: CachedResponse) -> None:
+        """
+        Restart the time to live of a response Jira confirmed unchanged.
+        """
+        with self._lock:
+            self._db.execute(
+                "update entries set stored_at = ? where key = ?",
+                (time.time(), cached.key),
+            )
+
+    def store(self, key: str, response: Response) -> None:
+        """
+        Store a successful response, dropping older copies of its issues.
+        """
+        body = response.content
+        issues = _issue_versions(body)
+        headers = {
+            name: response.headers[name]
+            for name in CACHED_HEADERS
+            if name in response.headers
+        }
+        now = time.time()
+        with self._lock:
+            self._invalidate_outdated(issues)
+            self._delete([key])
+            self._db.execute(
+                "insert into entries values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    json.dumps(headers),
+                    body,
+                    response.headers.get("ETag"),
+                    len(body),
+                    now,
+                    now,
+                ),
+            )
+            self._db.executemany(
+                "insert into entry_issues values (?, ?, ?, ?)",
+                [(key, *issue) for issue in issues],
+            )
+            self._size += len(body)
+            self._evict()
+
+    def invalidate_written(self, url: str, body: bytes | str | None) -> None:
+        """
+        Drop cached responses holding issues a write request changes.
+        :param url: URL of the write request.
+        :param body: Body of the write request.
+        """
+        issues = set(ISSUE_PATH_PATTERN.findall(urlsplit(url).path))
+        try:
+            body = json.loads(body or "{}")
+            if isinstance(body, dict):
+                issues.update(map(str, body.get("selectedIssueIdsOrKeys", [])))
+        except ValueError:
+            pass
+        if not issues:
+            return
+        placeholders = ", ".join("?" * len(issues))
+        with self._lock:
+            keys = [
+                row[0]
+                for row in self._db.execute(
+                    "select distinct entry_key from entry_issues "
+                    f"where issue_id in ({placeholders}) "
+                    f"or issue_key in ({placeholders})",
+                    (*issues, *issues),
+                )
+            ]
+            self.invalidated += self._delete(keys)
+
+    def _invalidate_outdated(self, issues: list[tuple[str, str, float | None]]):
+        keys = set()
+        for issue_id, _, updated in issues:
+            if updated is None:
+                continue
+            keys.update(
+                row[0]
+                for row in self._db.execute(
+                    "select entry_key from entry_issues "
+                    "where issue_id = ? and updated < ?",
+                    (issue_id, updated),
+                )
+            )
+        self.invalidated += self._delete(list(keys))
+
+    def _evict(self) -> None:
+        max_size = self.config.max_size_mb * 1024 * 1024
+        while self._size > max_size:
+            keys = [
+                row[0]
+                for row in self._db.execute(
+                    "select key from entries order by accessed_at limit 100"
+                )
+            ]
+            if not keys:
+                break
+            self.evicted += self._delete(keys)
+
+    def _delete(self, keys: list[str]) -> int:
+        """
+        :return: Number of deleted responses.
+        """
+        deleted = 0
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            count, size = self._db.execute(
+                "select count(*), coalesce(sum(size), 0) from entries "
+                f"where key in ({placeholders})",
+                batch,
+            ).fetchone()
+            self._db.execute(
+                f"delete from entries where key in ({placeholders})", batch
+            )
+            deleted += count
+            self._size -= size
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def log(self) -> None:
+        logger.debug(
+            f"Response cache: {self.hits} hits, {self.revalidated} revalidated, "
+            f"{self.misses} misses, {self.invalidated} invalidated, "
+            f"{self.evicted} evicted, {self._size / 1024 / 1024:.1f} MB used"
+        )
+
+
+def cached_response(cached: CachedResponse, request: PreparedRequest) -> Response:
+    """
+    Build a response for a request from its cached copy.
+    """
+    response = Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(cached.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response._content = cached.body
+    return response
+
+
+def _issue_versions(body: bytes) -> list[tuple[str, str, float | None]]:
+    """
+    Issues in a response body.
+    :return: ID, key and `updated` timestamp of every issue.
+    """
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return []
+    if not isinstance(data, dict):
+        return []
+    if isinstance(data.get("issues"), list):
+        raw_issues = data["issues"]
+    elif "id" in data and "fields" in data:
+        raw_issues = [data]
+    else:
+        return []
+
+    issues = []
+    for raw_issue in raw_issues:
+        if not isinstance(raw_issue, dict) or "id" not in raw_issue:
+            continue
+        updated = (raw_issue.get("fields") or {}).get("updated")
+        try:
+            updated = datetime.strptime(updated, JIRA_TIMESTAMP_FORMAT).timestamp()
+        except (TypeError, ValueError):
+            updated = None
+        issues.append((str(raw_issue["id"]), raw_issue.get("key"), updated))
+    return issues
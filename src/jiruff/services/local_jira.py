@@ -1,34 +1,375 @@
-from pathlib import Path
+import logging
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import datetime
 from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Literal
+
+import orjson
+from jira.resources import Issue
 
 from jiruff.base.services.cloud_jira import JiraService
+from jiruff.base.storage import RecordStore
+from jiruff.local.deltas import revert_delta
+from jiruff.local.jql import compile_jql
+
+logger = logging.getLogger(__name__)
+
+DATE_INDEXED_FIELDS = ("created", "updated")
+
+
+def parse_jira_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
 
 
 class LocalJiraService(JiraService):
-    def __init__(self, local_dir_path: Path):
+    """
+    Read-only Jira service answering from the synced local mirror.
+
+    Field selections are ignored: issues always carry all mirrored fields.
+
+    All issues are loaded once and indexed by ID, key, parent, fix version,
+    issue type, watchers and update time, so lookups do not touch the disk or
+    the network. Issues are returned as the same ``Issue`` resources the cloud
+    service returns; they are detached from any HTTP session.
+
+    With the ``delta_store`` kept by the changelog sync, ``as_of`` answers with
+    the mirror as it was at an earlier moment.
+    """
+
+    def __init__(
+        self,
+        issue_store: RecordStore | None = None,
+        delta_store: RecordStore | None = None,
+    ):
+        """
+        :param issue_store: Issues mirror, None for a service filled with
+            ``upsert_issue``.
+        :param delta_store: Deltas of the mirrored issues.
+        """
         super().__init__()
-        self._local_dir_path = local_dir_path
-        if not self._local_dir_path.exists():
-            raise FileNotFoundError("Local directory should exist before using LocalJiraService")
+        self._issue_store = issue_store
+        self._delta_store = delta_store
+        self._issues: dict[int, dict] = {}
+        self._resources: dict[int, Issue] = {}
+        self._ids_by_key: dict[str, int] = {}
+        self._children: dict[str, set[int]] = {}
+        self._by_fix_version: dict[str, set[int]] = {}
+        self._by_issuetype: dict[str, set[int]] = {}
+        self._by_watcher: dict[str, set[int]] = {}
+        self._subtask_ids: set[int] = set()
+        # field -> sorted (timestamp, issue id), rebuilt lazily after upserts
+        self._date_indexes: dict[str, list[tuple[float, int]]] = {}
+        self._date_indexes_dirty = False
+        self._deltas: dict[int, list[dict]] = {}
+        # sorted (timestamp of the change, issue id) of all deltas
+        self._delta_index: list[tuple[float, int]] = []
+        if issue_store is not None:
+            self._load()
+
+    def _load(self) -> None:
+        for issue_id, data in self._issue_store.scan():
+            self._index_issue(issue_id, orjson.loads(data))
+        self._rebuild_date_indexes()
+        logger.debug(f"Local Jira mirror is loaded: {len(self._issues)} issues")
+        if self._delta_store is None:
+            return
+        for issue_id, data in self._delta_store.scan():
+            self._deltas[issue_id] = orjson.loads(data)
+            self._delta_index.extend(
+                (parse_jira_datetime(delta["updated"]).timestamp(), issue_id)
+                for delta in self._deltas[issue_id]
+            )
+        self._delta_index.sort()
+        logger.debug(f"Issue deltas are loaded: {len(self._delta_index)} changes")
+
+    def _index_keys(self, issue_json: dict) -> Iterable[tuple[dict, str]]:
+        """
+        Yield the (index, index key) pairs an issue is filed under.
+        """
+        fields = issue_json.get("fields", {})
+        parent = fields.get("parent")
+        if parent:
+            yield self._children, parent["key"]
+        for version in fields.get("fixVersions") or []:
+            for version_ref in (version.get("id"), version.get("name")):
+                if version_ref is not None:
+                    yield self._by_fix_version, str(version_ref).lower()
+        issuetype = fields.get("issuetype")
+        if issuetype:
+            yield self._by_issuetype, issuetype["name"].lower()
+        # watchers are only there when the mirror was synced with them expanded
+        for watcher in (fields.get("watches") or {}).get("watchers") or []:
+            account_id = watcher.get("accountId") or watcher.get("name")
+            if account_id:
+                yield self._by_watcher, account_id
+
+    def _index_issue(self, issue_id: int, issue_json: dict) -> None:
+        self._issues[issue_id] = issue_json
+        self._ids_by_key[issue_json["key"]] = issue_id
+        if (issue_json.get("fields", {}).get("issuetype") or {}).get("subtask"):
+            self._subtask_ids.add(issue_id)
+        for index, index_key in self._index_keys(issue_json):
+            index.setdefault(index_key, set()).add(issue_id)
+
+    def _unindex_issue(self, issue_id: int) -> None:
+        issue_json = self._issues.pop(issue_id, None)
+        self._resources.pop(issue_id, None)
+        if issue_json is None:
+            return
+        self._ids_by_key.pop(issue_json["key"], None)
+        self._subtask_ids.discard(issue_id)
+        for index, index_key in self._index_keys(issue_json):
+            index.get(index_key, set()).discard(issue_id)
+        self._date_indexes_dirty = True
+
+    def _rebuild_date_indexes(self) -> None:
+        for date_field in DATE_INDEXED_FIELDS:
+            self._date_indexes[date_field] = sorted(
+                (parse_jira_datetime(issue["fields"][date_field]).timestamp(), issue_id)
+                for issue_id, issue in self._issues.items()
+                if issue.get("fields", {}).get(date_field)
+            )
+        self._date_indexes_dirty = False
+
+    def upsert_issue(self, issue_json: dict) -> None:
+        """
+        Add or replace an issue in the indexes.
+        :param issue_json: Full issue JSON.
+        """
+        issue_id = int(issue_json["id"])
+        self._unindex_issue(issue_id)
+        self._index_issue(issue_id, issue_json)
+        self._date_indexes_dirty = True
+
+    def remove_issue(self, issue_id: int) -> None:
+        self._unindex_issue(issue_id)
+
+    def as_of(self, moment: datetime) -> "LocalJiraService":
+        """
+        Snapshot of the mirror as it was at a moment.
+
+        Issues created later are left out. Issues changed later are rolled back
+        by reverting their deltas newest first. The deltas are found with a
+        timestamp index, so only issues changed since the moment are touched.
+        Changes synced without the changelog profile left no deltas and cannot
+        be rolled back.
+        :param moment: Timezone aware moment.
+        :return: Service answering from the snapshot.
+        """
+        at = moment.timestamp()
+        changed_ids = {
+            issue_id
+            for _, issue_id in self._delta_index[
+                bisect_right(self._delta_index, at, key=lambda item: item[0]) :
+            ]
+        }
+        created_later = set(
+            self.ids_by_date("created", since=moment, since_inclusive=False)
+        )
+
+        snapshot = LocalJiraService()
+        for issue_id, issue_json in self._issues.items():
+            if issue_id in created_later:
+                continue
+            if issue_id in changed_ids:
+                for delta in reversed(self._deltas[issue_id]):
+                    if parse_jira_datetime(delta["updated"]).timestamp() <= at:
+                        break
+                    issue_json = revert_delta(issue_json, delta)
+            snapshot._index_issue(issue_id, issue_json)
+        snapshot._rebuild_date_indexes()
+        logger.debug(
+            f"Local Jira mirror as of {moment}: {len(snapshot._issues)} issues, "
+            f"{len(changed_ids)} rolled back"
+        )
+        return snapshot
+
+    def _resource(self, issue_id: int) -> Issue:
+        resource = self._resources.get(issue_id)
+        if resource is None:
+            resource = Issue(options={}, session=None, raw=self._issues[issue_id])
+            self._resources[issue_id] = resource
+        return resource
+
+    def _resources_of(self, issue_ids: Iterable[int]) -> list[Issue]:
+        return [self._resource(issue_id) for issue_id in sorted(issue_ids)]
 
     def auth(self, server: str, user: str, token: str):
-        raise NotImplementedError()
+        pass
 
-    def get_all_issues_by_jql(self, jql: str, num_results: int = 0):
-        raise NotImplementedError()
+    def get_all_issues_by_jql(
+        self, jql: str, num_results: int = 0, fields: list[str] | None = None
+    ):
+        """
+        Run a JQL query against the mirror.
+
+        Only the JQL subset supported by ``jiruff.local.jql`` is accepted.
+        :param jql: JQL string.
+        :param num_results: Maximum number of issues, 0 for all of them.
+        """
+        issue_ids = compile_jql(jql).execute(self)
+        if num_results:
+            issue_ids = issue_ids[:num_results]
+        return [self._resource(issue_id) for issue_id in issue_ids]
+
+    def iter_issues_by_jql(
+        self, jql: str, fields: list[str] | None = None
+    ) -> Iterator[Issue]:
+        for issue_id in compile_jql(jql).execute(self):
+            yield self._resource(issue_id)
 
     def get_all_children(self, key: str):
-        raise NotImplementedError()
+        return self._resources_of(self._children.get(key, ()))
+
+    def get_children_by_parent(
+        self, keys: list[str], fields: list[str] | None = None
+    ) -> dict[str, list]:
+        return {key: self.get_all_children(key) for key in keys}
 
     def get_json(self, path: str, data: dict) -> dict:
         raise NotImplementedError()
 
-    def get_full_issue_json(self, issue_id: int) -> dict:
+    def iter_worklog_changes(
+        self, change: Literal["updated", "deleted"], since: int
+    ) -> Iterator[tuple[list[int], int]]:
+        raise NotImplementedError()
+
+    def get_full_issue_json(
+        self, issue_id: int, fields: list[str] | None = None
+    ) -> dict | None:
+        return self._issues.get(issue_id)
+
+    def get_full_issues_json(
+        self, issue_ids: list[int], fields: list[str] | None = None
+    ) -> list[dict]:
+        return [
+            self._issues[issue_id] for issue_id in issue_ids if issue_id in self._issues
+        ]
+
+    def get_issue_changelogs(self, issue_ids: list[int]) -> dict[int, list[dict]]:
         raise NotImplementedError()
 
     def add_watcher(self, issue_id: str, watcher_id: str):
         raise NotImplementedError()
 
+    def update_issue_fields(self, issue_key: str, fields: dict, notify: bool = True):
+        raise NotImplementedError()
+
+    def bulk_update_issue_fields(
+        self, issue_keys: list[str], fields: dict, notify: bool = True
+    ) -> dict[str, str] | None:
+        raise NotImplementedError()
+
     def get_all_issues(self, filter_func: Callable[[dict], bool]):
-        pass
+        return [
+            self._resource(issue_id)
+            for issue_id, issue in sorted(self._issues.items())
+            if filter_func(issue)
+        ]
+
+    def get_issue(self, key: str) -> Issue | None:
+        issue_id = self._ids_by_key.get(key)
+        return None if issue_id is None else self._resource(issue_id)
+
+    def get_issues_by_fix_version(self, version: str) -> list[Issue]:
+        """
+        :param version: Version ID or name.
+        """
+        return self._resources_of(self._by_fix_version.get(version.lower(), ()))
+
+    def get_issues_by_issuetype(self, issuetype: str) -> list[Issue]:
+        return self._resources_of(self._by_issuetype.get(issuetype.lower(), ()))
+
+    def get_issues_watched_by(self, account_id: str) -> list[Issue]:
+        return self._resources_of(self._by_watcher.get(account_id, ()))
+
+    def get_issues_updated_between(
+        self, since: datetime | None = None, until: datetime | None = None
+    ) -> list[Issue]:
+        """
+        Get issues with the ``updated`` field within ``[since, until)``.
+        :param since: Inclusive lower bound, unbounded if None.
+        :param until: Exclusive upper bound, unbounded if None.
+        """
+        return self._resources_of(
+            self.ids_by_date("updated", since=since, until=until, until_inclusive=False)
+        )
+
+    def issue_ids(self) -> Iterable[int]:
+        return self._issues.keys()
+
+    def subtask_ids(self) -> set[int]:
+        return self._subtask_ids
+
+    def ids_by_index(self, index: str, value: str) -> set[int]:
+        """
+        Look up issue IDs by an indexed field value.
+        :param index: One of key, id, parent, fixVersion, issuetype or watcher.
+        :param value: Field value as written in JQL.
+        """
+        if index == "key":
+            issue_id = self._ids_by_key.get(value.upper())
+            return set() if issue_id is None else {issue_id}
+        if index == "id":
+            return {int(value)} if int(value) in self._issues else set()
+        if index == "parent":
+            parent_key = value.upper()
+            if value.isdigit() and int(value) in self._issues:
+                parent_key = self._issues[int(value)]["key"]
+            return set(self._children.get(parent_key, ()))
+        if index == "fixVersion":
+            return set(self._by_fix_version.get(value.lower(), ()))
+        if index == "issuetype":
+            return set(self._by_issuetype.get(value.lower(), ()))
+        if index == "watcher":
+            return set(self._by_watcher.get(value, ()))
+        raise KeyError(f"{index} is not indexed")
+
+    def non_empty_ids(self, index: str) -> set[int]:
+        """
+        Get IDs of issues having any value in an indexed field.
+        """
+        if index in ("key", "id"):
+            return set(self._issues)
+        buckets = {
+            "parent": self._children,
+            "fixVersion": self._by_fix_version,
+            "issuetype": self._by_issuetype,
+            "watcher": self._by_watcher,
+        }[index]
+        return set().union(*buckets.values())
+
+    def ids_by_date(
+        self,
+        date_field: str,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        since_inclusive: bool = True,
+        until_inclusive: bool = True,
+    ) -> list[int]:
+        """
+        Range scan of the ``created`` or ``updated`` index.
+        :param date_field: Indexed date field.
+        :param since: Lower bound, unbounded if None.
+        :param until: Upper bound, unbounded if None.
+        :param since_inclusive: Whether the lower bound is included.
+        :param until_inclusive: Whether the upper bound is included.
+        :return: Issue IDs ordered by the date.
+        """
+        if self._date_indexes_dirty:
+            self._rebuild_date_indexes()
+        index = self._date_indexes[date_field]
+        start, end = 0, len(index)
+        if since is not None:
+            bisect_since = bisect_left if since_inclusive else bisect_right
+            start = bisect_since(index, since.timestamp(), key=lambda item: item[0])
+        if until is not None:
+            bisect_until = bisect_right if until_inclusive else bisect_left
+            end = bisect_until(index, until.timestamp(), key=lambda item: item[0])
+        return [issue_id for _, issue_id in index[start:end]]
 
+    def __len__(self) -> int:
+        return len(self._issues)
@@ -0,0 +1,352 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Mapping
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+from pydantic import Field
+from requests import PreparedRequest
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# status codes worth retrying: throttling and transient unavailability
+RETRY_STATUS_CODES = (429, 503)
+# POST endpoints that only read data
+READ_POST_PATHS = (
+    "/search/jql",
+    "/issue/bulkfetch",
+    "/worklog/list",
+    "/changelog/bulkfetch",
+)
+# seconds of history the effective request rate is measured over
+EFFECTIVE_RATE_WINDOW = 10.0
+# multiplicative decrease factors of the request rate
+THROTTLED_RATE_FACTOR = 0.5
+NEAR_LIMIT_RATE_FACTOR = 0.9
+# token intervals a tenant that stopped asking for the shared budget still
+# counts as contending for it
+SHARED_CONTENTION_TOKENS = 3
+
+
+class Priority(IntEnum):
+    READ = 0
+    WRITE = 1
+
+
+class RateLimiterConfig(BaseModel):
+    rate: float = Field(default=10.0, gt=0, description="Initial requests per second.")
+    min_rate: float = Field(
+        default=0.5, gt=0, description="Lowest rate throttling can bring it to."
+    )
+    max_rate: float = Field(
+        default=50.0, gt=0, description="Highest rate successes can raise it to."
+    )
+    burst: int = Field(
+        default=10, ge=1, description="Requests that may be sent back to back."
+    )
+    read_reserve: int = Field(
+        default=2,
+        ge=0,
+        description="Tokens writes leave in the bucket, so reads are served first.",
+    )
+    max_retries: int = Field(
+        default=5,
+        ge=0,
+        description="Retries of a throttled request before its response is returned.",
+    )
+    backoff: float = Field(
+        default=1.0,
+        gt=0,
+        description="Base delay in seconds of the exponential retry backoff.",
+    )
+
+
+class SharedRequestBudget:
+    """
+    Request budget shared by the Jira sites synced by one process.
+
+    Each site keeps its own ``AdaptiveRateLimiter`` for its Jira quota, and
+    every request also takes a token from this bucket refilled at ``rate``,
+    the network budget of the process. When tokens run short they go to the
+    waiting site served least so far, so a site with many workers cannot
+    starve one with few. Sites that were idle do not bank credit, and tokens
+    no other site waits for are used by whoever asks.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        """
+        :param rate: Requests per second of all sites together.
+        :param burst: Requests that may be sent back to back, ``rate`` if None.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(int(rate), 1)
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        # start-time fair queueing: a request starts at the virtual time of the
+        # last served request or after the previous request of its tenant
+        self._virtual_time = 0.0
+        self._finished: dict[str, float] = {}
+        # tenant -> when it last asked for a token
+        self._contending: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, tenant: str) -> float:
+        return max(self._finished.get(tenant, 0.0), self._virtual_time)
+
+    def reserve(self, tenant: str) -> float:
+        """
+        Take a token for a request of a tenant if it is its turn.
+        :param tenant: Site the request goes to.
+        :return: 0 if the request may be sent now, otherwise seconds to wait
+            before asking again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled_at) * self.rate
+            )
+            self._refilled_at = now
+            expiry = SHARED_CONTENTION_TOKENS / self.rate
+            for other, asked_at in list(self._contending.items()):
+                if now - asked_at > expiry:
+                    del self._contending[other]
+            self._contending[tenant] = now
+
+            start = self._start(tenant)
+            first_in_line = all(
+                start <= self._start(other)
+                for other in self._contending
+                if other != tenant
+            )
+            if self._tokens < 1.0 or not first_in_line:
+                return max((1.0 - self._tokens) / self.rate, 1.0 / self.rate)
+
+            self._tokens -= 1.0
+            self._virtual_time = start
+            self._finished[tenant] = start + 1.0
+            return 0.0
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all requests to a Jira site.
+
+    The refill rate adapts with additive increase and multiplicative decrease:
+    every successful request raises it a little up to ``max_rate``, throttled
+    responses halve it and ``Retry-After`` pauses all requests. Writes must
+    leave ``read_reserve`` tokens in the bucket, so reads waiting along with
+    them are served first.
+
+    ``reserve`` never blocks and returns the time to wait instead, so the
+    limiter can be driven by threads and event loops alike.
+
+    With a ``SharedRequestBudget`` requests also wait for their turn in the
+    budget shared with other sites.
+    """
+
+    def __init__(
+        self,
+        config: RateLimiterConfig | None = None,
+        budget: SharedRequestBudget | None = None,
+        tenant: str = "",
+    ):
+        """
+        :param config: Rate limiter configuration.
+        :param budget: Budget shared with other sites, None to use only this
+            limiter.
+        :param tenant: Name of the site in the shared budget.
+        """
+        self.config = config if config is not None else RateLimiterConfig()
+        self.budget = budget
+        self.tenant = tenant
+        self._rate = min(
+            max(self.config.rate, self.config.min_rate), self.config.max_rate
+        )
+        self._tokens = float(self.config.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._sent_at: deque[float] = deque()
+        self.sent = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """
+        Current target rate in requests per second.
+        """
+        return self._rate
+
+    @property
+    def effective_rate(self) -> float:
+        """
+        Requests per second actually sent over the last few seconds.
+        """
+        with self._lock:
+            self._forget_sent(time.monotonic())
+            return len(self._sent_at) / EFFECTIVE_RATE_WINDOW
+
+    def _forget_sent(self, now: float) -> None:
+        while self._sent_at and self._sent_at[0] < now - EFFECTIVE_RATE_WINDOW:
+            self._sent_at.popleft()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._tokens = min(self.config.burst, self._tokens + elapsed * self._rate)
+        self._refilled_at = now
+
+    def reserve(self, priority: Priority = Priority.READ) -> float:
+        """
+        Take a token for a request if one is available.
+        :param priority: Priority of the request.
+        :return: 0 if the request may be sent now, otherwise seconds to wait
+            before asking again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            needed = 1.0
+            if priority == Priority.WRITE:
+                needed = min(1.0 + self.config.read_reserve, self.config.burst)
+            if self._tokens < needed:
+                return (needed - self._tokens) / self._rate
+            if self.budget is not None:
+                delay = self.budget.reserve(self.tenant)
+                if delay > 0:
+                    return delay
+            self._tokens -= 1.0
+            self.sent += 1
+            self._sent_at.append(now)
+            self._forget_sent(now)
+            return 0.0
+
+    def acquire(self, priority: Priority = Priority.READ) -> None:
+        """
+        Wait until a request may be sent.
+        """
+        while (delay := self.reserve(priority)) > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, priority: Priority = Priority.READ) -> None:
+        """
+        Wait until a request may be sent without blocking the event loop.
+        """
+        while (delay := self.reserve(priority)) > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self, near_limit: bool = False) -> None:
+        """
+        Adapt the rate to a response that was not throttled.
+        :param near_limit: Jira reported the quota is almost used up.
+        """
+        with self._lock:
+            if near_limit:
+                self._decrease(NEAR_LIMIT_RATE_FACTOR)
+            else:
+                # about one request per second more for every second of successes
+                self._rate = min(self.config.max_rate, self._rate + 1.0 / self._rate)
+
+    def on_throttled(self, retry_after: float | None = None) -> None:
+        """
+        Adapt the rate to a throttled response.
+        :param retry_after: Seconds Jira asked to wait, if it did.
+        """
+        with self._lock:
+            self.throttled += 1
+            self._decrease(THROTTLED_RATE_FACTOR)
+            if retry_after is not None:
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        # responses to requests sent before the last decrease do not count twice
+        if now - self._decreased_at < 1.0 / self._rate:
+            return
+        self._decreased_at = now
+        self._rate = max(self.config.min_rate, self._rate * factor)
+        self._tokens = min(self._tokens, 0.0)
+        logger.debug(f"Jira is throttling requests, rate lowered to {self._rate:.1f}/s")
+
+    def retry_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Jittered delay before retrying a throttled request.
+        :param attempt: Number of the failed attempt, starting from 0.
+        :param retry_after: Seconds Jira asked to wait, if it did.
+        """
+        if retry_after is not None:
+            # the pause itself is enforced by reserve, spread the retries
+            return random.uniform(0, self.config.backoff)
+        return self.config.backoff * 2**attempt * random.uniform(0.5, 1.5)
+
+    def log(self) -> None:
+        logger.info(
+            f"Sent {self.sent} Jira requests, {self.throttled} throttled, "
+            f"request rate settled at {self._rate:.1f}/s"
+        )
+
+
+def request_priority(method: str, url: str) -> Priority:
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return Priority.READ
+    if urlsplit(url).path.rstrip("/").endswith(READ_POST_PATHS):
+        return Priority.READ
+    return Priority.WRITE
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    retry_after = headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        return None
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTP adapter sending every request through an ``AdaptiveRateLimiter``.
+
+    Throttled and unavailable responses are retried here, so the session
+    using the adapter should not retry them again.
+    """
+
+    def __init__(self, limiter: AdaptiveRateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        priority = request_priority(request.method, request.url)
+        max_retries = self.limiter.config.max_retries
+        for attempt in range(max_retries + 1):
+            self.limiter.acquire(priority)
+            response = super().send(request, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES:
+                self.limiter.on_success(
+                    near_limit=response.headers.get("X-RateLimit-NearLimit") == "true"
+                )
+                return response
+
+            retry_after = parse_retry_after(response.headers)
+            self.limiter.on_throttled(retry_after)
+            if attempt == max_retries:
+                return response
+            logger.debug(
+                f"{request.method} {request.url} returned {response.status_code}, "
+                f"retry {attempt + 1}/{max_retries}"
+            )
+            response.close()
+            time.sleep(self.limiter.retry_delay(attempt, retry_after))
+        return response
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from typing import Iterable
+from typing import Literal
+
+import orjson
+import requests
+from jira import JIRAError
+from pydantic import BaseModel
+from pydantic import Field
+
+from jiruff.base.services.async_jira import AsyncJiraService
+from jiruff.base.services.cloud_jira import JiraService
+
+logger = logging.getLogger(__name__)
+
+# maximum number of issues the bulk edit endpoint accepts per task
+BULK_EDIT_SIZE = 1000
+
+# action, issue key and action arguments
+_SingleWrite = tuple[str, str, tuple]
+
+
+class WriteExecutorConfig(BaseModel):
+    max_workers: int = Field(
+        default=8, ge=1, description="Number of writes sent concurrently."
+    )
+    engine: Literal["threads", "asyncio"] = Field(
+        default="threads",
+        description="Send single writes from threads or from an asyncio event loop.",
+    )
+    bulk_min_size: int = Field(
+        default=10,
+        ge=2,
+        description="Minimal number of identical field updates sent as a bulk edit.",
+    )
+
+
+class WriteFailure(BaseModel):
+    action: str
+    issue_key: str
+    error: str
+
+
+class WriteSummary(BaseModel):
+    updated_issues: int = 0
+    added_watchers: int = 0
+    failures: list[WriteFailure] = Field(default_factory=list)
+
+    def log(self) -> None:
+        logger.info(
+            f"Applied {self.updated_issues} issue updates and "
+            f"{self.added_watchers} watchers, {len(self.failures)} writes failed"
+        )
+        for failure in self.failures:
+            logger.warning(
+                f"Failed to {failure.action} {failure.issue_key}: {failure.error}"
+            )
+
+
+class JiraWriteExecutor:
+    """
+    Collects Jira writes and applies them in one go.
+
+    Identical field updates of many issues are sent through the bulk edit API
+    when the service supports it, the remaining writes run concurrently.
+    Throttled writes are retried by the rate limiter of the service.
+    """
+
+    def __init__(self, jira: JiraService, config: WriteExecutorConfig | None = None):
+        self.jira = jira
+        self.config = config if config is not None else WriteExecutorConfig()
+        # (fields JSON, notify) -> issue keys, in queueing order
+        self._updates: dict[tuple[bytes, bool], list[str]] = {}
+        self._watchers: dict[tuple[str, str], None] = {}
+        self._lock = threading.Lock()
+
+    def update_fields(self, issue_key: str, fields: dict, notify: bool = False) -> None:
+        """
+        Queue an update of issue fields.
+        :param issue_key: Issue key.
+        :param fields: Fields payload as accepted by the edit issue API.
+        :param notify: Whether to notify users about the change.
+        """
+        group = (orjson.dumps(fields, option=orjson.OPT_SORT_KEYS), notify)
+        with self._lock:
+            issue_keys = self._updates.setdefault(group, [])
+            if issue_key not in issue_keys:
+                issue_keys.append(issue_key)
+
+    def add_watcher(self, issue_key: str, watcher_id: str) -> None:
+        """
+        Queue adding a watcher to an issue.
+        :param issue_key: Issue key.
+        :param watcher_id: Account ID of the watcher.
+        """
+        with self._lock:
+            self._watchers[(issue_key, watcher_id)] = None
+
+    def queued_updates(self) -> list[tuple[str, dict]]:
+        """
+        :return: Issue keys and fields of the queued updates.
+        """
+        with self._lock:
+            return [
+                (issue_key, orjson.loads(fields_json))
+                for (fields_json, _), issue_keys in self._updates.items()
+                for issue_key in issue_keys
+            ]
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._updates.values()) + len(self._watchers)
+
+    def execute(self) -> WriteSummary:
+        """
+        Apply all queued writes.
+        :return: Counts of applied writes and the failed ones.
+        """
+        summary = WriteSummary()
+        single_writes = self._apply_bulk_updates(summary)
+        with ThreadPoolExecutor(
+            max_workers=self.config.max_workers, thread_name_prefix="jiruff-write"
+        ) as executor:
+            errors = executor.map(
+                lambda write: self._run(lambda: self._apply(write)), single_writes
+            )
+            self._record(summary, single_writes, errors)
+        return summary
+
+    async def execute_async(self, jira: AsyncJiraService) -> WriteSummary:
+        """
+        Apply all queued writes, sending single writes from the event loop.
+
+        Up to ``max_workers`` single writes are in flight at once. Bulk edits
+        still go through the blocking service in a worker thread.
+        :param jira: Async service sending the single writes.
+        :return: Counts of applied writes and the failed ones.
+        """
+        # installed with jiruff[async] the asyncio engine needs, imported late
+        # to keep the CLI start fast
+        import httpx
+
+        summary = WriteSummary()
+        single_writes = await asyncio.to_thread(self._apply_bulk_updates, summary)
+        semaphore = asyncio.Semaphore(self.config.max_workers)
+
+        async def run(write: _SingleWrite) -> str | None:
+            async with semaphore:
+                try:
+                    await self._apply_async(jira, write)
+                    return None
+                except JIRAError as je:
+                    return f"{je.status_code}: {je.text}"
+                except httpx.HTTPError as e:
+                    # a lost connection fails the write, not the whole run
+                    return f"{type(e).__name__}: {e}"
+
+        errors = await asyncio.gather(*(run(write) for write in single_writes))
+        self._record(summary, single_writes, errors)
+        return summary
+
+    def _apply_bulk_updates(self, summary: WriteSummary) -> list[_SingleWrite]:
+        """
+        Take the queued writes and apply the ones that can be bulk edited.
+        :return: Writes left to be sent one by one.
+        """
+        with self._lock:
+            updates, self._updates = self._updates, {}
+            watchers, self._watchers = self._watchers, {}
+
+        single_writes: list[_SingleWrite] = []
+        for (fields_json, notify), issue_keys in updates.items():
+            fields = orjson.loads(fields_json)
+            if len(issue_keys) >= self.config.bulk_min_size and self._bulk_update(
+                issue_keys, fields, notify, summary
+            ):
+                continue
+            for issue_key in issue_keys:
+                single_writes.append(("update", issue_key, (fields, notify)))
+        for issue_key, watcher_id in watchers:
+            single_writes.append(("watch", issue_key, (watcher_id,)))
+        return single_writes
+
+    def _apply(self, write: _SingleWrite) -> None:
+        action, issue_key, args = write
+        if action == "update":
+            fields, notify = args
+            self.jira.update_issue_fields(issue_key, fields, notify=notify)
+        else:
+            self.jira.add_watcher(issue_key, *args)
+
+    @staticmethod
+    async def _apply_async(jira: AsyncJiraService, write: _SingleWrite) -> None:
+        action, issue_key, args = write
+        if action == "update":
+            fields, notify = args
+            await jira.update_issue_fields(issue_key, fields, notify=notify)
+        else:
+            await jira.add_watcher(issue_key, *args)
+
+    @staticmethod
+    def _record(
+        summary: WriteSummary,
+        single_writes: list[_SingleWrite],
+        errors: Iterable[str | None],
+    ) -> None:
+        for (action, issue_key, _), error in zip(single_writes, errors):
+            if error is not None:
+                summary.failures.append(
+                    WriteFailure(action=action, issue_key=issue_key, error=error)
+                )
+            elif action == "update":
+                summary.updated_issues += 1
+            else:
+                summary.added_watchers += 1
+
+    def _bulk_update(
+        self, issue_keys: list[str], fields: dict, notify: bool, summary: WriteSummary
+    ) -> bool:
+        """
+        Apply one field update to many issues with bulk edit tasks.
+        :return: False if the service cannot bulk edit these fields.
+        """
+        for start in range(0, len(issue_keys), BULK_EDIT_SIZE):
+            batch = issue_keys[start : start + BULK_EDIT_SIZE]
+            failed: dict[str, str] | None = None
+
+            def bulk_update() -> None:
+                nonlocal failed
+                failed = self.jira.bulk_update_issue_fields(batch, fields, notify)
+
+            error = self._run(bulk_update)
+            if error is None and failed is None:
+                if start == 0:
+                    return False
+                error = "bulk edit is not supported"
+            if error is not None:
+                failed = {issue_key: error for issue_key in batch}
+
+            summary.updated_issues += len(batch) - len(failed)
+            summary.failures.extend(
+                WriteFailure(action="update", issue_key=issue_key, error=issue_error)
+                for issue_key, issue_error in failed.items()
+            )
+        return True
+
+    @staticmethod
+    def _run(write: Callable[[], None]) -> str | None:
+        """
+        Run a write.
+        :return: Error message if the write failed.
+        """
+        try:
+            write()
+            return None
+        except JIRAError as je:
+            return f"{je.status_code}: {je.text}"
+        except requests.RequestException as e:
+            # a lost connection fails the write, not the whole run
+            return f"{type(e).__name__}: {e}"
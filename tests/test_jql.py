@@ -0,0 +1,234 @@
+from datetime import datetime
+from datetime import timezone
+
+import pytest
+
+from jiruff.local.jql import And
+from jiruff.local.jql import Clause
+from jiruff.local.jql import Empty
+from jiruff.local.jql import Function
+from jiruff.local.jql import JqlError
+from jiruff.local.jql import Not
+from jiruff.local.jql import Or
+from jiruff.local.jql import compile_jql
+from jiruff.services.local_jira import LocalJiraService
+
+NOW = datetime(2025, 6, 15, 12, 0, tzinfo=timezone.utc)
+
+TASK = {"name": "Task", "subtask": False}
+BUG = {"name": "Bug", "subtask": False}
+SUBTASK = {"name": "Sub-task", "subtask": True}
+
+
+def make_issue(issue_id, key, created, issuetype=TASK, **fields):
+    # JQL dates are in local time
+    created = datetime.strptime(created, "%Y-%m-%d %H:%M").astimezone().isoformat()
+    return {
+        "id": str(issue_id),
+        "key": key,
+        "fields": {
+            "created": created,
+            "updated": created,
+            "issuetype": issuetype,
+            "fixVersions": [],
+            **fields,
+        },
+    }
+
+
+ISSUES = [
+    make_issue(
+        1,
+        "ABC-1",
+        "2025-01-01 10:00",
+        fixVersions=[{"id": "100", "name": "1.0"}],
+        status={"name": "Done"},
+    ),
+    make_issue(
+        2,
+        "ABC-2",
+        "2025-02-01 10:00",
+        BUG,
+        status={"name": "Open"},
+    ),
+    make_issue(
+        3,
+        "ABC-3",
+        "2025-03-01 10:00",
+        SUBTASK,
+        parent={"id": "1", "key": "ABC-1"},
+        status={"name": "Open"},
+    ),
+    make_issue(
+        4,
+        "XYZ-1",
+        "2025-04-01 10:00",
+        fixVersions=[{"id": "101", "name": "2.0"}],
+        status={"name": "Done"},
+    ),
+]
+
+
+@pytest.fixture
+def service():
+    service = LocalJiraService()
+    for issue in ISSUES:
+        service.upsert_issue(issue)
+    return service
+
+
+def execute(service, jql):
+    return compile_jql(jql).execute(service)
+
+
+def match(jql):
+    matcher = compile_jql(jql).matcher(NOW)
+    return [int(issue["id"]) for issue in ISSUES if matcher(issue)]
+
+
+def test_parse_clause():
+    assert compile_jql("project = ABC").where == Clause("project", "=", "ABC")
+
+
+def test_parse_precedence():
+    query = compile_jql("a = 1 or b = 2 and not c = 3")
+    assert query.where == Or(
+        [
+            Clause("a", "=", "1"),
+            And([Clause("b", "=", "2"), Not(Clause("c", "=", "3"))]),
+        ]
+    )
+
+
+def test_parse_parentheses():
+    query = compile_jql("(a = 1 || b = 2) && c = 3")
+    assert query.where == And(
+        [Or([Clause("a", "=", "1"), Clause("b", "=", "2")]), Clause("c", "=", "3")]
+    )
+
+
+def test_parse_lists_and_functions():
+    query = compile_jql('key in (ABC-1, "ABC-2") and type in standardIssueTypes()')
+    assert query.where == And(
+        [
+            Clause("key", "in", ("ABC-1", "ABC-2")),
+            Clause("issuetype", "in", Function("standardIssueTypes")),
+        ]
+    )
+    query = compile_jql('created < now("-10000d")')
+    assert query.where == Clause("created", "<", Function("now", ("-10000d",)))
+
+
+def test_parse_empty():
+    assert compile_jql("fixVersion is EMPTY").where == Clause(
+        "fixVersion", "is", Empty()
+    )
+    assert compile_jql("parent != null").where == Clause("parent", "is not", Empty())
+
+
+def test_parse_aliases_and_order_by():
+    query = compile_jql("issuekey = ABC-1 and cf[10001] = x order by created DESC, key")
+    assert query.where == And(
+        [Clause("key", "=", "ABC-1"), Clause("customfield_10001", "=", "x")]
+    )
+    assert query.order_by == [("created", False), ("key", True)]
+    assert compile_jql("order by rank").where is None
+
+
+@pytest.mark.parametrize(
+    "jql",
+    [
+        "project =",
+        "(project = ABC",
+        "project = ABC)",
+        "project = ABC and",
+        "project is ABC",
+        "project ABC",
+        "project = ABC order created",
+        "project = ABC $ x",
+    ],
+)
+def test_parse_malformed(jql):
+    with pytest.raises(JqlError):
+        compile_jql(jql)
+
+
+def test_indexed_clauses():
+    assert Clause("key", "=", "ABC-1").indexed
+    assert Clause("parent", "is", Empty()).indexed
+    assert Clause("created", ">=", "2025-01-01").indexed
+    assert not Clause("key", "!=", "ABC-1").indexed
+    assert not Clause("created", "=", "2025-01-01").indexed
+    assert not Clause("status", "=", "Done").indexed
+
+
+def test_execute_lookups(service):
+    assert execute(service, "key = abc-2") == [2]
+    assert execute(service, "id = 3") == [3]
+    assert execute(service, "id in (1, 4, 99)") == [1, 4]
+    assert execute(service, "parent = ABC-1") == [3]
+    assert execute(service, "parent = 1") == [3]
+    assert execute(service, "fixVersion in (1.0, 101)") == [1, 4]
+    assert execute(service, "fixVersion is EMPTY") == [2, 3]
+    assert execute(service, "issuetype = bug") == [2]
+    assert execute(service, "issuetype in subTaskIssueTypes()") == [3]
+    assert execute(service, "issuetype in standardIssueTypes()") == [1, 2, 4]
+
+
+def test_execute_non_numeric_id(service):
+    with pytest.raises(JqlError):
+        execute(service, "id = ABC-1")
+
+
+def test_execute_unsupported_function(service):
+    with pytest.raises(JqlError):
+        execute(service, "issuetype in linkedIssues(ABC-1)")
+
+
+def test_execute_date_bounds(service):
+    assert execute(service, 'created >= "2025-02-01 10:00"') == [2, 3, 4]
+    assert execute(service, 'created > "2025-02-01 10:00"') == [3, 4]
+    assert execute(service, 'created <= "2025-02-01 10:00"') == [1, 2]
+    assert execute(service, 'created < "2025-02-01 10:00"') == [1]
+
+
+def test_execute_boolean_logic(service):
+    assert execute(service, "status = Done and fixVersion = 2.0") == [4]
+    assert execute(service, "key = ABC-1 or issuetype = Bug") == [1, 2]
+    assert execute(service, "not status = Done") == [2, 3]
+    assert execute(service, "status != Done and not parent is EMPTY") == [3]
+    assert execute(service, "") == [1, 2, 3, 4]
+
+
+def test_execute_order_by(service):
+    assert execute(service, "order by created desc") == [4, 3, 2, 1]
+    assert execute(service, "order by key desc") == [4, 3, 2, 1]
+    assert execute(service, "status = Open order by id desc") == [3, 2]
+
+
+def test_comparison_with_non_number(service):
+    with pytest.raises(JqlError):
+        execute(service, "customfield_10001 > abc")
+
+
+def test_matcher_agrees_with_execute(service):
+    for jql in (
+        "status = Done",
+        "key in (ABC-1, XYZ-1) or parent = ABC-1",
+        "issuetype in standardIssueTypes() and not fixVersion is EMPTY",
+        "status != Done",
+    ):
+        assert match(jql) == execute(service, jql)
+
+
+def test_matcher_relative_dates():
+    assert match('created < now("-120d")') == [1, 2]
+    assert match("created >= -120d") == [3, 4]
+
+
+def test_match_fields():
+    assert compile_jql("key = ABC-1 and fixVersion = 1.0").match_fields() == {
+        "fixVersions"
+    }
+    assert compile_jql("status = Done and watcher = me").match_fields() is None
+    assert compile_jql("summary ~ fix").match_fields() is None